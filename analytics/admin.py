@@ -1,3 +1,14 @@
 from django.contrib import admin
+from .models import DailyRollup
 
-# Register your models here.
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = (
+        "day", "sale_type", "user",
+        "sales_count", "sales_total",
+        "credit_sales_total", "credit_outstanding", "credit_payments_total",
+        "expenses_total",
+    )
+    list_filter = ("sale_type", "day")
+    ordering = ("-day",)
@@ -0,0 +1,90 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+from analytics.models import DailyRollup
+from expenses.models import Expense
+from sales.models import CreditPayment, Sale
+
+ROLLUP_FIELDS = [
+    "sales_count", "sales_total",
+    "credit_sales_total", "credit_outstanding", "credit_payments_total",
+    "expenses_total",
+]
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyRollup table from sales, credit payments and expenses (3 grouped queries)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Only rebuild days from this date (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options.get("since"):
+            try:
+                since = datetime.strptime(options["since"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--since must be YYYY-MM-DD")
+
+        buckets = defaultdict(lambda: dict(dict.fromkeys(ROLLUP_FIELDS, Decimal("0.00")), sales_count=0))
+
+        outstanding = ExpressionWrapper(F("total_amount") - F("amount_paid"), output_field=DecimalField())
+        sales = (
+            Sale.objects.annotate(day=TruncDate("timestamp"))
+            .values("day", "sale_type", "created_by_id")
+            .annotate(
+                n=Count("id"),
+                total=Sum("total_amount"),
+                credit_total=Sum("total_amount", filter=Q(is_credit=True)),
+                credit_outstanding=Sum(outstanding, filter=Q(is_credit=True)),
+            )
+        )
+        payments = (
+            CreditPayment.objects.annotate(day=TruncDate("paid_on"))
+            .values("day", "sale__sale_type", "sale__created_by_id")
+            .annotate(total=Sum("amount"))
+        )
+        expenses = (
+            Expense.objects.annotate(day=TruncDate("timestamp"))
+            .values("day", "created_by_id")
+            .annotate(total=Sum("amount"))
+        )
+        if since:
+            sales = sales.filter(timestamp__date__gte=since)
+            payments = payments.filter(paid_on__date__gte=since)
+            expenses = expenses.filter(timestamp__date__gte=since)
+
+        for r in sales:
+            b = buckets[(r["day"], r["sale_type"], r["created_by_id"])]
+            b["sales_count"] = r["n"]
+            b["sales_total"] = r["total"] or Decimal("0.00")
+            b["credit_sales_total"] = r["credit_total"] or Decimal("0.00")
+            b["credit_outstanding"] = r["credit_outstanding"] or Decimal("0.00")
+
+        for r in payments:
+            b = buckets[(r["day"], r["sale__sale_type"], r["sale__created_by_id"])]
+            b["credit_payments_total"] = r["total"] or Decimal("0.00")
+
+        for r in expenses:
+            b = buckets[(r["day"], "", r["created_by_id"])]
+            b["expenses_total"] = r["total"] or Decimal("0.00")
+
+        rows = [
+            DailyRollup(day=day, sale_type=sale_type, user_id=user_id, **values)
+            for (day, sale_type, user_id), values in buckets.items()
+        ]
+
+        with transaction.atomic():
+            stale = DailyRollup.objects.all()
+            if since:
+                stale = stale.filter(day__gte=since)
+            stale.delete()
+            DailyRollup.objects.bulk_create(rows, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(rows)} daily rollup rows"))
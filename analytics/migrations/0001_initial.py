@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:07
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('sale_type', models.CharField(blank=True, default='', max_length=20)),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('sales_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('credit_sales_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('credit_outstanding', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('credit_payments_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('expenses_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['day', 'sale_type'],
+                'indexes': [models.Index(fields=['day'], name='dailyrollup_day_idx'), models.Index(fields=['user', 'day'], name='dailyrollup_user_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'sale_type', 'user'), name='dailyrollup_unique_bucket')],
+            },
+        ),
+    ]
@@ -1,3 +1,35 @@
+from decimal import Decimal
 from django.db import models
+from django.contrib.auth.models import User
 
-# Create your models here.
+
+class DailyRollup(models.Model):
+    """
+    Materialised daily totals per (day, sale_type, user) for the analytics dashboard.
+    Kept up to date by analytics.signals on every sale / expense / credit payment write;
+    rebuild with: python manage.py rebuild_daily_rollups
+    Expense-only rows use sale_type="".
+    """
+    day = models.DateField()
+    sale_type = models.CharField(max_length=20, blank=True, default="")
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    sales_count = models.PositiveIntegerField(default=0)
+    sales_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    credit_sales_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    credit_outstanding = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    credit_payments_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    expenses_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        ordering = ["day", "sale_type"]
+        constraints = [
+            models.UniqueConstraint(fields=["day", "sale_type", "user"], name="dailyrollup_unique_bucket"),
+        ]
+        indexes = [
+            models.Index(fields=["day"], name="dailyrollup_day_idx"),
+            models.Index(fields=["user", "day"], name="dailyrollup_user_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.sale_type or 'expenses'} — ₵{self.sales_total}"
@@ -0,0 +1,86 @@
+# analytics/services.py
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DailyRollup
+
+
+def _bump(*, day, sale_type: str, user_id, **deltas) -> None:
+    """
+    Add deltas to one (day, sale_type, user) bucket with a single F-expression UPDATE,
+    creating the row the first time the bucket is seen.
+    """
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+
+    bucket = DailyRollup.objects.filter(day=day, sale_type=sale_type, user_id=user_id)
+    if bucket.update(**{k: F(k) + v for k, v in deltas.items()}):
+        return
+    try:
+        with transaction.atomic():
+            DailyRollup.objects.create(day=day, sale_type=sale_type, user_id=user_id, **deltas)
+    except IntegrityError:
+        # another request created the bucket in between
+        bucket.update(**{k: F(k) + v for k, v in deltas.items()})
+
+
+def _credit_outstanding(sale) -> Decimal:
+    """What the dashboard counts as outstanding for one sale (credit sales only)."""
+    if not sale.is_credit:
+        return Decimal("0.00")
+    return (sale.total_amount or Decimal("0.00")) - (sale.amount_paid or Decimal("0.00"))
+
+
+# ---------------------------------------------------------------------
+# What one row contributes: {(day, sale_type, user_id): {field: amount}}
+# (the same figures rebuild_daily_rollups aggregates)
+# ---------------------------------------------------------------------
+def sale_rollup(sale) -> dict:
+    total = sale.total_amount or Decimal("0.00")
+    return {
+        (timezone.localdate(sale.timestamp), sale.sale_type, sale.created_by_id): {
+            "sales_count": 1,
+            "sales_total": total,
+            "credit_sales_total": total if sale.is_credit else Decimal("0.00"),
+            "credit_outstanding": _credit_outstanding(sale),
+        }
+    }
+
+
+def credit_payment_rollup(payment, *, sale_type: str, user_id) -> dict:
+    """Payments land in the bucket of the sale they pay (sale_type / created_by)."""
+    return {
+        (timezone.localdate(payment.paid_on), sale_type, user_id): {
+            "credit_payments_total": payment.amount or Decimal("0.00"),
+        }
+    }
+
+
+def expense_rollup(expense) -> dict:
+    return {
+        (timezone.localdate(expense.timestamp), "", expense.created_by_id): {
+            "expenses_total": expense.amount or Decimal("0.00"),
+        }
+    }
+
+
+def apply_rollup_change(before: dict, after: dict) -> None:
+    """
+    Move a row's contribution from `before` to `after` (either may be empty:
+    create / delete). Buckets present on both sides get one net UPDATE.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for bucket, values in after.items():
+        for field, amount in values.items():
+            deltas[bucket][field] += amount
+    for bucket, values in before.items():
+        for field, amount in values.items():
+            deltas[bucket][field] -= amount
+
+    for (day, sale_type, user_id), values in deltas.items():
+        _bump(day=day, sale_type=sale_type, user_id=user_id, **values)
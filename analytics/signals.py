@@ -0,0 +1,129 @@
+# analytics/signals.py
+"""
+Keep DailyRollup in step with every Sale / CreditPayment / Expense write (views,
+admin, shell): pre_save remembers what the stored row contributed, post_save
+applies new minus old, post_delete takes the contribution back out.
+QuerySet.update() bypasses these; rebuild_daily_rollups covers that.
+"""
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from expenses.models import Expense
+from sales.models import CreditPayment, Sale
+
+from .services import apply_rollup_change, credit_payment_rollup, expense_rollup, sale_rollup
+
+SALE_ROLLUP_FIELDS = {"timestamp", "sale_type", "created_by", "total_amount", "is_credit", "amount_paid"}
+
+
+def _stored(instance, fields):
+    """
+    The row as it is in the database before this save (None for inserts): the
+    load snapshot for sales / payments (StoredValuesMixin), a SELECT otherwise.
+    """
+    if hasattr(instance, "stored_instance"):
+        return instance.stored_instance(fields)
+    if instance._state.adding or instance.pk is None:
+        return None
+    return type(instance).objects.filter(pk=instance.pk).only(*fields).first()
+
+
+# ---------------------------------------------------------------------
+# Sale
+# ---------------------------------------------------------------------
+@receiver(pre_save, sender=Sale)
+def remember_sale_rollup(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._rollup_before = None
+    if raw or (update_fields is not None and not SALE_ROLLUP_FIELDS & set(update_fields)):
+        return
+    old = _stored(instance, SALE_ROLLUP_FIELDS)
+    instance._rollup_before = sale_rollup(old) if old else {}
+    instance._rollup_owner = (old.sale_type, old.created_by_id) if old else None
+
+
+@receiver(post_save, sender=Sale)
+def update_sale_rollup(sender, instance, raw=False, **kwargs):
+    before = getattr(instance, "_rollup_before", None)
+    if raw or before is None:
+        return
+    apply_rollup_change(before, sale_rollup(instance))
+
+    # sale_type / created_by changed: its payments move to the new buckets
+    owner = getattr(instance, "_rollup_owner", None)
+    if owner and owner != (instance.sale_type, instance.created_by_id):
+        by_day = (
+            instance.credit_payments.annotate(day=TruncDate("paid_on"))
+            .values("day").annotate(total=Sum("amount")).order_by()
+        )
+        moved = {r["day"]: {"credit_payments_total": r["total"]} for r in by_day}
+        apply_rollup_change(
+            {(day, *owner): values for day, values in moved.items()},
+            {(day, instance.sale_type, instance.created_by_id): values for day, values in moved.items()},
+        )
+    instance._rollup_before = None
+
+
+@receiver(post_delete, sender=Sale)
+def drop_sale_rollup(sender, instance, **kwargs):
+    apply_rollup_change(sale_rollup(instance), {})
+
+
+# ---------------------------------------------------------------------
+# CreditPayment
+# ---------------------------------------------------------------------
+def _payment_rollup(payment) -> dict:
+    sale = payment.sale
+    return credit_payment_rollup(payment, sale_type=sale.sale_type, user_id=sale.created_by_id)
+
+
+@receiver(pre_save, sender=CreditPayment)
+def remember_payment_rollup(sender, instance, raw=False, **kwargs):
+    if raw:
+        instance._rollup_before = None
+        return
+    old = _stored(instance, ["sale", "amount", "paid_on"])
+    if old and old.sale_id == instance.sale_id:
+        old.sale = instance.sale
+    instance._rollup_before = _payment_rollup(old) if old else {}
+
+
+@receiver(post_save, sender=CreditPayment)
+def update_payment_rollup(sender, instance, raw=False, **kwargs):
+    before = getattr(instance, "_rollup_before", None)
+    if raw or before is None:
+        return
+    apply_rollup_change(before, _payment_rollup(instance))
+    instance._rollup_before = None
+
+
+@receiver(post_delete, sender=CreditPayment)
+def drop_payment_rollup(sender, instance, **kwargs):
+    apply_rollup_change(_payment_rollup(instance), {})
+
+
+# ---------------------------------------------------------------------
+# Expense
+# ---------------------------------------------------------------------
+@receiver(pre_save, sender=Expense)
+def remember_expense_rollup(sender, instance, raw=False, **kwargs):
+    if raw:
+        instance._rollup_before = None
+        return
+    old = _stored(instance, ["amount", "timestamp", "created_by"])
+    instance._rollup_before = expense_rollup(old) if old else {}
+
+
+@receiver(post_save, sender=Expense)
+def update_expense_rollup(sender, instance, raw=False, **kwargs):
+    before = getattr(instance, "_rollup_before", None)
+    if raw or before is None:
+        return
+    apply_rollup_change(before, expense_rollup(instance))
+    instance._rollup_before = None
+
+
+@receiver(post_delete, sender=Expense)
+def drop_expense_rollup(sender, instance, **kwargs):
+    apply_rollup_change(expense_rollup(instance), {})
@@ -1,3 +1,122 @@
+from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from expenses.models import Expense
+from sales.models import CreditPayment, Sale
+
+from .models import DailyRollup
+
+FIELDS = [
+    "sales_count", "sales_total", "credit_sales_total", "credit_outstanding",
+    "credit_payments_total", "expenses_total",
+]
+
+
+def rollups():
+    """Non-empty buckets as {(day, sale_type, user_id): (field values...)}."""
+    return {
+        (r["day"], r["sale_type"], r["user_id"]): tuple(r[f] for f in FIELDS)
+        for r in DailyRollup.objects.values("day", "sale_type", "user_id", *FIELDS)
+        if any(r[f] for f in FIELDS)
+    }
+
+
+class DailyRollupSignalTests(TestCase):
+    def setUp(self):
+        self.cashier = User.objects.create_user("cashier")
+        self.today = timezone.localdate()
+
+    def assertMatchesRebuild(self):
+        live = rollups()
+        call_command("rebuild_daily_rollups", stdout=StringIO())
+        self.assertEqual(live, rollups())
+
+    def credit_sale(self, total="100.00"):
+        sale = Sale.objects.create(created_by=self.cashier, payment_method="credit", is_credit=True)
+        sale.total_amount = Decimal(total)
+        sale.save(update_fields=["total_amount"])
+        return sale
+
+    def bucket(self, sale_type="retail", day=None):
+        return DailyRollup.objects.get(day=day or self.today, sale_type=sale_type, user=self.cashier)
+
+    def test_sale_create_edit_delete(self):
+        sale = self.credit_sale()
+        row = self.bucket()
+        self.assertEqual((row.sales_count, row.sales_total, row.credit_outstanding), (1, Decimal("100.00"), Decimal("100.00")))
+
+        sale.total_amount = Decimal("80.00")
+        sale.save()
+        self.assertEqual(self.bucket().credit_outstanding, Decimal("80.00"))
+        self.assertMatchesRebuild()
+
+        sale.delete()
+        row = self.bucket()
+        self.assertEqual((row.sales_count, row.sales_total, row.credit_sales_total), (0, Decimal("0.00"), Decimal("0.00")))
+        self.assertMatchesRebuild()
+
+    def test_credit_payment_add_edit_delete(self):
+        sale = self.credit_sale()
+        payment = CreditPayment.objects.create(sale=sale, amount=Decimal("30.00"))
+        row = self.bucket()
+        self.assertEqual((row.credit_payments_total, row.credit_outstanding), (Decimal("30.00"), Decimal("70.00")))
+
+        payment.amount = Decimal("45.00")
+        payment.paid_on = timezone.now() - timedelta(days=1)  # back-dated: moves to yesterday
+        payment.save()
+        self.assertEqual(self.bucket().credit_payments_total, Decimal("0.00"))
+        self.assertEqual(self.bucket(day=self.today - timedelta(days=1)).credit_payments_total, Decimal("45.00"))
+        self.assertEqual(self.bucket().credit_outstanding, Decimal("55.00"))
+        self.assertMatchesRebuild()
+
+        payment.delete()
+        sale.recalc_credit(save=True)
+        self.assertEqual(self.bucket(day=self.today - timedelta(days=1)).credit_payments_total, Decimal("0.00"))
+        self.assertEqual(self.bucket().credit_outstanding, Decimal("100.00"))
+        self.assertMatchesRebuild()
+
+    def test_paying_off_leaves_credit_totals(self):
+        sale = self.credit_sale()
+        CreditPayment.objects.create(sale=sale, amount=Decimal("100.00"))
+        row = self.bucket()
+        self.assertEqual((row.credit_sales_total, row.credit_outstanding), (Decimal("0.00"), Decimal("0.00")))
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_sale_takes_its_payments_out(self):
+        sale = self.credit_sale()
+        CreditPayment.objects.create(sale=sale, amount=Decimal("40.00"))
+        sale.delete()
+        self.assertEqual(rollups(), {})
+
+    def test_sale_type_change_moves_payments(self):
+        sale = self.credit_sale()
+        CreditPayment.objects.create(sale=sale, amount=Decimal("40.00"))
+        sale.sale_type = "wholesale"
+        sale.save()
+        self.assertEqual(self.bucket("wholesale").credit_payments_total, Decimal("40.00"))
+        self.assertEqual(self.bucket("retail").credit_payments_total, Decimal("0.00"))
+        self.assertMatchesRebuild()
+
+    def test_expense_edit_and_delete(self):
+        expense = Expense.objects.create(amount=Decimal("25.00"), created_by=self.cashier)
+        self.assertEqual(self.bucket("").expenses_total, Decimal("25.00"))
+
+        expense.amount = Decimal("10.00")
+        expense.save()
+        self.assertEqual(self.bucket("").expenses_total, Decimal("10.00"))
+        self.assertMatchesRebuild()
+
+        expense.delete()
+        self.assertEqual(rollups(), {})
 
-# Create your tests here.
+    def test_unrelated_update_fields_skip_the_rollup(self):
+        sale = self.credit_sale()
+        sale.customer_name = "Ama"
+        with self.assertNumQueries(1):
+            sale.save(update_fields=["customer_name"])
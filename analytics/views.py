@@ -1,42 +1,48 @@
-from django.db.models import Sum, F, ExpressionWrapper, DecimalField
-from datetime import datetime, timedelta
+from django.db.models import Sum
+from datetime import timedelta
 from decimal import Decimal
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
+from django.utils import timezone
 
-from sales.models import Sale
-from expenses.models import Expense
 from inventory.models import Product
-from users.utils import has_any_group  
+from users.utils import has_any_group, user_in_groups
+from .models import DailyRollup
 
 @login_required
 @has_any_group("SuperAdmin", "SubAdmin", "Admin", "Accountant")
 def analytics_dashboard(request):
-    today = datetime.today()
-    dates = [(today - timedelta(days=i)).date() for i in range(6, -1, -1)]
+    today = timezone.localdate()
+    dates = [today - timedelta(days=i) for i in range(6, -1, -1)]
 
     # ✅ Admin/Accountant see all; others see only their own
-    sales_qs = Sale.objects.all()
-    expenses_qs = Expense.objects.all()  # adjust app/model name
+    rollups = DailyRollup.objects.filter(day__range=(dates[0], dates[-1]))
     products_qs = Product.objects.all()
 
-    # sales_qs = Sale.objects.all()
-    # expenses_qs = Expense.objects.all()
-
-    if not (request.user.groups.filter(name="Admin").exists() or request.user.groups.filter(name="Accountant").exists()):
-        sales_qs = sales_qs.filter(created_by=request.user)
-        expenses_qs = expenses_qs.filter(created_by=request.user)
+    if not user_in_groups(request.user, "Admin", "Accountant"):
+        rollups = rollups.filter(user=request.user)
         products_qs = products_qs.filter(created_by=request.user)
 
+    # one indexed range read for the whole week
+    by_day = {
+        r["day"]: r
+        for r in rollups.values("day").annotate(
+            sales=Sum("sales_total"),
+            expenses=Sum("expenses_total"),
+            credit_sales=Sum("credit_sales_total"),
+            credit_outstanding=Sum("credit_outstanding"),
+        )
+    }
+
     sales_data, expense_data, profit_data = [], [], []
     credit_sales_data, credit_outstanding_data = [], []
 
     for d in dates:
-        sales_total = sales_qs.filter(timestamp__date=d).aggregate(total=Sum("total_amount"))["total"] or Decimal("0.00")
-        expenses_total = expenses_qs.filter(timestamp__date=d).aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
-
-        credit_sales_total = sales_qs.filter(timestamp__date=d, is_credit=True).aggregate(total=Sum("total_amount"))["total"] or Decimal("0.00")
-        credit_outstanding = sales_qs.filter(timestamp__date=d, is_credit=True).aggregate(total=Sum(ExpressionWrapper(F("total_amount") - F("amount_paid"), output_field=DecimalField()))) ["total"] or Decimal("0.00")
+        r = by_day.get(d, {})
+        sales_total = r.get("sales") or Decimal("0.00")
+        expenses_total = r.get("expenses") or Decimal("0.00")
+        credit_sales_total = r.get("credit_sales") or Decimal("0.00")
+        credit_outstanding = r.get("credit_outstanding") or Decimal("0.00")
 
         profit = sales_total - expenses_total
 
@@ -51,8 +57,8 @@ def analytics_dashboard(request):
     total_profit = total_sales - total_expenses
 
     # ✅ Overall credit metrics for the period
-    period_credit_sales = sales_qs.filter(is_credit=True, timestamp__date__in=dates).aggregate(total=Sum("total_amount"))["total"] or Decimal("0.00")
-    period_credit_outstanding = sales_qs.filter(is_credit=True, timestamp__date__in=dates).aggregate(total=Sum(ExpressionWrapper(F("total_amount") - F("amount_paid"), output_field=DecimalField()))) ["total"] or Decimal("0.00")
+    period_credit_sales = sum(credit_sales_data)
+    period_credit_outstanding = sum(credit_outstanding_data)
 
     top_products = products_qs.order_by("-quantity")[:5]
 
@@ -80,7 +86,6 @@ def analytics_dashboard(request):
     return render(request, "analytics/dashboard.html", context)
 
 
-
 # def analytics_dashboard(request):
 #     sales_qs = visible_qs(Sale.objects.all(), request.user)
 #     expenses_qs = visible_qs(Expense.objects.all(), request.user)  # adjust app/model name
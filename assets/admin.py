@@ -1,5 +1,28 @@
 from django.contrib import admin
-from .models import Vehicle, VehicleTransaction
+from .models import Vehicle, VehicleMonthTotal, VehicleTransaction
+from .services import record_vehicle_transaction, remove_vehicle_transaction
 
 admin.site.register(Vehicle)
-admin.site.register(VehicleTransaction)
+
+
+@admin.register(VehicleTransaction)
+class VehicleTransactionAdmin(admin.ModelAdmin):
+    list_display = ("date", "vehicle", "tx_type", "title", "amount")
+    list_filter = ("vehicle", "tx_type")
+
+    # ✅ route writes through the services so the month rollups stay in step
+    def save_model(self, request, obj, form, change):
+        record_vehicle_transaction(obj)
+
+    def delete_model(self, request, obj):
+        remove_vehicle_transaction(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            remove_vehicle_transaction(obj)
+
+
+@admin.register(VehicleMonthTotal)
+class VehicleMonthTotalAdmin(admin.ModelAdmin):
+    list_display = ("vehicle", "month", "income", "expense")
+    list_filter = ("vehicle",)
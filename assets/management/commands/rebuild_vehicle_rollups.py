@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assets.services import rebuild_vehicle_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the VehicleMonthTotal table from vehicle transactions (one grouped query)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Only rebuild months from this date (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options.get("since"):
+            try:
+                since = datetime.strptime(options["since"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--since must be YYYY-MM-DD")
+
+        count = rebuild_vehicle_rollups(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} vehicle month rows"))
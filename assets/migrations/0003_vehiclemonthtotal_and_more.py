@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:37
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0002_vehicle_alter_vehicletransaction_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleMonthTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('income', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('expense', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+            options={
+                'ordering': ['vehicle', 'month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='vehicletransaction',
+            index=models.Index(fields=['vehicle', 'date'], name='vehicletx_vehicle_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='vehiclemonthtotal',
+            name='vehicle',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='month_totals', to='assets.vehicle'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclemonthtotal',
+            index=models.Index(fields=['month'], name='vehiclemonthtotal_month_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='vehiclemonthtotal',
+            constraint=models.UniqueConstraint(fields=('vehicle', 'month'), name='vehiclemonthtotal_unique_month'),
+        ),
+    ]
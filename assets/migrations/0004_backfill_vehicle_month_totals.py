@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_vehicle_month_totals(apps, schema_editor):
+    """One grouped query over the transactions (frozen copy of assets.services.rebuild_vehicle_rollups)."""
+    VehicleTransaction = apps.get_model("assets", "VehicleTransaction")
+    VehicleMonthTotal = apps.get_model("assets", "VehicleMonthTotal")
+
+    rows = (
+        VehicleTransaction.objects.annotate(m=TruncMonth("date"))
+        .values("vehicle_id", "m")
+        .annotate(
+            income=Sum("amount", filter=Q(tx_type="income")),
+            expense=Sum("amount", filter=Q(tx_type="expense")),
+        )
+        .order_by()
+    )
+    VehicleMonthTotal.objects.bulk_create(
+        [
+            VehicleMonthTotal(
+                vehicle_id=r["vehicle_id"], month=r["m"],
+                income=r["income"] or Decimal("0.00"), expense=r["expense"] or Decimal("0.00"),
+            )
+            for r in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("assets", "0003_vehiclemonthtotal_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_vehicle_month_totals, migrations.RunPython.noop),
+    ]
@@ -28,6 +28,36 @@ class VehicleTransaction(models.Model):
 
     class Meta:
         ordering = ["-date", "-id"]
+        indexes = [
+            models.Index(fields=["vehicle", "date"], name="vehicletx_vehicle_date_idx"),
+        ]
 
     def __str__(self):
         return f"{self.vehicle} - {self.tx_type} - ₵{self.amount}"
+
+
+class VehicleMonthTotal(models.Model):
+    """
+    Income / expense per (vehicle, calendar month), kept up to date by assets.services
+    on every transaction write; rebuild with: python manage.py rebuild_vehicle_rollups
+    """
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name="month_totals")
+    month = models.DateField()  # first day of the month
+    income = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    expense = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        ordering = ["vehicle", "month"]
+        constraints = [
+            models.UniqueConstraint(fields=["vehicle", "month"], name="vehiclemonthtotal_unique_month"),
+        ]
+        indexes = [
+            models.Index(fields=["month"], name="vehiclemonthtotal_month_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.vehicle} {self.month:%Y-%m} — net ₵{self.net}"
+
+    @property
+    def net(self):
+        return self.income - self.expense
@@ -0,0 +1,161 @@
+# assets/services.py
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import Vehicle, VehicleMonthTotal, VehicleTransaction
+
+ZERO = Decimal("0.00")
+FLEET_MONTHS = 12
+PERIOD_CHOICES = ((3, "3 months"), (12, "12 months"), (0, "All time"))
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def months_back(end: date, n: int) -> date:
+    """First day of the month n-1 months before end's month (n=12 -> the last 12 months)."""
+    index = end.year * 12 + end.month - 1 - (n - 1)
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_keys(start: date, end: date) -> list[date]:
+    keys, cur = [], month_start(start)
+    while cur <= end:
+        keys.append(cur)
+        cur = date(cur.year + cur.month // 12, cur.month % 12 + 1, 1)
+    return keys
+
+
+# ------------------------------------------------------------
+# ✅ Rollups on write
+# ------------------------------------------------------------
+def _bump_month(*, vehicle_id, month, income, expense) -> None:
+    deltas = {k: v for k, v in (("income", income), ("expense", expense)) if v}
+    if not deltas:
+        return
+
+    bucket = VehicleMonthTotal.objects.filter(vehicle_id=vehicle_id, month=month)
+    if bucket.update(**{k: F(k) + v for k, v in deltas.items()}):
+        return
+    try:
+        with transaction.atomic():
+            VehicleMonthTotal.objects.create(vehicle_id=vehicle_id, month=month, **deltas)
+    except IntegrityError:
+        bucket.update(**{k: F(k) + v for k, v in deltas.items()})
+
+
+def _apply(tx, sign: int) -> None:
+    amount = (tx.amount or ZERO) * sign
+    _bump_month(
+        vehicle_id=tx.vehicle_id,
+        month=month_start(tx.date),
+        income=amount if tx.tx_type == "income" else ZERO,
+        expense=amount if tx.tx_type == "expense" else ZERO,
+    )
+
+
+@transaction.atomic
+def record_vehicle_transaction(tx) -> VehicleTransaction:
+    """Save a new or edited vehicle transaction and move its amount between month buckets."""
+    if tx.pk:
+        old = VehicleTransaction.objects.filter(pk=tx.pk).first()
+        if old is not None:
+            _apply(old, -1)
+    tx.save()
+    _apply(tx, 1)
+    return tx
+
+
+@transaction.atomic
+def remove_vehicle_transaction(tx) -> None:
+    _apply(tx, -1)
+    tx.delete()
+
+
+# ------------------------------------------------------------
+# ✅ Reads
+# ------------------------------------------------------------
+def _money(expr):
+    return Coalesce(expr, Value(ZERO), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def vehicle_totals(vehicle) -> dict:
+    """All-time income / expense / net of one vehicle from its month rows."""
+    row = vehicle.month_totals.aggregate(income=_money(Sum("income")), expense=_money(Sum("expense")))
+    return {"credits": row["income"], "debits": row["expense"], "net": row["income"] - row["expense"]}
+
+
+def fleet_summary(start=None):
+    """
+    Vehicles annotated with income / expense / net since start (all time when None),
+    worst performer first. One grouped query over the month rollups.
+    """
+    window = Q(month_totals__month__gte=start) if start else Q()
+    income = _money(Sum("month_totals__income", filter=window))
+    expense = _money(Sum("month_totals__expense", filter=window))
+    return (
+        Vehicle.objects.annotate(income=income, expense=expense)
+        .annotate(net=F("income") - F("expense"))
+        .order_by("net", "name")
+    )
+
+
+def fleet_chart(end: date, months: int = FLEET_MONTHS) -> dict:
+    """Monthly net per vehicle for the last `months` months: {labels, series: [{vehicle, plate, net[]}]}."""
+    start = months_back(end, months)
+    keys = month_keys(start, end)
+    index = {k: i for i, k in enumerate(keys)}
+
+    series = {}
+    rows = (
+        VehicleMonthTotal.objects.filter(month__range=(start, end))
+        .values("vehicle_id", "vehicle__name", "vehicle__plate_number", "month", "income", "expense")
+        .order_by("vehicle__name", "month")
+    )
+    for r in rows:
+        s = series.setdefault(r["vehicle_id"], {
+            "vehicle": r["vehicle__name"],
+            "plate": r["vehicle__plate_number"],
+            "net": [0.0] * len(keys),
+        })
+        s["net"][index[r["month"]]] = float(r["income"] - r["expense"])
+
+    return {
+        "labels": [k.strftime("%Y-%m") for k in keys],
+        "series": list(series.values()),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+    }
+
+
+@transaction.atomic
+def rebuild_vehicle_rollups(*, since=None) -> int:
+    """Recompute VehicleMonthTotal from the transactions (one grouped query)."""
+    tx = VehicleTransaction.objects.all()
+    stale = VehicleMonthTotal.objects.all()
+    if since:
+        since = month_start(since)
+        tx = tx.filter(date__gte=since)
+        stale = stale.filter(month__gte=since)
+
+    rows = (
+        tx.annotate(m=TruncMonth("date"))
+        .values("vehicle_id", "m")
+        .annotate(
+            income=_money(Sum("amount", filter=Q(tx_type="income"))),
+            expense=_money(Sum("amount", filter=Q(tx_type="expense"))),
+        )
+        .order_by()
+    )
+    totals = [
+        VehicleMonthTotal(vehicle_id=r["vehicle_id"], month=r["m"], income=r["income"], expense=r["expense"])
+        for r in rows
+    ]
+    stale.delete()
+    VehicleMonthTotal.objects.bulk_create(totals, batch_size=1000)
+    return len(totals)
@@ -1,3 +1,65 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+
+from .models import Vehicle, VehicleMonthTotal, VehicleTransaction
+from .services import fleet_summary, rebuild_vehicle_rollups, record_vehicle_transaction, remove_vehicle_transaction
+
+
+class VehicleRollupTests(TestCase):
+    def setUp(self):
+        self.truck = Vehicle.objects.create(name="Truck", plate_number="GR-1")
+
+    def post(self, d, amount, tx_type="income"):
+        return record_vehicle_transaction(VehicleTransaction(
+            vehicle=self.truck, tx_type=tx_type, title="trip", amount=Decimal(amount), date=d,
+        ))
+
+    def buckets(self):
+        return list(
+            VehicleMonthTotal.objects.filter(vehicle=self.truck).order_by("month")
+            .values_list("month", "income", "expense")
+        )
+
+    def test_edit_moves_the_amount_between_month_buckets(self):
+        trip = self.post(date(2026, 1, 20), "300.00")
+        self.post(date(2026, 2, 3), "40.00", "expense")
+
+        trip.date = date(2026, 2, 14)
+        trip.amount = Decimal("250.00")
+        record_vehicle_transaction(trip)
+
+        self.assertEqual(self.buckets(), [
+            (date(2026, 1, 1), Decimal("0.00"), Decimal("0.00")),
+            (date(2026, 2, 1), Decimal("250.00"), Decimal("40.00")),
+        ])
+
+        # a type change moves the amount across columns of the same bucket
+        trip.tx_type = "expense"
+        record_vehicle_transaction(trip)
+        self.assertEqual(self.buckets()[1], (date(2026, 2, 1), Decimal("0.00"), Decimal("290.00")))
+
+    def test_delete_and_rebuild_agree(self):
+        self.post(date(2026, 1, 5), "100.00")
+        fuel = self.post(date(2026, 1, 6), "30.00", "expense")
+        remove_vehicle_transaction(fuel)
+
+        live = [row for row in self.buckets() if row[1] or row[2]]
+        rebuild_vehicle_rollups()
+        self.assertEqual(self.buckets(), live)
+        self.assertEqual(fleet_summary().get(pk=self.truck.pk).net, Decimal("100.00"))
+
+    def test_detail_totals_follow_the_date_window(self):
+        self.post(date(2026, 1, 20), "300.00")
+        self.post(date(2026, 2, 3), "40.00", "expense")
+        self.client.force_login(User.objects.create_superuser("admin"))
+        url = reverse("assets:vehicle_detail", args=[self.truck.pk])
+
+        all_time = self.client.get(url).context
+        self.assertEqual((all_time["total_income"], all_time["net_total"]), (Decimal("300.00"), Decimal("260.00")))
 
-# Create your tests here.
+        february = self.client.get(url, {"from": "2026-02-01"}).context
+        self.assertEqual((february["total_income"], february["net_total"]), (Decimal("0.00"), Decimal("-40.00")))
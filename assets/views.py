@@ -2,12 +2,18 @@ from datetime import date
 from decimal import Decimal
 
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
 
+from finance.ledger import ledger_summary
 from users.utils import has_any_group
 from .models import Vehicle, VehicleTransaction
 from .forms import VehicleTransactionForm, VehicleForm
+from .services import (
+    FLEET_MONTHS, PERIOD_CHOICES, fleet_chart, fleet_summary, months_back,
+    record_vehicle_transaction, remove_vehicle_transaction, vehicle_totals,
+)
 
 
 @login_required
@@ -27,8 +33,31 @@ def add_vehicle(request):
 @login_required
 @has_any_group("Admin", "Accountant", "Staff")
 def vehicle_list(request):
-    vehicles = Vehicle.objects.all().order_by("-id")
-    return render(request, "assets/vehicle_list.html", {"vehicles": vehicles})
+    # ✅ fleet overview: net per vehicle over ?months=N (0 = all time), one grouped query
+    try:
+        months = max(0, int(request.GET.get("months", FLEET_MONTHS)))
+    except ValueError:
+        months = FLEET_MONTHS
+    start = months_back(timezone.localdate(), months) if months else None
+
+    vehicles = list(fleet_summary(start))
+    return render(request, "assets/vehicle_list.html", {
+        "vehicles": vehicles,
+        "months": months,
+        "period_choices": PERIOD_CHOICES,
+        "fleet_net": sum((v.net for v in vehicles), Decimal("0.00")),
+    })
+
+
+@login_required
+@has_any_group("Admin", "Accountant", "Staff")
+def fleet_chart_json(request):
+    # ?months=N -> {"labels": ["YYYY-MM", ...], "series": [{"vehicle", "plate", "net": [...]}]}
+    try:
+        months = min(60, max(1, int(request.GET.get("months", FLEET_MONTHS))))
+    except ValueError:
+        months = FLEET_MONTHS
+    return JsonResponse(fleet_chart(timezone.localdate(), months))
 
 
 @login_required
@@ -47,9 +76,11 @@ def vehicle_detail(request, vehicle_id):
     if date_to:
         tx = tx.filter(date__lte=date_to)
 
-    total_income = tx.filter(tx_type="income").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-    total_expense = tx.filter(tx_type="expense").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-    net_total = total_income - total_expense
+    # all-time totals come from the month rollups; a date window needs the ledger query
+    if date_from or date_to:
+        totals = ledger_summary(tx, credit="income", debit="expense", shown=None)["shown"]
+    else:
+        totals = vehicle_totals(vehicle)
 
     tx_form = VehicleTransactionForm(initial={"date": date.today()})
 
@@ -60,9 +91,9 @@ def vehicle_detail(request, vehicle_id):
             "vehicle": vehicle,
             "transactions": tx,
             "tx_form": tx_form,
-            "total_income": total_income,
-            "total_expense": total_expense,
-            "net_total": net_total,
+            "total_income": totals["credits"],
+            "total_expense": totals["debits"],
+            "net_total": totals["net"],
             "date_from": date_from,
             "date_to": date_to,
         },
@@ -82,14 +113,12 @@ def add_vehicle_transaction(request, vehicle_id):
         obj = form.save(commit=False)
         obj.vehicle = vehicle
         obj.created_by = request.user
-        obj.save()
+        record_vehicle_transaction(obj)
         return redirect("assets:vehicle_detail", vehicle_id=vehicle.id)
 
     # ✅ If invalid, re-render detail page and show form errors
     tx = vehicle.transactions.all()
-    total_income = tx.filter(tx_type="income").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-    total_expense = tx.filter(tx_type="expense").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-    net_total = total_income - total_expense
+    totals = vehicle_totals(vehicle)
 
     return render(
         request,
@@ -98,9 +127,9 @@ def add_vehicle_transaction(request, vehicle_id):
             "vehicle": vehicle,
             "transactions": tx,
             "tx_form": form,  # form with errors
-            "total_income": total_income,
-            "total_expense": total_expense,
-            "net_total": net_total,
+            "total_income": totals["credits"],
+            "total_expense": totals["debits"],
+            "net_total": totals["net"],
             "date_from": "",
             "date_to": "",
         },
@@ -115,6 +144,6 @@ def tx_delete(request, tx_id):
     vehicle_id = tx.vehicle.id
 
     if request.method == "POST":
-        tx.delete()
+        remove_vehicle_transaction(tx)
 
     return redirect("assets:vehicle_detail", vehicle_id=vehicle_id)
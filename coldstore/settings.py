@@ -97,6 +97,7 @@ INSTALLED_APPS = [
     "employees.apps.EmployeesConfig",
     "assets.apps.AssetsConfig",
     "finance.apps.FinanceConfig",
+    "analytics.apps.AnalyticsConfig",
 ]
 # Kevin
 # Kevin1510 for production only
@@ -212,6 +213,13 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+# Report exports (PDF / Excel) are queued as ReportJob rows.
+# Default: rendered inside the request. With the Procfile `worker:` process running
+# (`python manage.py run_report_worker`), set REPORT_JOBS_INLINE=False; the worker and
+# the web process must then share MEDIA_ROOT storage (the web serves the finished file).
+REPORT_JOBS_INLINE = env_bool("REPORT_JOBS_INLINE", "True")
+REPORT_WORKER_CONCURRENCY = int(os.getenv("REPORT_WORKER_CONCURRENCY", "2"))
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -7,6 +7,7 @@ urlpatterns = [
     path("", views.expense_list, name="expense_list"),
     path("categories/", views.expense_category_list, name="expense_category_list"),
     path("categories/add/", views.add_expense_category, name="add_expense_category"),
+    path("export/pdf/", views.export_expenses_pdf, name="export_expenses_pdf"),
     # example
  
     # path('<int:pk>/', views.expense_detail, name='expense_detail'),
@@ -6,11 +6,8 @@ from .models import Expense, ExpenseCategory
 from .forms import ExpenseForm, ExpenseCategoryForm
 from django.contrib.auth.decorators import login_required
 from users.utils import has_any_group
-from django.http import HttpResponse
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from io import BytesIO
-from datetime import datetime
+from reports.models import ReportJob
+from reports.services import enqueue_report_job, report_filters
 
 # if form.is_valid():
 #     e = form.save(commit=False)
@@ -66,43 +63,10 @@ def add_expense_category(request):
 # expenses/views.py
 
 
+@login_required
+@has_any_group("SuperAdmin","Admin","Accountant")
 def export_expenses_pdf(request):
-    expenses = Expense.objects.all().order_by('-timestamp')
-
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(40, height - 50, "Expenses Report")
-    p.setFont("Helvetica", 9)
-    p.drawString(40, height - 65, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-
-    y = height - 90
-    p.setFont("Helvetica-Bold", 9)
-    p.drawString(40, y, "Date")
-    p.drawString(140, y, "Category")
-    p.drawString(320, y, "Note")
-    p.drawRightString(width - 40, y, "Amount (₵)")
-    p.line(35, y-3, width-35, y-3)
-    y -= 14
-    p.setFont("Helvetica", 9)
-
-    for e in expenses:
-        if y < 60:
-            p.showPage()
-            y = height - 40
-        p.drawString(40, y, e.timestamp.strftime("%Y-%m-%d %H:%M"))
-        p.drawString(140, y, e.category.name if e.category else "—")
-        p.drawString(320, y, (e.note[:30] + '...') if e.note and len(e.note) > 30 else (e.note or "—"))
-        p.drawRightString(width - 40, y, f"{float(e.amount):.2f}")
-        y -= 12
-
-    p.showPage()
-    p.save()
-    pdf = buffer.getvalue()
-    buffer.close()
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="expenses_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"'
-    return response
+    # queued for `manage.py run_report_worker` (rendered in-request when REPORT_JOBS_INLINE)
+    job = enqueue_report_job(kind=ReportJob.KIND_EXPENSES_PDF, params=report_filters(request), user=request.user)
+    return redirect("report_job_detail", pk=job.pk)
 
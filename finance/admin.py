@@ -1,5 +1,55 @@
 from django.contrib import admin
-from .models import BankAccount, BankTransaction
+from .forms import BankAccountForm, BankTransactionAdminForm
+from .models import BankAccount, BankTransaction, StatementPeriod
+from .services import locked_until, record_transaction, remove_transaction
 
-admin.site.register(BankAccount)
-admin.site.register(BankTransaction)
+
+
+@admin.register(BankAccount)
+class BankAccountAdmin(admin.ModelAdmin):
+    form = BankAccountForm  # refuses opening-balance edits once a month is closed
+    list_display = ("name", "bank_name", "opening_balance", "credits_total", "debits_total", "is_active")
+
+
+@admin.register(StatementPeriod)
+class StatementPeriodAdmin(admin.ModelAdmin):
+    list_display = ("account", "month", "opening", "credits", "debits", "closing", "closed_by", "closed_at")
+    list_filter = ("account",)
+
+    # snapshots are written by the month-close action only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BankTransaction)
+class BankTransactionAdmin(admin.ModelAdmin):
+    form = BankTransactionAdminForm  # refuses writes inside a closed month
+    list_display = ("date", "account", "tx_type", "title", "amount", "balance_after")
+    list_filter = ("account", "tx_type")
+    readonly_fields = ("balance_after",)
+
+    # ✅ route writes through the services so running balances stay in step
+    def save_model(self, request, obj, form, change):
+        record_transaction(obj)
+
+    def delete_model(self, request, obj):
+        remove_transaction(obj)
+
+    # rows inside a closed month are listed as protected, so neither the delete page
+    # nor the bulk delete action goes ahead
+    def get_deleted_objects(self, objs, request):
+        deleted, counts, perms_needed, protected = super().get_deleted_objects(objs, request)
+        locked = {}
+        for obj in objs:
+            if obj.account_id not in locked:
+                locked[obj.account_id] = locked_until(obj.account_id)
+            if locked[obj.account_id] and obj.date <= locked[obj.account_id]:
+                protected.append(f"{obj} ({obj.date:%B %Y} is closed)")
+        return deleted, counts, perms_needed, protected
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.delete_model(request, obj)
@@ -1,5 +1,6 @@
 from django import forms
 from .models import BankAccount, BankTransaction
+from .services import ClosedPeriodError, ensure_open
 from decimal import Decimal
 
 class BankAccountForm(forms.ModelForm):
@@ -9,7 +10,14 @@ class BankAccountForm(forms.ModelForm):
 
     def clean_opening_balance(self):
         bal = self.cleaned_data.get("opening_balance")
-        return bal if bal is not None else Decimal("0.00")
+        bal = bal if bal is not None else Decimal("0.00")
+        if (
+            self.instance.pk
+            and bal != self.instance.opening_balance
+            and self.instance.periods.exists()
+        ):
+            raise forms.ValidationError("The opening balance cannot change once a month has been closed.")
+        return bal
 
 
 class BankTransactionForm(forms.ModelForm):
@@ -28,4 +36,31 @@ class BankTransactionForm(forms.ModelForm):
         return amt
 
 
+class BankTransactionAdminForm(forms.ModelForm):
+    """Admin form: refuses to add, move or edit rows inside a closed month."""
 
+    class Meta:
+        model = BankTransaction
+        fields = "__all__"
+
+    def clean(self):
+        cleaned = super().clean()
+        account, d = cleaned.get("account"), cleaned.get("date")
+        try:
+            if account and d:
+                ensure_open(account.pk, d)
+            if self.instance.pk:
+                ensure_open(self.instance.account_id, self.instance.date)
+        except ClosedPeriodError as e:
+            raise forms.ValidationError(str(e))
+        return cleaned
+
+
+class StatementImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV or OFX/QFX export from the bank.")
+
+    def clean_file(self):
+        f = self.cleaned_data["file"]
+        if not f.name.lower().endswith((".csv", ".txt", ".ofx", ".qfx")):
+            raise forms.ValidationError("Upload a .csv, .ofx or .qfx statement file.")
+        return f
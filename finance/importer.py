@@ -0,0 +1,289 @@
+# finance/importer.py
+"""
+Bank statement import (CSV / OFX exports).
+
+1. parse   - streamed in chunks (CSV through pandas, OFX line by line) into frames of
+             date / title / reference / cents (signed, integer cents - exact)
+2. dedup   - against rows already keyed, by fingerprint (account, date, amount, reference);
+             one query per chunk, counted per fingerprint so genuinely repeated lines survive
+3. insert  - bulk_create, then balances recomputed from the earliest imported date on
+4. match   - imported deposits vs same-day Sale / CreditPayment totals with one pandas merge
+"""
+import re
+from collections import Counter
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncDate
+
+from sales.models import CreditPayment, Sale
+
+from .models import BankTransaction
+from .services import fingerprint, locked_until, post_bulk_transactions
+
+CHUNK_ROWS = 2000
+
+# first matching header wins (compared lower-cased, stripped)
+CSV_COLUMNS = {
+    "date": ("date", "transaction date", "trans date", "txn date", "posting date", "value date"),
+    "title": ("description", "narration", "details", "particulars", "title", "memo", "remarks"),
+    "reference": ("reference", "ref", "ref no", "reference no", "transaction id", "cheque no"),
+    "amount": ("amount",),
+    "credit": ("credit", "credits", "deposit", "deposits", "money in", "paid in"),
+    "debit": ("debit", "debits", "withdrawal", "withdrawals", "money out", "paid out"),
+}
+
+OFX_TAG = re.compile(r"<(/?)(\w+)>([^<\r\n]*)")
+
+
+class StatementFormatError(ValueError):
+    """The file is not a statement export we can read."""
+
+
+# ------------------------------------------------------------
+# ✅ Parsing
+# ------------------------------------------------------------
+def _to_cents(values: pd.Series) -> pd.Series:
+    """'1,234.50' / '(200.00)' / 'GHS -5' -> signed integer cents (NA when unreadable)."""
+    text = values.fillna("").astype(str).str.strip()
+    negative = text.str.startswith("(") & text.str.endswith(")")
+    number = pd.to_numeric(text.str.replace(r"[^\d.\-]", "", regex=True), errors="coerce")
+    number = number.where(~negative, -number.abs())
+    return (number * 100).round().astype("Int64")
+
+
+def _frame(dates, titles, references, cents) -> pd.DataFrame:
+    frame = pd.DataFrame({
+        "date": dates.dt.date,
+        "title": titles.fillna("").astype(str).str.strip().str.slice(0, 160),
+        "reference": references.fillna("").astype(str).str.strip().str.slice(0, 80),
+        "cents": cents,
+    })
+    return frame
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    """ISO dates as they are; anything else day-first (03/10/2026 is 3 October)."""
+    text = values.fillna("").astype(str).str.strip()
+    iso = pd.to_datetime(text, errors="coerce", format="ISO8601")
+    local = pd.to_datetime(text.where(iso.isna()), errors="coerce", dayfirst=True, format="mixed")
+    return iso.fillna(local)
+
+
+def _pick(columns, names):
+    lookup = {str(c).strip().lower(): c for c in columns}
+    for name in names:
+        if name in lookup:
+            return lookup[name]
+    return None
+
+
+def parse_csv(f, chunk_rows=CHUNK_ROWS):
+    """Yield statement frames from a CSV export, chunk_rows lines at a time."""
+    try:
+        reader = pd.read_csv(
+            f, dtype=str, keep_default_na=False, skipinitialspace=True,
+            encoding="utf-8-sig", encoding_errors="replace", chunksize=chunk_rows,
+        )
+        for chunk in reader:
+            cols = {key: _pick(chunk.columns, names) for key, names in CSV_COLUMNS.items()}
+            if cols["date"] is None or not (cols["amount"] or cols["credit"] or cols["debit"]):
+                raise StatementFormatError("The CSV needs a date column and an amount (or credit/debit) column.")
+
+            if cols["amount"] is not None:
+                cents = _to_cents(chunk[cols["amount"]])
+            else:
+                zero = pd.Series(0, index=chunk.index, dtype="Int64")
+                credit = _to_cents(chunk[cols["credit"]]).abs() if cols["credit"] else zero
+                debit = _to_cents(chunk[cols["debit"]]).abs() if cols["debit"] else zero
+                cents = credit.fillna(0) - debit.fillna(0)
+
+            empty = pd.Series("", index=chunk.index)
+            yield _frame(
+                _parse_dates(chunk[cols["date"]]),
+                chunk[cols["title"]] if cols["title"] else empty,
+                chunk[cols["reference"]] if cols["reference"] else empty,
+                cents,
+            )
+    except (pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        raise StatementFormatError(f"Could not read the CSV file: {e}")
+
+
+def parse_ofx(f, chunk_rows=CHUNK_ROWS):
+    """Yield statement frames from an OFX / QFX export (SGML or XML flavour), read line by line."""
+    records, current, seen_any = [], None, False
+
+    def flush():
+        data = pd.DataFrame(records, columns=["date", "title", "reference", "amount"])
+        dates = pd.to_datetime(data["date"].str.slice(0, 8), format="%Y%m%d", errors="coerce")
+        return _frame(dates, data["title"], data["reference"], _to_cents(data["amount"]))
+
+    for raw in f:
+        line = raw.decode("utf-8", "replace") if isinstance(raw, bytes) else raw
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if closing and current is not None:
+                    records.append([
+                        current.get("DTPOSTED", ""),
+                        current.get("NAME") or current.get("MEMO", ""),
+                        current.get("CHECKNUM") or current.get("REFNUM") or current.get("FITID", ""),
+                        current.get("TRNAMT", ""),
+                    ])
+                    current = None
+                    if len(records) >= chunk_rows:
+                        yield flush()
+                        records = []
+                elif not closing:
+                    current, seen_any = {}, True
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+
+    if not seen_any:
+        raise StatementFormatError("No <STMTTRN> entries found in the OFX file.")
+    if records:
+        yield flush()
+
+
+def parse_statement(upload):
+    name = (getattr(upload, "name", "") or "").lower()
+    if name.endswith((".ofx", ".qfx")):
+        return parse_ofx(upload)
+    return parse_csv(upload)
+
+
+# ------------------------------------------------------------
+# ✅ Matching deposits to takings
+# ------------------------------------------------------------
+def day_totals(start, end) -> pd.DataFrame:
+    """Same-day sales / credit payment totals as candidate deposits: day, source, rank, cents."""
+    sales = (
+        Sale.objects.filter(timestamp__date__range=(start, end)).exclude(payment_method="credit")
+        .annotate(day=TruncDate("timestamp")).values("day", "payment_method")
+        .annotate(total=Sum("amount_paid")).order_by()
+    )
+    payments = (
+        CreditPayment.objects.filter(paid_on__date__range=(start, end))
+        .annotate(day=TruncDate("paid_on")).values("day", "payment_method")
+        .annotate(total=Sum("amount")).order_by()
+    )
+    rows = [(r["day"], "sales", r["payment_method"], int((r["total"] or 0) * 100)) for r in sales]
+    rows += [(r["day"], "payments", r["payment_method"], int((r["total"] or 0) * 100)) for r in payments]
+    base = pd.DataFrame(rows, columns=["day", "kind", "method", "cents"])
+    if base.empty:
+        return pd.DataFrame(columns=["day", "source", "rank", "cents"])
+
+    takings = base.assign(kind="takings")
+    candidates = [
+        base.groupby(["day", "kind", "method"], as_index=False)["cents"].sum(),
+        takings.groupby(["day", "kind", "method"], as_index=False)["cents"].sum(),
+        base.groupby(["day", "kind"], as_index=False)["cents"].sum().assign(method=""),
+        takings.groupby(["day", "kind"], as_index=False)["cents"].sum().assign(method=""),
+    ]
+    frame = pd.concat(candidates, ignore_index=True)
+    frame["source"] = np.where(frame["method"] != "", frame["kind"] + ":" + frame["method"], frame["kind"])
+    # most specific first: sales:momo, payments:momo, takings:momo, then sales, payments, takings
+    frame["rank"] = np.where(frame["method"] != "", 0, 3) + frame["kind"].map({"sales": 0, "payments": 1, "takings": 2})
+    return frame[frame["cents"] > 0][["day", "source", "rank", "cents"]]
+
+
+def match_deposits(deposits: pd.DataFrame) -> dict:
+    """deposits: pk / date / cents -> {pk: source}. One merge, each day-total claimed once."""
+    if deposits.empty:
+        return {}
+    candidates = day_totals(deposits["date"].min(), deposits["date"].max())
+    if candidates.empty:
+        return {}
+
+    matched = (
+        deposits.merge(candidates, left_on=["date", "cents"], right_on=["day", "cents"])
+        .sort_values(["date", "rank", "pk"])
+        .drop_duplicates("pk")
+        .drop_duplicates(["day", "source"])
+    )
+    return dict(zip(matched["pk"], matched["source"]))
+
+
+# ------------------------------------------------------------
+# ✅ Import
+# ------------------------------------------------------------
+@transaction.atomic
+def import_statement(account, upload, *, user) -> dict:
+    """
+    Import a CSV / OFX statement into one account.
+    Returns counts: parsed, created, duplicates, locked, skipped, matched.
+    """
+    result = dict.fromkeys(("parsed", "created", "duplicates", "locked", "skipped", "matched"), 0)
+    locked = locked_until(account.pk)
+    last_id = BankTransaction.objects.aggregate(m=Max("id"))["m"] or 0
+    existing, seen = Counter(), Counter()
+    created_rows, deposits = [], []
+    note = f"Imported from {getattr(upload, 'name', 'statement')}"
+
+    for frame in parse_statement(upload):
+        result["parsed"] += len(frame)
+        valid = frame["date"].notna() & frame["cents"].notna() & (frame["cents"] != 0)
+        result["skipped"] += int((~valid).sum())
+        frame = frame[valid].copy()
+        frame["cents"] = frame["cents"].astype("int64")
+
+        if locked:
+            in_closed = frame["date"] <= locked
+            result["locked"] += int(in_closed.sum())
+            frame = frame[~in_closed]
+        if frame.empty:
+            continue
+
+        frame["fp"] = [
+            fingerprint(account.pk, d, Decimal(int(c)) / 100, ref)
+            for d, c, ref in zip(frame["date"], frame["cents"], frame["reference"])
+        ]
+
+        # rows keyed before this import started, per fingerprint (one query per chunk)
+        unknown = set(frame["fp"]) - set(existing)
+        if unknown:
+            existing.update({fp: 0 for fp in unknown})
+            existing.update({
+                r["fingerprint"]: r["n"]
+                for r in BankTransaction.objects.filter(account=account, fingerprint__in=unknown, id__lte=last_id)
+                .values("fingerprint").annotate(n=Count("id")).order_by()
+            })
+
+        occurrence = frame.groupby("fp").cumcount() + 1 + frame["fp"].map(seen).fillna(0).astype(int)
+        seen.update(frame["fp"].value_counts().to_dict())
+        duplicate = occurrence <= frame["fp"].map(existing).astype(int)
+        result["duplicates"] += int(duplicate.sum())
+        frame = frame[~duplicate]
+
+        rows = [
+            BankTransaction(
+                account=account,
+                tx_type="credit" if c > 0 else "debit",
+                title=title or "Statement line",
+                amount=Decimal(abs(int(c))) / 100,
+                date=d,
+                reference=ref,
+                notes=note,
+                created_by=user,
+                fingerprint=fp,
+            )
+            for d, title, ref, c, fp in zip(frame["date"], frame["title"], frame["reference"], frame["cents"], frame["fp"])
+        ]
+        created = BankTransaction.objects.bulk_create(rows, batch_size=500)
+        result["created"] += len(created)
+        created_rows += created
+        deposits += [(tx.pk, tx.date, int(tx.amount * 100)) for tx in created if tx.tx_type == "credit"]
+
+    post_bulk_transactions(account, created_rows)
+
+    matches = match_deposits(pd.DataFrame(deposits, columns=["pk", "date", "cents"]))
+    if matches:
+        BankTransaction.objects.bulk_update(
+            [BankTransaction(pk=int(pk), matched_source=source) for pk, source in matches.items()],
+            ["matched_source"], batch_size=500,
+        )
+    result["matched"] = len(matches)
+    return result
@@ -0,0 +1,48 @@
+# finance/ledger.py
+"""
+Ledger totals with conditional aggregation.
+
+Any two-sided ledger (bank credits/debits, vehicle income/expense, ...) summarised over
+several windows in ONE SELECT:
+
+    ledger_summary(
+        account.transactions.all(),
+        all=None,
+        month=Q(date__range=(start, end)),
+        filtered=Q(date__range=(start, end), tx_type="credit"),
+    )
+    -> {"all": {"credits", "debits", "net"}, "month": {...}, "filtered": {...}}
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+ZERO = Decimal("0.00")
+
+
+def ledger_summary(qs, *, credit="credit", debit="debit", type_field="tx_type", amount_field="amount", **windows):
+    """
+    credits / debits / net per named window (a Q, or None for every row of qs).
+    Each window becomes a pair of Sum(..., filter=Q) columns on a single aggregate query.
+    """
+    if not windows:
+        windows = {"all": None}
+
+    zero = Value(ZERO, output_field=DecimalField(max_digits=14, decimal_places=2))
+    columns = {}
+    for name, window in windows.items():
+        for side, tx_type in (("credits", credit), ("debits", debit)):
+            condition = Q(**{type_field: tx_type})
+            if window is not None:
+                condition &= window
+            columns[f"{name}__{side}"] = Coalesce(Sum(amount_field, filter=condition), zero)
+
+    row = qs.order_by().aggregate(**columns)
+
+    summary = {}
+    for name in windows:
+        credits = row[f"{name}__credits"]
+        debits = row[f"{name}__debits"]
+        summary[name] = {"credits": credits, "debits": debits, "net": credits - debits}
+    return summary
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.models import BankAccount
+from finance.services import rebuild_account_balances
+
+
+class Command(BaseCommand):
+    help = "Recompute BankTransaction.balance_after, the account running totals and the month totals."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--account", type=int, help="Only rebuild this account id.")
+
+    def handle(self, *args, **options):
+        accounts = BankAccount.objects.all().order_by("id")
+        if options.get("account"):
+            accounts = accounts.filter(pk=options["account"])
+            if not accounts.exists():
+                raise CommandError(f"No bank account #{options['account']}")
+
+        for account in accounts:
+            changed = rebuild_account_balances(account)
+            self.stdout.write(f"{account.name}: {changed} balance(s) corrected")
+
+        self.stdout.write(self.style.SUCCESS("Bank balances rebuilt"))
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:31
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_alter_bankaccount_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankMonthTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('credits', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('debits', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+            options={
+                'ordering': ['account', 'month'],
+            },
+        ),
+        migrations.AddField(
+            model_name='bankaccount',
+            name='credits_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='bankaccount',
+            name='debits_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='banktransaction',
+            name='balance_after',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14),
+        ),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['account', 'date', 'id'], name='banktx_account_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='bankmonthtotal',
+            name='account',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='month_totals', to='finance.bankaccount'),
+        ),
+        migrations.AddConstraint(
+            model_name='bankmonthtotal',
+            constraint=models.UniqueConstraint(fields=('account', 'month'), name='bankmonthtotal_unique_month'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def backfill_bank_balances(apps, schema_editor):
+    """
+    balance_after, account running totals and month buckets from the existing
+    transactions (frozen copy of finance.services.rebuild_account_balances).
+    """
+    BankAccount = apps.get_model("finance", "BankAccount")
+    BankTransaction = apps.get_model("finance", "BankTransaction")
+    BankMonthTotal = apps.get_model("finance", "BankMonthTotal")
+
+    for account in BankAccount.objects.all().iterator():
+        running = account.opening_balance or Decimal("0.00")
+        credits_total = debits_total = Decimal("0.00")
+        months = {}
+        changed = []
+
+        rows = BankTransaction.objects.filter(account_id=account.pk).order_by("date", "id")
+        for tx in rows.only("id", "date", "tx_type", "amount", "balance_after").iterator(chunk_size=BATCH_SIZE):
+            amount = tx.amount or Decimal("0.00")
+            bucket = months.setdefault(tx.date.replace(day=1), [Decimal("0.00"), Decimal("0.00")])
+            if tx.tx_type == "credit":
+                running += amount
+                credits_total += amount
+                bucket[0] += amount
+            else:
+                running -= amount
+                debits_total += amount
+                bucket[1] += amount
+            tx.balance_after = running
+            changed.append(tx)
+
+        BankTransaction.objects.bulk_update(changed, ["balance_after"], batch_size=BATCH_SIZE)
+        BankAccount.objects.filter(pk=account.pk).update(credits_total=credits_total, debits_total=debits_total)
+        BankMonthTotal.objects.bulk_create(
+            [BankMonthTotal(account_id=account.pk, month=k, credits=c, debits=d) for k, (c, d) in months.items()],
+            batch_size=BATCH_SIZE,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("finance", "0003_bankmonthtotal_bankaccount_credits_total_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_bank_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:33
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0004_backfill_bank_balances'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatementPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('opening', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('credits', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('debits', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('closing', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='periods', to='finance.bankaccount')),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['account', '-month'],
+                'constraints': [models.UniqueConstraint(fields=('account', 'month'), name='statementperiod_unique_month')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0005_statementperiod'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banktransaction',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='banktransaction',
+            name='matched_source',
+            field=models.CharField(blank=True, default='', max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['account', 'fingerprint'], name='banktx_account_fp_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+import hashlib
+from decimal import Decimal
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def _fingerprint(account_id, d, signed, reference):
+    # frozen copy of finance.services.fingerprint
+    key = f"{account_id}|{d.isoformat()}|{Decimal(signed).quantize(Decimal('0.01'))}|{(reference or '').strip().upper()}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    BankTransaction = apps.get_model("finance", "BankTransaction")
+
+    batch = []
+    rows = BankTransaction.objects.order_by("id").only("id", "account_id", "date", "tx_type", "amount", "reference")
+    for tx in rows.iterator(chunk_size=BATCH_SIZE):
+        amount = tx.amount or Decimal("0.00")
+        signed = amount if tx.tx_type == "credit" else -amount
+        tx.fingerprint = _fingerprint(tx.account_id, tx.date, signed, tx.reference)
+        batch.append(tx)
+        if len(batch) >= BATCH_SIZE:
+            BankTransaction.objects.bulk_update(batch, ["fingerprint"])
+            batch = []
+    BankTransaction.objects.bulk_update(batch, ["fingerprint"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("finance", "0006_banktransaction_fingerprint_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from decimal import Decimal
 
@@ -10,6 +10,12 @@ class BankAccount(models.Model):
     is_active = models.BooleanField(default=True)
     notes = models.TextField(blank=True)
 
+    # ✅ running totals, maintained by finance.services on every transaction write
+    credits_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"), editable=False)
+    debits_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"), editable=False)
+
+    TOTAL_FIELDS = ("credits_total", "debits_total")
+
     class Meta:
         ordering = ["-is_active", "name"]
 
@@ -17,6 +23,25 @@ class BankAccount(models.Model):
         label = self.bank_name or "Account"
         return f"{self.name} ({label})"
 
+    @property
+    def balance(self):
+        return (self.opening_balance or Decimal("0.00")) + self.credits_total - self.debits_total
+
+    def save(self, *args, **kwargs):
+        from .services import shift_opening_balance
+
+        if self.pk and kwargs.get("update_fields") is None:
+            # never write back the running totals from a (possibly stale) form instance
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.TOTAL_FIELDS
+            ]
+            with transaction.atomic():
+                shift_opening_balance(self)
+                super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
+
 
 class BankTransaction(models.Model):
     TYPES = [("credit", "Credit"), ("debit", "Debit")]
@@ -31,8 +56,68 @@ class BankTransaction(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # account balance straight after this row, in (date, id) order - opening balance included
+    balance_after = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"), editable=False)
+
+    # hash of (account, date, signed amount, reference): statement imports skip rows already keyed
+    fingerprint = models.CharField(max_length=40, blank=True, default="", editable=False)
+    # what an imported deposit was matched to, e.g. "sales:momo" / "takings" (see finance.importer)
+    matched_source = models.CharField(max_length=30, blank=True, default="")
+
     class Meta:
         ordering = ["-date", "-id"]
+        indexes = [
+            models.Index(fields=["account", "date", "id"], name="banktx_account_date_idx"),
+            models.Index(fields=["account", "fingerprint"], name="banktx_account_fp_idx"),
+        ]
 
     def __str__(self):
         return f"{self.account.name} - {self.tx_type} - ₵{self.amount}"
+
+
+class BankMonthTotal(models.Model):
+    """
+    Credits / debits per (account, calendar month), kept up to date by finance.services
+    alongside BankTransaction.balance_after; rebuild with: python manage.py rebuild_bank_balances
+    """
+    account = models.ForeignKey(BankAccount, on_delete=models.CASCADE, related_name="month_totals")
+    month = models.DateField()  # first day of the month
+    credits = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    debits = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        ordering = ["account", "month"]
+        constraints = [
+            models.UniqueConstraint(fields=["account", "month"], name="bankmonthtotal_unique_month"),
+        ]
+
+    def __str__(self):
+        return f"{self.account.name} {self.month:%Y-%m} — +₵{self.credits} / -₵{self.debits}"
+
+
+class StatementPeriod(models.Model):
+    """
+    Month-end snapshot of one account. Once a month is closed its transactions (and
+    every earlier one) are locked, and the statement for it is served from this row.
+    """
+    account = models.ForeignKey(BankAccount, on_delete=models.CASCADE, related_name="periods")
+    month = models.DateField()  # first day of the month
+    opening = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    credits = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    debits = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    closing = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    closed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["account", "-month"]
+        constraints = [
+            models.UniqueConstraint(fields=["account", "month"], name="statementperiod_unique_month"),
+        ]
+
+    def __str__(self):
+        return f"{self.account.name} {self.month:%Y-%m} closed — ₵{self.closing}"
+
+    @property
+    def net(self):
+        return self.credits - self.debits
@@ -0,0 +1,322 @@
+# finance/services.py
+import hashlib
+from calendar import monthrange
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import BankAccount, BankMonthTotal, BankTransaction, StatementPeriod
+
+ZERO = Decimal("0.00")
+
+
+class ClosedPeriodError(ValueError):
+    """A write that would change a month that has already been closed."""
+
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def month_end(d: date) -> date:
+    return d.replace(day=monthrange(d.year, d.month)[1])
+
+
+def next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def signed_amount(tx) -> Decimal:
+    amount = tx.amount or ZERO
+    return amount if tx.tx_type == "credit" else -amount
+
+
+def fingerprint(account_id, d: date, signed: Decimal, reference: str = "") -> str:
+    """Dedup key of a statement line: (account, date, signed amount, reference)."""
+    key = f"{account_id}|{d.isoformat()}|{Decimal(signed).quantize(Decimal('0.01'))}|{(reference or '').strip().upper()}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _rows_after(account_id, d, pk):
+    """Transactions that come after (d, pk) in statement order."""
+    return BankTransaction.objects.filter(account_id=account_id).filter(Q(date__gt=d) | Q(date=d, id__gt=pk))
+
+
+def _rows_before(account_id, d, pk):
+    return BankTransaction.objects.filter(account_id=account_id).filter(Q(date__lt=d) | Q(date=d, id__lt=pk))
+
+
+def _bump_month(*, account_id, month, credits, debits) -> None:
+    deltas = {k: v for k, v in (("credits", credits), ("debits", debits)) if v}
+    if not deltas:
+        return
+
+    bucket = BankMonthTotal.objects.filter(account_id=account_id, month=month)
+    if bucket.update(**{k: F(k) + v for k, v in deltas.items()}):
+        return
+    try:
+        with transaction.atomic():
+            BankMonthTotal.objects.create(account_id=account_id, month=month, **deltas)
+    except IntegrityError:
+        bucket.update(**{k: F(k) + v for k, v in deltas.items()})
+
+
+def _apply(tx, sign: int) -> None:
+    """
+    Post (sign=1) or reverse (sign=-1) one transaction against the stored totals:
+    account running totals, its month bucket and balance_after of every later row.
+    """
+    amount = (tx.amount or ZERO) * sign
+    credits = amount if tx.tx_type == "credit" else ZERO
+    debits = amount if tx.tx_type == "debit" else ZERO
+
+    BankAccount.objects.filter(pk=tx.account_id).update(
+        credits_total=F("credits_total") + credits,
+        debits_total=F("debits_total") + debits,
+    )
+    _bump_month(account_id=tx.account_id, month=month_start(tx.date), credits=credits, debits=debits)
+    if credits - debits:
+        _rows_after(tx.account_id, tx.date, tx.pk).update(balance_after=F("balance_after") + (credits - debits))
+
+
+def _lock_accounts(*account_ids) -> None:
+    # serialise writers per account so balance_after never interleaves
+    list(BankAccount.objects.select_for_update().filter(pk__in=set(account_ids)).values_list("pk", flat=True))
+
+
+def balance_before(account, d: date, pk=None) -> Decimal:
+    """Account balance just before (d, pk); the whole day when pk is None. One indexed lookup."""
+    if pk is None:
+        rows = BankTransaction.objects.filter(account_id=account.pk, date__lt=d)
+    else:
+        rows = _rows_before(account.pk, d, pk)
+    last = rows.order_by("-date", "-id").values_list("balance_after", flat=True).first()
+    return last if last is not None else (account.opening_balance or ZERO)
+
+
+# ------------------------------------------------------------
+# ✅ Closed periods
+# ------------------------------------------------------------
+def locked_until(account_id):
+    """Last day of the latest closed month of the account, or None."""
+    last = StatementPeriod.objects.filter(account_id=account_id).order_by("-month").values_list("month", flat=True).first()
+    return month_end(last) if last else None
+
+
+def ensure_open(account_id, d: date) -> None:
+    locked = locked_until(account_id)
+    if locked and d <= locked:
+        raise ClosedPeriodError(f"{d:%B %Y} is closed for this account (closed through {locked:%d %b %Y}).")
+
+
+@transaction.atomic
+def record_transaction(tx) -> BankTransaction:
+    """Save a new or edited transaction and keep the running balances in step."""
+    old = None
+    if tx.pk:
+        old = BankTransaction.objects.filter(pk=tx.pk).first()
+
+    _lock_accounts(tx.account_id, *([old.account_id] if old else []))
+    ensure_open(tx.account_id, tx.date)
+    if old is not None:
+        ensure_open(old.account_id, old.date)
+        _apply(old, -1)
+
+    tx.fingerprint = fingerprint(tx.account_id, tx.date, signed_amount(tx), tx.reference)
+    tx.save()
+    _apply(tx, 1)
+
+    tx.balance_after = balance_before(tx.account, tx.date, tx.pk) + signed_amount(tx)
+    BankTransaction.objects.filter(pk=tx.pk).update(balance_after=tx.balance_after)
+    return tx
+
+
+@transaction.atomic
+def remove_transaction(tx) -> None:
+    _lock_accounts(tx.account_id)
+    ensure_open(tx.account_id, tx.date)
+    _apply(tx, -1)
+    tx.delete()
+
+
+@transaction.atomic
+def post_bulk_transactions(account, txs) -> int:
+    """
+    Post rows that were bulk_created into one account (statement imports): the running
+    totals and month buckets move by their sums, and balance_after is recomputed only
+    from the earliest new date onwards. Returns the number of rows whose balance moved.
+    """
+    txs = [tx for tx in txs if tx.pk]
+    if not txs:
+        return 0
+
+    _lock_accounts(account.pk)
+    months = {}
+    for tx in txs:
+        bucket = months.setdefault(month_start(tx.date), [ZERO, ZERO])
+        bucket[0 if tx.tx_type == "credit" else 1] += tx.amount or ZERO
+    for month, (credits, debits) in months.items():
+        _bump_month(account_id=account.pk, month=month, credits=credits, debits=debits)
+    BankAccount.objects.filter(pk=account.pk).update(
+        credits_total=F("credits_total") + sum(c for c, _ in months.values()),
+        debits_total=F("debits_total") + sum(d for _, d in months.values()),
+    )
+
+    since = min(tx.date for tx in txs)
+    running = balance_before(account, since)
+    changed = []
+    rows = (
+        BankTransaction.objects.filter(account_id=account.pk, date__gte=since)
+        .order_by("date", "id")
+        .only("id", "date", "tx_type", "amount", "balance_after")
+    )
+    for tx in rows.iterator(chunk_size=1000):
+        running += signed_amount(tx)
+        if tx.balance_after != running:
+            tx.balance_after = running
+            changed.append(tx)
+    BankTransaction.objects.bulk_update(changed, ["balance_after"], batch_size=1000)
+    return len(changed)
+
+
+def shift_opening_balance(account) -> None:
+    """Called from BankAccount.save: an edited opening balance moves every balance_after."""
+    previous = BankAccount.objects.filter(pk=account.pk).values_list("opening_balance", flat=True).first()
+    if previous is None:
+        return
+    delta = (account.opening_balance or ZERO) - previous
+    if delta and StatementPeriod.objects.filter(account_id=account.pk).exists():
+        raise ClosedPeriodError("The opening balance cannot change once a month has been closed.")
+    if delta:
+        BankTransaction.objects.filter(account_id=account.pk).update(balance_after=F("balance_after") + delta)
+
+
+def month_statement(account, y: int, m: int) -> dict:
+    """Opening / credits / debits / closing for one calendar month from the stored totals."""
+    start = date(y, m, 1)
+    opening = balance_before(account, start)
+    bucket = BankMonthTotal.objects.filter(account=account, month=start).values("credits", "debits").first()
+    credits = bucket["credits"] if bucket else ZERO
+    debits = bucket["debits"] if bucket else ZERO
+    return {
+        "opening": opening,
+        "credits": credits,
+        "debits": debits,
+        "net": credits - debits,
+        "closing": opening + credits - debits,
+    }
+
+
+def statement_for(account, y: int, m: int) -> dict:
+    """The month's statement: the closed snapshot when there is one, else the live totals."""
+    period = StatementPeriod.objects.filter(account=account, month=date(y, m, 1)).first()
+    if period is None:
+        return {**month_statement(account, y, m), "period": None}
+    return {
+        "opening": period.opening,
+        "credits": period.credits,
+        "debits": period.debits,
+        "net": period.net,
+        "closing": period.closing,
+        "period": period,
+    }
+
+
+@transaction.atomic
+def close_month(account, y: int, m: int, *, user, today=None) -> list:
+    """
+    Snapshot every not-yet-closed month of the account up to and including (y, m)
+    into StatementPeriod rows. Returns the new periods, oldest first.
+    """
+    today = today or timezone.localdate()
+    target = date(y, m, 1)
+    if month_end(target) >= today:
+        raise ValueError("Only months that have ended can be closed.")
+
+    _lock_accounts(account.pk)
+    locked = locked_until(account.pk)
+    if locked and target <= locked:
+        raise ValueError(f"{target:%B %Y} is already closed.")
+
+    if locked:
+        first = next_month(locked)
+    else:
+        first_tx = BankMonthTotal.objects.filter(account=account).order_by("month").values_list("month", flat=True).first()
+        first = min(first_tx, target) if first_tx else target
+
+    buckets = {
+        b["month"]: b
+        for b in BankMonthTotal.objects.filter(account=account, month__range=(first, target)).values("month", "credits", "debits")
+    }
+
+    periods = []
+    opening = balance_before(account, first)
+    month = first
+    while month <= target:
+        bucket = buckets.get(month, {})
+        credits = bucket.get("credits", ZERO)
+        debits = bucket.get("debits", ZERO)
+        closing = opening + credits - debits
+        periods.append(StatementPeriod(
+            account=account, month=month, opening=opening,
+            credits=credits, debits=debits, closing=closing, closed_by=user,
+        ))
+        opening = closing
+        month = next_month(month)
+
+    return StatementPeriod.objects.bulk_create(periods)
+
+
+@transaction.atomic
+def reopen_month(account):
+    """Drop the latest closed period of the account (unlocks that month). Returns it, or None."""
+    _lock_accounts(account.pk)
+    period = StatementPeriod.objects.filter(account=account).order_by("-month").first()
+    if period is not None:
+        period.delete()
+    return period
+
+
+@transaction.atomic
+def rebuild_account_balances(account, *, batch_size=1000) -> int:
+    """
+    Recompute balance_after, the running totals and the month buckets of one account
+    from its transactions. Used by rebuild_bank_balances.
+    """
+    _lock_accounts(account.pk)
+    running = account.opening_balance or ZERO
+    credits_total = debits_total = ZERO
+    months = {}
+    changed = []
+
+    rows = (
+        BankTransaction.objects.filter(account_id=account.pk)
+        .order_by("date", "id")
+        .only("id", "date", "tx_type", "amount", "balance_after")
+    )
+    for tx in rows.iterator(chunk_size=batch_size):
+        amount = tx.amount or ZERO
+        bucket = months.setdefault(month_start(tx.date), [ZERO, ZERO])
+        if tx.tx_type == "credit":
+            running += amount
+            credits_total += amount
+            bucket[0] += amount
+        else:
+            running -= amount
+            debits_total += amount
+            bucket[1] += amount
+        if tx.balance_after != running:
+            tx.balance_after = running
+            changed.append(tx)
+
+    BankTransaction.objects.bulk_update(changed, ["balance_after"], batch_size=batch_size)
+    BankAccount.objects.filter(pk=account.pk).update(credits_total=credits_total, debits_total=debits_total)
+    BankMonthTotal.objects.filter(account_id=account.pk).delete()
+    BankMonthTotal.objects.bulk_create(
+        [BankMonthTotal(account_id=account.pk, month=k, credits=c, debits=d) for k, (c, d) in months.items()],
+        batch_size=batch_size,
+    )
+    return len(changed)
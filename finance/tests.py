@@ -1,3 +1,309 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+import pandas as pd
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import Q
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from sales.models import CreditPayment, Sale
+
+from .importer import import_statement, match_deposits, parse_csv, parse_ofx
+from .ledger import ledger_summary
+from .models import BankAccount, BankMonthTotal, BankTransaction, StatementPeriod
+from .services import (
+    close_month, month_statement, rebuild_account_balances, record_transaction, remove_transaction,
+)
+
+
+class RunningBalanceTests(TestCase):
+    def setUp(self):
+        self.account = BankAccount.objects.create(name="Ecobank", opening_balance=Decimal("100.00"))
+
+    def post(self, d, amount, tx_type="credit"):
+        return record_transaction(BankTransaction(
+            account=self.account, tx_type=tx_type, title="tx", amount=Decimal(amount), date=d,
+        ))
+
+    def balances(self):
+        return list(
+            BankTransaction.objects.filter(account=self.account).order_by("date", "id")
+            .values_list("date", "balance_after")
+        )
+
+    def assertMatchesRebuild(self):
+        self.assertEqual(rebuild_account_balances(self.account), 0)  # nothing left to correct
+
+    def test_back_dated_insert_moves_later_rows(self):
+        self.post(date(2025, 3, 1), "50.00")
+        self.post(date(2025, 3, 10), "20.00", "debit")
+        self.post(date(2025, 3, 5), "30.00")  # lands between the two
+
+        self.assertEqual(self.balances(), [
+            (date(2025, 3, 1), Decimal("150.00")),
+            (date(2025, 3, 5), Decimal("180.00")),
+            (date(2025, 3, 10), Decimal("160.00")),
+        ])
+        self.assertMatchesRebuild()
+
+    def test_edit_moves_the_row_and_its_amount(self):
+        first = self.post(date(2025, 3, 1), "50.00")
+        self.post(date(2025, 3, 10), "20.00", "debit")
+        self.post(date(2025, 3, 20), "5.00")
+
+        first.date = date(2025, 3, 15)
+        first.amount = Decimal("40.00")
+        record_transaction(first)
+
+        self.assertEqual(self.balances(), [
+            (date(2025, 3, 10), Decimal("80.00")),
+            (date(2025, 3, 15), Decimal("120.00")),
+            (date(2025, 3, 20), Decimal("125.00")),
+        ])
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("125.00"))
+        self.assertMatchesRebuild()
+
+    def test_delete_and_month_statement(self):
+        self.post(date(2025, 2, 20), "10.00")
+        march = self.post(date(2025, 3, 2), "30.00")
+        self.post(date(2025, 3, 9), "15.00", "debit")
+        remove_transaction(march)
+
+        self.assertEqual(month_statement(self.account, 2025, 3), {
+            "opening": Decimal("110.00"), "credits": Decimal("0.00"), "debits": Decimal("15.00"),
+            "net": Decimal("-15.00"), "closing": Decimal("95.00"),
+        })
+        self.assertMatchesRebuild()
+
+    def test_opening_balance_edit_shifts_every_row(self):
+        self.post(date(2025, 3, 1), "50.00")
+        self.account.opening_balance = Decimal("0.00")
+        self.account.save()
+        self.assertEqual(self.balances(), [(date(2025, 3, 1), Decimal("50.00"))])
+        self.assertEqual(BankMonthTotal.objects.get().credits, Decimal("50.00"))
+
+
+class LedgerSummaryTests(TestCase):
+    def setUp(self):
+        self.account = BankAccount.objects.create(name="Main", bank_name="Ecobank")
+        other = BankAccount.objects.create(name="MoMo")
+        rows = [
+            ("credit", "100.00", date(2026, 4, 30)),
+            ("debit", "40.00", date(2026, 4, 2)),
+            ("credit", "250.50", date(2026, 5, 1)),
+            ("credit", "49.50", date(2026, 5, 31)),
+            ("debit", "75.25", date(2026, 5, 15)),
+            ("debit", "10.00", date(2026, 6, 1)),
+        ]
+        BankTransaction.objects.bulk_create([
+            BankTransaction(account=self.account, tx_type=t, title="x", amount=Decimal(a), date=d)
+            for t, a, d in rows
+        ])
+        BankTransaction.objects.create(account=other, tx_type="credit", title="x", amount=Decimal("999.00"), date=date(2026, 5, 5))
+
+    def test_all_windows_in_one_query(self):
+        may = Q(date__range=(date(2026, 5, 1), date(2026, 5, 31)))
+        with self.assertNumQueries(1):
+            summary = ledger_summary(
+                self.account.transactions.all(),
+                all=None,
+                month=may,
+                filtered=may & Q(amount__gte=50),
+            )
+
+        self.assertEqual(summary["all"], {
+            "credits": Decimal("400.00"), "debits": Decimal("125.25"), "net": Decimal("274.75"),
+        })
+        self.assertEqual(summary["month"], {
+            "credits": Decimal("300.00"), "debits": Decimal("75.25"), "net": Decimal("224.75"),
+        })
+        self.assertEqual(summary["filtered"], {
+            "credits": Decimal("250.50"), "debits": Decimal("75.25"), "net": Decimal("175.25"),
+        })
+
+    def test_empty_window_is_zero(self):
+        summary = ledger_summary(self.account.transactions.all(), march=Q(date__month=3))
+        self.assertEqual(summary["march"], {"credits": Decimal("0.00"), "debits": Decimal("0.00"), "net": Decimal("0.00")})
+
+    def test_defaults_to_all_rows(self):
+        self.assertEqual(ledger_summary(BankTransaction.objects.all())["all"]["credits"], Decimal("1399.00"))
+
+
+class CloseMonthTests(TestCase):
+    def setUp(self):
+        self.account = BankAccount.objects.create(name="Main")
+
+    def test_current_local_month_cannot_close(self):
+        today = timezone.localdate()
+        with self.assertRaises(ValueError):
+            close_month(self.account, today.year, today.month, user=None)
+        self.assertFalse(StatementPeriod.objects.exists())
+
+    def test_closes_through_an_ended_month(self):
+        periods = close_month(self.account, 2026, 2, user=None, today=date(2026, 3, 1))
+        self.assertEqual([p.month for p in periods], [date(2026, 2, 1)])
+
+
+class ClosedPeriodAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin"))
+        self.account = BankAccount.objects.create(name="Main")
+        self.feb = record_transaction(BankTransaction(
+            account=self.account, tx_type="credit", title="rent", amount=Decimal("50.00"), date=date(2026, 2, 10),
+        ))
+        close_month(self.account, 2026, 2, user=None, today=date(2026, 3, 1))
+
+    def form_data(self, **overrides):
+        data = {"account": self.account.pk, "tx_type": "credit", "title": "rent", "amount": "50.00", "date": "2026-02-10",
+                "reference": "", "notes": "", "created_by": ""}
+        data.update(overrides)
+        return data
+
+    def test_edit_inside_a_closed_month_is_a_form_error(self):
+        url = reverse("admin:finance_banktransaction_change", args=[self.feb.pk])
+        response = self.client.post(url, self.form_data(amount="80.00"))
+        self.assertEqual(response.status_code, 200)  # form shown again, nothing saved
+        self.assertIn("is closed for this account", response.content.decode())
+        self.feb.refresh_from_db()
+        self.assertEqual(self.feb.amount, Decimal("50.00"))
+
+        # moving the row out of the closed month is refused too
+        response = self.client.post(url, self.form_data(date="2026-03-05"))
+        self.assertEqual(response.status_code, 200)
+        self.feb.refresh_from_db()
+        self.assertEqual(self.feb.date, date(2026, 2, 10))
+
+    def test_add_into_a_closed_month_is_a_form_error(self):
+        response = self.client.post(reverse("admin:finance_banktransaction_add"), self.form_data(date="2026-02-20"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(BankTransaction.objects.count(), 1)
+
+        response = self.client.post(reverse("admin:finance_banktransaction_add"), self.form_data(date="2026-03-02"))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(BankTransaction.objects.count(), 2)
+
+    def test_locked_rows_cannot_be_deleted(self):
+        response = self.client.post(reverse("admin:finance_banktransaction_delete", args=[self.feb.pk]), {"post": "yes"})
+        self.assertContains(response, "is closed")  # confirmation page lists it as protected
+
+        response = self.client.post(reverse("admin:finance_banktransaction_changelist"), {
+            "action": "delete_selected", "_selected_action": [self.feb.pk], "post": "yes",
+        })
+        self.assertContains(response, "is closed")
+        self.assertTrue(BankTransaction.objects.filter(pk=self.feb.pk).exists())
+
+
+OFX = b"""OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20260305120000
+<TRNAMT>150.25
+<FITID>F-1
+<NAME>MoMo settlement
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20260306
+<TRNAMT>-20.00
+<FITID>F-2
+<CHECKNUM>0042
+<MEMO>Cheque
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+class StatementImportTests(TestCase):
+    def setUp(self):
+        self.account = BankAccount.objects.create(name="Main", opening_balance=Decimal("10.00"))
+
+    def frame(self, chunks):
+        return pd.concat(list(chunks), ignore_index=True)
+
+    def upload(self, text, name="statement.csv"):
+        return SimpleUploadedFile(name, text.encode())
+
+    def test_csv_signs_brackets_and_day_first_dates(self):
+        frame = self.frame(parse_csv(StringIO(
+            "Date,Narration,Amount,Ref No\n"
+            '2026-03-02,Deposit,"1,234.50",R1\n'
+            "03/04/2026,Charges,(200.00),\n"
+            "2026-03-05,Transfer,GHS -5,\n"
+            "2026-03-06,Junk,n/a,\n"
+        )))
+        self.assertEqual(list(frame["date"][:3]), [date(2026, 3, 2), date(2026, 4, 3), date(2026, 3, 5)])
+        self.assertEqual(list(frame["cents"][:3]), [123450, -20000, -500])
+        self.assertTrue(pd.isna(frame["cents"][3]))
+        self.assertEqual(list(frame["reference"]), ["R1", "", "", ""])
+
+    def test_csv_credit_and_debit_columns(self):
+        frame = self.frame(parse_csv(StringIO(
+            "Posting Date,Details,Money In,Money Out\n"
+            "2026-03-02,In,50.00,\n"
+            "2026-03-03,Out,,12.50\n"
+        )))
+        self.assertEqual(list(frame["cents"]), [5000, -1250])
+
+    def test_ofx_transactions(self):
+        frame = self.frame(parse_ofx(BytesIO(OFX)))
+        self.assertEqual(list(frame["date"]), [date(2026, 3, 5), date(2026, 3, 6)])
+        self.assertEqual(list(frame["title"]), ["MoMo settlement", "Cheque"])
+        self.assertEqual(list(frame["reference"]), ["F-1", "0042"])
+        self.assertEqual(list(frame["cents"]), [15025, -2000])
+
+    def test_repeated_import_is_deduplicated(self):
+        text = (
+            "Date,Description,Amount\n"
+            "2026-03-02,Cash,40.00\n"
+            "2026-03-02,Cash,40.00\n"  # the same line twice on the statement is two rows
+            "2026-03-03,Fee,-5.00\n"
+        )
+        first = import_statement(self.account, self.upload(text), user=None)
+        self.assertEqual((first["created"], first["duplicates"]), (3, 0))
+
+        again = import_statement(self.account, self.upload(text + "2026-03-04,Cash,7.00\n"), user=None)
+        self.assertEqual((again["created"], again["duplicates"]), (1, 3))
+        self.assertEqual(BankTransaction.objects.count(), 4)
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal("92.00"))
+        self.assertEqual(rebuild_account_balances(self.account), 0)
+
+    def test_back_dated_import_moves_only_later_balances(self):
+        record_transaction(BankTransaction(
+            account=self.account, tx_type="credit", title="x", amount=Decimal("5.00"), date=date(2026, 3, 1),
+        ))
+        later = record_transaction(BankTransaction(
+            account=self.account, tx_type="debit", title="x", amount=Decimal("3.00"), date=date(2026, 3, 20),
+        ))
+        import_statement(self.account, self.upload("Date,Description,Amount\n2026-03-10,Deposit,100.00\n"), user=None)
+
+        later.refresh_from_db()
+        self.assertEqual(later.balance_after, Decimal("112.00"))
+        self.assertEqual(BankMonthTotal.objects.get().credits, Decimal("105.00"))
+        self.assertEqual(rebuild_account_balances(self.account), 0)
+
+    def test_deposits_match_the_most_specific_day_total(self):
+        noon = timezone.make_aware(datetime.combine(date(2026, 3, 2), time(12)))
+        for method, paid in (("momo", "30.00"), ("momo", "20.00"), ("cash", "15.00")):
+            sale = Sale.objects.create(payment_method=method, total_amount=Decimal(paid), amount_paid=Decimal(paid))
+            Sale.objects.filter(pk=sale.pk).update(timestamp=noon)
+        credit = Sale.objects.create(payment_method="credit", total_amount=Decimal("40.00"), is_credit=True)
+        CreditPayment.objects.create(sale=credit, amount=Decimal("12.00"), payment_method="cash", paid_on=noon)
 
-# Create your tests here.
+        deposits = pd.DataFrame([
+            (1, date(2026, 3, 2), 5000),   # momo sales
+            (2, date(2026, 3, 2), 5000),   # the momo total is already claimed
+            (3, date(2026, 3, 2), 6500),   # all sales
+            (4, date(2026, 3, 2), 1200),   # the cash credit payments
+            (5, date(2026, 3, 2), 2700),   # cash sales + cash payments
+            (6, date(2026, 3, 3), 1500),   # nothing that day
+        ], columns=["pk", "date", "cents"])
+        self.assertEqual(match_deposits(deposits), {1: "sales:momo", 3: "sales", 4: "payments:cash", 5: "takings:cash"})
@@ -10,6 +10,9 @@ urlpatterns = [
 
     path("account/<int:account_id>/", views.account_detail, name="account_detail"),
     path("account/<int:account_id>/tx/add/", views.tx_add, name="tx_add"),
+    path("account/<int:account_id>/close/", views.month_close, name="month_close"),
+    path("account/<int:account_id>/reopen/", views.month_reopen, name="month_reopen"),
+    path("account/<int:account_id>/import/", views.statement_import, name="statement_import"),
 
     path("tx/<int:tx_id>/delete/", views.tx_delete, name="tx_delete"),
 ]
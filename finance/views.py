@@ -4,34 +4,39 @@ from decimal import Decimal
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Sum
+from django.db.models import Q
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
 
-from users.utils import has_any_group
+from users.utils import has_any_group, user_in_groups
 from .models import BankAccount, BankTransaction
-from .forms import BankAccountForm, BankTransactionForm
+from .forms import BankAccountForm, BankTransactionForm, StatementImportForm
+from .importer import StatementFormatError, import_statement
+from .ledger import ledger_summary
+from .services import (
+    ClosedPeriodError, close_month, locked_until, record_transaction, remove_transaction,
+    reopen_month, statement_for,
+)
 
 
 @login_required
 @has_any_group("Admin", "Accountant", "Staff")
 def account_list(request):
+    # ✅ one query: balances come from the stored running totals
     accounts = BankAccount.objects.all().order_by("-is_active", "name")
 
     rows = []
     total_balance = Decimal("0.00")
 
     for a in accounts:
-        credits = a.transactions.filter(tx_type="credit").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-        debits  = a.transactions.filter(tx_type="debit").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-        opening = a.opening_balance or Decimal("0.00")
-
-        balance = opening + credits - debits
+        balance = a.balance
         total_balance += balance
 
         rows.append({
             "account": a,
-            "credits": credits,
-            "debits": debits,
+            "credits": a.credits_total,
+            "debits": a.debits_total,
             "balance": balance,
         })
 
@@ -88,8 +93,9 @@ def account_detail(request, account_id):
     account = get_object_or_404(BankAccount, id=account_id)
 
     # Defaults: current month
-    y = int(request.GET.get("y", date.today().year))
-    m = int(request.GET.get("m", date.today().month))
+    today = timezone.localdate()
+    y = int(request.GET.get("y", today.year))
+    m = int(request.GET.get("m", today.month))
     last_day = monthrange(y, m)[1]
     start_month = date(y, m, 1)
     end_month = date(y, m, last_day)
@@ -122,21 +128,16 @@ def account_detail(request, account_id):
     # Form for adding transaction
     tx_form = BankTransactionForm()
 
-    # Monthly summary (month only, not extra filters)
-    month_tx = account.transactions.filter(date__range=(start_month, end_month))
-    month_credits = month_tx.filter(tx_type="credit").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-    month_debits  = month_tx.filter(tx_type="debit").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-    month_net = month_credits - month_debits
+    # ✅ Monthly statement (month only, not extra filters): closed snapshot or stored month totals
+    statement = statement_for(account, y, m)
+    period = statement["period"]
+    is_admin = request.user.is_superuser or user_in_groups(request.user, "Admin")
 
-    # Totals (account overall)
-    all_credits = account.transactions.filter(tx_type="credit").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-    all_debits  = account.transactions.filter(tx_type="debit").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-    opening = account.opening_balance or Decimal("0.00")
-    current_balance = opening + all_credits - all_debits
+    # Totals (account overall) - stored running totals
+    current_balance = account.balance
 
-    # Totals for currently displayed list (filtered tx)
-    total_credits = tx.filter(tx_type="credit").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
-    total_debits  = tx.filter(tx_type="debit").aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
+    # Totals for currently displayed list (filtered tx) - one conditional-aggregate query
+    shown = ledger_summary(tx, shown=None)["shown"]
 
     return render(request, "finance/account_detail.html", {
         "account": account,
@@ -150,12 +151,19 @@ def account_detail(request, account_id):
         "q": q,
 
         "current_balance": current_balance,
-        "total_credits": total_credits,
-        "total_debits": total_debits,
-
-        "month_credits": month_credits,
-        "month_debits": month_debits,
-        "month_net": month_net,
+        "total_credits": shown["credits"],
+        "total_debits": shown["debits"],
+
+        "month_credits": statement["credits"],
+        "month_debits": statement["debits"],
+        "month_net": statement["net"],
+        "month_opening": statement["opening"],
+        "month_closing": statement["closing"],
+
+        "period": period,
+        "can_close": period is None and end_month < today
+                     and (is_admin or user_in_groups(request.user, "Accountant")),
+        "can_reopen": period is not None and is_admin and locked_until(account.id) == end_month,
     })
 
 
@@ -172,8 +180,11 @@ def tx_add(request, account_id):
         tx = form.save(commit=False)
         tx.account = account
         tx.created_by = request.user
-        tx.save()
-        messages.success(request, "✅ Transaction saved.")
+        try:
+            record_transaction(tx)
+            messages.success(request, "✅ Transaction saved.")
+        except ClosedPeriodError as e:
+            messages.error(request, f"❌ {e}")
     else:
         messages.error(request, "❌ Transaction not saved. Please check the form.")
 
@@ -187,11 +198,84 @@ def tx_delete(request, tx_id):
     account_id = tx.account_id
 
     if request.method == "POST":
-        tx.delete()
-        messages.success(request, "🗑️ Transaction deleted.")
+        try:
+            remove_transaction(tx)
+            messages.success(request, "🗑️ Transaction deleted.")
+        except ClosedPeriodError as e:
+            messages.error(request, f"❌ {e}")
 
     return redirect("finance:account_detail", account_id=account_id)
 
+
+# ------------------------------------------------------------
+# ✅ Month close
+# ------------------------------------------------------------
+@login_required
+@has_any_group("Admin", "Accountant")
+def month_close(request, account_id):
+    account = get_object_or_404(BankAccount, id=account_id)
+    y, m = request.POST.get("y"), request.POST.get("m")
+
+    if request.method != "POST" or not (y and m):
+        return redirect("finance:account_detail", account_id=account.id)
+
+    try:
+        periods = close_month(account, int(y), int(m), user=request.user)
+        messages.success(request, f"🔒 Closed {len(periods)} month(s) through {int(m):02d}/{y}.")
+    except ValueError as e:
+        messages.error(request, f"❌ {e}")
+
+    return redirect(f"{reverse('finance:account_detail', args=[account.id])}?y={y}&m={m}")
+
+
+@login_required
+@has_any_group("Admin")
+def month_reopen(request, account_id):
+    account = get_object_or_404(BankAccount, id=account_id)
+
+    if request.method == "POST":
+        period = reopen_month(account)
+        if period is not None:
+            messages.success(request, f"🔓 Reopened {period.month:%B %Y}.")
+            return redirect(
+                f"{reverse('finance:account_detail', args=[account.id])}?y={period.month.year}&m={period.month.month}"
+            )
+
+    return redirect("finance:account_detail", account_id=account.id)
+
+
+# ------------------------------------------------------------
+# ✅ Statement import
+# ------------------------------------------------------------
+@login_required
+@has_any_group("Admin", "Accountant")
+def statement_import(request, account_id):
+    account = get_object_or_404(BankAccount, id=account_id)
+
+    if request.method == "POST":
+        form = StatementImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                r = import_statement(account, form.cleaned_data["file"], user=request.user)
+            except StatementFormatError as e:
+                form.add_error("file", str(e))
+            else:
+                messages.success(
+                    request,
+                    f"✅ Imported {r['created']} of {r['parsed']} line(s): {r['duplicates']} already recorded, "
+                    f"{r['locked']} in closed months, {r['skipped']} unreadable; "
+                    f"{r['matched']} deposit(s) matched to sales.",
+                )
+                return redirect("finance:account_detail", account_id=account.id)
+        messages.error(request, "❌ Statement not imported. Please check the file.")
+    else:
+        form = StatementImportForm()
+
+    return render(request, "finance/statement_import.html", {
+        "form": form,
+        "account": account,
+    })
+
 # from datetime import date
 # from django.db import models
 
@@ -5,6 +5,8 @@ from .models import (
     ProductWeightPrice,
     StockEntry,
     StockOut,
+    StockReceipt,
+    StockBox,
 )
 
 @admin.register(Category)
@@ -53,3 +55,20 @@ class StockOutAdmin(admin.ModelAdmin):
     list_filter = ("reason", "created_at", "created_by")
     search_fields = ("product__name",)
     ordering = ("-created_at",)
+
+
+@admin.register(StockReceipt)
+class StockReceiptAdmin(admin.ModelAdmin):
+    list_display = ("id", "product", "boxes_received", "box_weight_kg", "batch_code", "expiry_date", "received_by", "received_on")
+    list_filter = ("received_on", "expiry_date")
+    search_fields = ("product__name", "batch_code")
+    ordering = ("-received_on",)
+
+
+@admin.register(StockBox)
+class StockBoxAdmin(admin.ModelAdmin):
+    list_display = ("id", "product", "receipt", "capacity_kg", "remaining_kg", "created_on", "consumed_on")
+    list_filter = ("product", "consumed_on")
+    search_fields = ("product__name", "receipt__batch_code")
+    raw_id_fields = ("receipt", "product")
+    ordering = ("product", "id")
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('boxes_received', models.PositiveIntegerField(default=0)),
+                ('box_weight_kg', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('batch_code', models.CharField(blank=True, max_length=60)),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('received_on', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='inventory.product')),
+                ('received_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockBox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('capacity_kg', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('remaining_kg', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('consumed_on', models.DateTimeField(blank=True, null=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_boxes', to='inventory.product')),
+                ('receipt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='boxes', to='inventory.stockreceipt')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('remaining_kg__gt', 0)), fields=['product', 'id'], name='stockbox_open_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+
+
+def backfill_stock_boxes(apps, schema_editor):
+    """
+    Move boxed-weight stock held on Product.boxes_in_stock / box_remaining_kg
+    into the box ledger: one OPENING receipt per product, the part-used box first.
+    """
+    Product = apps.get_model("inventory", "Product")
+    StockReceipt = apps.get_model("inventory", "StockReceipt")
+    StockBox = apps.get_model("inventory", "StockBox")
+
+    products = Product.objects.filter(is_weighted=True, boxes_in_stock__gt=0, box_weight_kg__gt=0)
+    for product in products.iterator(chunk_size=200):
+        bw = product.box_weight_kg
+        br = product.box_remaining_kg if product.box_remaining_kg > 0 else bw
+
+        receipt = StockReceipt.objects.create(
+            product=product,
+            boxes_received=product.boxes_in_stock,
+            box_weight_kg=bw,
+            batch_code="OPENING",
+        )
+        StockBox.objects.bulk_create(
+            [
+                StockBox(
+                    receipt=receipt,
+                    product=product,
+                    capacity_kg=bw,
+                    remaining_kg=br if i == 0 else bw,
+                )
+                for i in range(product.boxes_in_stock)
+            ],
+            batch_size=500,
+        )
+
+
+def remove_opening_boxes(apps, schema_editor):
+    StockReceipt = apps.get_model("inventory", "StockReceipt")
+    StockReceipt.objects.filter(batch_code="OPENING").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0002_stockreceipt_stockbox"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_stock_boxes, remove_opening_boxes),
+    ]
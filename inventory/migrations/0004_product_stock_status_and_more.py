@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_backfill_stock_boxes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_status',
+            field=models.CharField(choices=[('ok', 'In stock'), ('low', 'Low'), ('out', 'Out of stock')], default='ok', editable=False, max_length=3),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['stock_status', 'name'], name='product_stock_status_idx'),
+        ),
+    ]
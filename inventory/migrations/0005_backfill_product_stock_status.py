@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def _status(p):
+    # frozen copy of Product.compute_stock_status / available_weight_kg
+    if p.is_weighted:
+        available = Decimal("0.00")
+        bw = Decimal(p.box_weight_kg or 0)
+        if p.boxes_in_stock > 0 and bw > 0:
+            br = max(Decimal(p.box_remaining_kg or 0), Decimal("0.00")) or bw
+            available = Decimal(max(p.boxes_in_stock - 1, 0)) * bw + br
+        threshold = Decimal(p.min_quantity_alert or 0) * bw
+    else:
+        available = Decimal(p.quantity or 0)
+        threshold = Decimal(p.min_quantity_alert or 0)
+    if available <= 0:
+        return "out"
+    return "low" if available <= threshold else "ok"
+
+
+def backfill_stock_status(apps, schema_editor):
+    Product = apps.get_model("inventory", "Product")
+    changed = []
+    for p in Product.objects.iterator(chunk_size=1000):
+        status = _status(p)
+        if status != p.stock_status:
+            p.stock_status = status
+            changed.append(p)
+    Product.objects.bulk_update(changed, ["stock_status"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0004_product_stock_status_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_stock_status, migrations.RunPython.noop),
+    ]
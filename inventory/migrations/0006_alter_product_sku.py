@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_backfill_product_stock_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+    ]
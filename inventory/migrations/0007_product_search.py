@@ -0,0 +1,66 @@
+from django.db import migrations
+
+# see inventory/search.py
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # icontains compiles to UPPER(col::text) LIKE UPPER('%q%'); these make it index-assisted
+    "CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON inventory_product USING gin (UPPER(name) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS product_sku_trgm_idx ON inventory_product USING gin (UPPER(sku) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS category_name_trgm_idx ON inventory_category USING gin (UPPER(name) gin_trgm_ops)",
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS product_name_trgm_idx",
+    "DROP INDEX IF EXISTS product_sku_trgm_idx",
+    "DROP INDEX IF EXISTS category_name_trgm_idx",
+]
+
+_FTS_ROW = (
+    "new.id, new.name, COALESCE(new.sku, ''), "
+    "COALESCE((SELECT name FROM inventory_category WHERE id = new.category_id), '')"
+)
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS inventory_product_fts USING fts5("
+    "name, sku, category, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO inventory_product_fts (rowid, name, sku, category) "
+    "SELECT p.id, p.name, COALESCE(p.sku, ''), COALESCE(c.name, '') "
+    "FROM inventory_product p LEFT JOIN inventory_category c ON c.id = p.category_id",
+    "CREATE TRIGGER IF NOT EXISTS inventory_product_fts_ai AFTER INSERT ON inventory_product BEGIN "
+    f"INSERT INTO inventory_product_fts (rowid, name, sku, category) VALUES ({_FTS_ROW}); END",
+    # stock updates only SET quantity / box counters, so they don't fire this one
+    "CREATE TRIGGER IF NOT EXISTS inventory_product_fts_au AFTER UPDATE OF name, sku, category_id ON inventory_product BEGIN "
+    "DELETE FROM inventory_product_fts WHERE rowid = old.id; "
+    f"INSERT INTO inventory_product_fts (rowid, name, sku, category) VALUES ({_FTS_ROW}); END",
+    "CREATE TRIGGER IF NOT EXISTS inventory_product_fts_ad AFTER DELETE ON inventory_product BEGIN "
+    "DELETE FROM inventory_product_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS inventory_category_fts_au AFTER UPDATE OF name ON inventory_category BEGIN "
+    "UPDATE inventory_product_fts SET category = new.name "
+    "WHERE rowid IN (SELECT id FROM inventory_product WHERE category_id = new.id); END",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS inventory_product_fts_ai",
+    "DROP TRIGGER IF EXISTS inventory_product_fts_au",
+    "DROP TRIGGER IF EXISTS inventory_product_fts_ad",
+    "DROP TRIGGER IF EXISTS inventory_category_fts_au",
+    "DROP TABLE IF EXISTS inventory_product_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0006_alter_product_sku"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD, "sqlite": SQLITE_FORWARD}),
+            _run({"postgresql": POSTGRES_REVERSE, "sqlite": SQLITE_REVERSE}),
+        ),
+    ]
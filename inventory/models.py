@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from decimal import Decimal
 from django.utils import timezone
@@ -17,7 +17,7 @@ class Product(models.Model):
     ]
     track_method = models.CharField(max_length=20, choices=TRACK_METHODS, default="unit")
     name = models.CharField(max_length=200)
-    sku = models.CharField(max_length=100, blank=True, null=True)
+    sku = models.CharField(max_length=100, blank=True, null=True, db_index=True)  # exact-match barcode lookups
     category = models.ForeignKey('Category', on_delete=models.SET_NULL, null=True, blank=True)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)  # retail price
     wholesale_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
@@ -32,7 +32,53 @@ class Product(models.Model):
     image = models.ImageField(upload_to='products/', blank=True, null=True)   # <--- NEW
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
-    
+
+    # ✅ stock-status read model (kept current on every stock mutation, see sync_stock_status)
+    STOCK_OK, STOCK_LOW, STOCK_OUT = "ok", "low", "out"
+    STOCK_STATUSES = [(STOCK_OK, "In stock"), (STOCK_LOW, "Low"), (STOCK_OUT, "Out of stock")]
+    STOCK_FIELDS = frozenset({
+        "quantity", "min_quantity_alert", "is_weighted", "boxes_in_stock", "box_remaining_kg", "box_weight_kg",
+    })
+    stock_status = models.CharField(max_length=3, choices=STOCK_STATUSES, default=STOCK_OK, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["stock_status", "name"], name="product_stock_status_idx"),
+        ]
+
+    def compute_stock_status(self) -> str:
+        """
+        Unit products: out at 0, low at or below min_quantity_alert.
+        Weighted products: same rule on available kg, min_quantity_alert counted in boxes.
+        """
+        if self.is_weighted:
+            available = self.available_weight_kg()
+            threshold = Decimal(self.min_quantity_alert or 0) * Decimal(self.box_weight_kg or 0)
+        else:
+            available = Decimal(self.quantity or 0)
+            threshold = Decimal(self.min_quantity_alert or 0)
+        if available <= 0:
+            return self.STOCK_OUT
+        return self.STOCK_LOW if available <= threshold else self.STOCK_OK
+
+    def sync_stock_status(self) -> bool:
+        """Refresh self.stock_status in memory; True when it changed."""
+        status = self.compute_stock_status()
+        changed = status != self.stock_status
+        self.stock_status = status
+        return changed
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or self.STOCK_FIELDS & set(update_fields):
+            changed = self.sync_stock_status()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "stock_status"}
+            if changed or self._state.adding:
+                from .services import invalidate_stock_summary
+                invalidate_stock_summary()
+        super().save(*args, **kwargs)
+
     def available_weight_kg(self):
         """
         If weighted:
@@ -78,6 +124,54 @@ class ProductWeightPrice(models.Model):
         return f"{self.product.name} - {self.weight_kg}kg"
 
 
+class StockReceipt(models.Model):
+    """One delivery of boxes for a boxed-weight product (batch / expiry traceability)."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="receipts")
+    boxes_received = models.PositiveIntegerField(default=0)
+    box_weight_kg = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    batch_code = models.CharField(max_length=60, blank=True)
+    expiry_date = models.DateField(null=True, blank=True)
+
+    received_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    received_on = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Receipt #{self.id} {self.product.name} — {self.boxes_received} boxes"
+
+
+class StockBox(models.Model):
+    """
+    One physical box. remaining_kg is the source of truth for boxed-weight stock;
+    Product.boxes_in_stock / box_remaining_kg are kept in sync as display counters.
+    """
+    receipt = models.ForeignKey(StockReceipt, on_delete=models.CASCADE, related_name="boxes")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_boxes")
+
+    capacity_kg = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    remaining_kg = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    consumed_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # FIFO "open boxes" lookup: WHERE product_id = %s AND remaining_kg > 0 ORDER BY id
+            models.Index(
+                fields=["product", "id"],
+                condition=models.Q(remaining_kg__gt=0),
+                name="stockbox_open_idx",
+            ),
+        ]
+
+    @property
+    def is_consumed(self):
+        return (self.remaining_kg or Decimal("0.00")) <= Decimal("0.00")
+
+    def __str__(self):
+        return f"{self.product.name} Box #{self.id} — {self.remaining_kg}/{self.capacity_kg}kg"
+
+
 class StockEntry(models.Model):
     """Stock-in (receiving)"""
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -88,9 +182,15 @@ class StockEntry(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.product.quantity = self.product.quantity + self.quantity
-        self.product.save()
+        from .services import apply_stock_deltas
+
+        with transaction.atomic():
+            # on edit, reverse the previously recorded quantity first
+            deltas = _previous_stock_delta(self, sign=-1)
+            super().save(*args, **kwargs)
+            deltas.append((self.product_id, self.quantity))
+            apply_stock_deltas(deltas)
+        _refresh_product_quantity(self)
 
 class StockOut(models.Model):
     """Stock out: sold or disposed"""
@@ -101,11 +201,29 @@ class StockOut(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.product.quantity = self.product.quantity - self.quantity
-        if self.product.quantity < 0:
-            self.product.quantity = 0
-        self.product.save()
+        from .services import apply_stock_deltas
+
+        with transaction.atomic():
+            # on edit, give back the previously removed quantity first
+            deltas = _previous_stock_delta(self, sign=1)
+            super().save(*args, **kwargs)
+            deltas.append((self.product_id, -self.quantity))
+            apply_stock_deltas(deltas)
+        _refresh_product_quantity(self)
+
+
+def _previous_stock_delta(entry, sign):
+    """[(product_id, sign * old quantity)] for an existing StockEntry/StockOut row, else []."""
+    if entry._state.adding or not entry.pk:
+        return []
+    old = type(entry).objects.filter(pk=entry.pk).values_list("product_id", "quantity").first()
+    return [(old[0], sign * old[1])] if old else []
+
+
+def _refresh_product_quantity(entry):
+    """The UPDATE ran in SQL; bring an already loaded entry.product up to date."""
+    if type(entry).product.is_cached(entry):
+        entry.product.refresh_from_db(fields=["quantity"])
 
 
 
@@ -0,0 +1,118 @@
+# inventory/search.py
+"""
+Product search backends.
+
+- exact SKU (barcode scanners) is always tried first: one lookup on the indexed sku column
+- PostgreSQL: pg_trgm GIN indexes make the icontains filters index-assisted; results are
+  ranked by trigram similarity + full-text rank
+- SQLite: an FTS5 shadow table (inventory_product_fts, kept in step by triggers) ranked by bm25
+- anything else: the plain icontains scan
+
+Indexes / shadow table / triggers are created by migration 0007_product_search.
+"""
+import re
+from functools import lru_cache
+
+from django.db import DatabaseError, connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Coalesce
+
+FTS_TABLE = "inventory_product_fts"
+FTS_MAX_HITS = 500
+
+
+def exact_sku_match(qs, q):
+    """The products whose SKU is exactly q (a scanned barcode), or None when there is none."""
+    hits = qs.filter(sku=q)
+    return hits if hits.exists() else None
+
+
+class IcontainsBackend:
+    def filter(self, qs, q):
+        return qs.filter(Q(name__icontains=q) | Q(sku__icontains=q) | Q(category__name__icontains=q))
+
+
+class PostgresBackend(IcontainsBackend):
+    def filter(self, qs, q):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+
+        vector = SearchVector("name", "sku", "category__name", config="simple")
+        query = SearchQuery(q, config="simple", search_type="websearch")
+        return (
+            super().filter(qs, q)
+            .annotate(
+                search_rank=Coalesce(TrigramSimilarity("name", q), Value(0.0)) + SearchRank(vector, query)
+            )
+            .order_by("-search_rank", "name")
+        )
+
+
+class SqliteFtsBackend(IcontainsBackend):
+    def match_expression(self, q):
+        # every word as a prefix term: 'fro chick' -> "fro"* "chick"*
+        words = re.findall(r"\w+", q)
+        return " ".join(f'"{w}"*' for w in words)
+
+    def filter(self, qs, q):
+        match = self.match_expression(q)
+        if not match:
+            return super().filter(qs, q)
+        # the hit cap applies to the rows qs lets through, not to the whole catalogue
+        scope_sql, scope_params = qs.order_by().values("id").query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({scope_sql}) "
+                f"ORDER BY bm25({FTS_TABLE}) LIMIT %s",
+                [match, *scope_params, FTS_MAX_HITS],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            # FTS only matches word prefixes ("chick"); "hick" still finds "Chicken Wings"
+            return super().filter(qs, q)
+        return (
+            qs.filter(id__in=ids)
+            .annotate(
+                search_rank=Case(
+                    *[When(id=pk, then=Value(pos)) for pos, pk in enumerate(ids)],
+                    output_field=IntegerField(),
+                )
+            )
+            .order_by("search_rank")
+        )
+
+
+@lru_cache(maxsize=None)
+def _backend_for(vendor):
+    if vendor == "postgresql":
+        return PostgresBackend()
+    if vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            if cursor.fetchone():
+                return SqliteFtsBackend()
+    return IcontainsBackend()
+
+
+def get_search_backend():
+    return _backend_for(connection.vendor)
+
+
+def search_products(qs, q):
+    """
+    Ranked product search over qs. Returns (queryset, ranked) - ranked is True when the
+    queryset is already ordered by relevance (callers keep that order unless the user sorts).
+    """
+    q = (q or "").strip()
+    if not q:
+        return qs, False
+
+    exact = exact_sku_match(qs, q)
+    if exact is not None:
+        return exact, False
+
+    backend = get_search_backend()
+    try:
+        return backend.filter(qs, q), type(backend) is not IcontainsBackend
+    except DatabaseError:
+        # e.g. malformed FTS query; the plain scan never fails
+        return IcontainsBackend().filter(qs, q), False
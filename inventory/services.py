@@ -1,8 +1,17 @@
 # inventory/services.py
+import hashlib
+import json
+import time
+from collections import defaultdict
 from decimal import Decimal
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Min, Prefetch, Q, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.lookups import LessThanOrEqual
+from django.utils import timezone
 
-from .models import Product
+from .models import Product, ProductWeightPrice, StockBox, StockEntry, StockReceipt
 
 
 def q2(value) -> Decimal:
@@ -10,11 +19,198 @@ def q2(value) -> Decimal:
     return Decimal(value or "0.00").quantize(Decimal("0.01"))
 
 
+def apply_stock_deltas(deltas) -> int:
+    """
+    Apply unit-stock deltas in ONE statement.
+    deltas: {product_id: +/-qty} or an iterable of (product_id, qty) pairs (same product is summed).
+
+    UPDATE product SET quantity = MAX(quantity + <delta for id>, 0), stock_status = ... WHERE id IN (...)
+    Only the quantity and its status flag are written, and the read-modify-write happens
+    inside the database, so concurrent receipts / disposals cannot overwrite each other.
+    """
+    pairs = deltas.items() if hasattr(deltas, "items") else deltas
+    summed = defaultdict(int)
+    for product_id, qty in pairs:
+        summed[product_id] += int(qty or 0)
+    summed = {pid: qty for pid, qty in summed.items() if qty}
+    if not summed:
+        return 0
+
+    delta = Case(
+        *[When(id=pid, then=Value(qty)) for pid, qty in summed.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    new_quantity = Greatest(F("quantity") + delta, Value(0))
+    updated = Product.objects.filter(id__in=summed.keys()).update(
+        quantity=new_quantity,
+        # every SET reads the old row, so the flag is worked out from the new quantity too
+        stock_status=Case(When(is_weighted=True, then=F("stock_status")), default=unit_stock_status(new_quantity)),
+    )
+    invalidate_stock_summary()
+    return updated
+
+
+# ------------------------------------------------------------
+# ✅ Stock status read model + dashboard KPIs
+# ------------------------------------------------------------
+STOCK_SUMMARY_CACHE_KEY = "inventory:stock_summary"
+STOCK_SUMMARY_CACHE_SECONDS = 300
+LOW_STOCK_FEED_PAGE_SIZE = 20
+
+def unit_stock_status(quantity):
+    """SQL twin of Product.compute_stock_status for unit products, on a quantity expression."""
+    return Case(
+        When(LessThanOrEqual(quantity, Value(0)), then=Value(Product.STOCK_OUT)),
+        When(LessThanOrEqual(quantity, F("min_quantity_alert")), then=Value(Product.STOCK_LOW)),
+        default=Value(Product.STOCK_OK),
+    )
+
+
+def sync_stock_status(products) -> list:
+    """
+    In-memory refresh for products about to be bulk_update()d: add "stock_status" to the fields.
+    Returns the products whose status changed.
+    """
+    changed = [p for p in products if p.sync_stock_status()]
+    if changed:
+        invalidate_stock_summary()
+    return changed
+
+
+def stock_summary() -> dict:
+    """{"total", "ok", "low", "out"} product counts in one query, cached until a status changes."""
+    summary = cache.get(STOCK_SUMMARY_CACHE_KEY)
+    if summary is None:
+        summary = Product.objects.aggregate(
+            total=Count("id"),
+            ok=Count("id", filter=Q(stock_status=Product.STOCK_OK)),
+            low=Count("id", filter=Q(stock_status=Product.STOCK_LOW)),
+            out=Count("id", filter=Q(stock_status=Product.STOCK_OUT)),
+        )
+        cache.set(STOCK_SUMMARY_CACHE_KEY, summary, STOCK_SUMMARY_CACHE_SECONDS)
+    return summary
+
+
+def invalidate_stock_summary():
+    transaction.on_commit(lambda: cache.delete(STOCK_SUMMARY_CACHE_KEY))
+
+
+def low_stock_feed(page: int = 1, per_page: int = LOW_STOCK_FEED_PAGE_SIZE) -> dict:
+    """
+    Out-of-stock then low products, by name, read from product_stock_status_idx.
+    The total comes from stock_summary(), so paging costs one LIMIT/OFFSET query.
+    """
+    summary = stock_summary()
+    total = summary["low"] + summary["out"]
+    page = max(1, int(page or 1))
+    offset = (page - 1) * per_page
+    rows = list(
+        Product.objects.filter(stock_status__in=[Product.STOCK_OUT, Product.STOCK_LOW])
+        .order_by("-stock_status", "name", "id")
+        .values("id", "name", "stock_status", "is_weighted", "quantity", "boxes_in_stock", "min_quantity_alert")
+        [offset:offset + per_page]
+    )
+    return {
+        "results": rows,
+        "page": page,
+        "total": total,
+        "has_next": offset + len(rows) < total,
+    }
+
+
 @transaction.atomic
-def receive_weight_boxes(*, product: Product, boxes_received: int, box_weight_kg: Decimal) -> Product:
+def receive_stock_entries(entries: list[StockEntry]) -> list[StockEntry]:
+    """
+    Receive a whole delivery note: one INSERT for the StockEntry rows
+    and one UPDATE for every product counter.
+    """
+    entries = [e for e in entries if int(e.quantity or 0) > 0]
+    if not entries:
+        return []
+
+    created = StockEntry.objects.bulk_create(entries)
+    apply_stock_deltas((e.product_id, e.quantity) for e in created)
+    return created
+
+
+def _open_boxes(product_id: int, window: int):
+    """
+    Yield open boxes (remaining_kg > 0) oldest-first, reading `window` rows at a time
+    through the partial "open boxes" index, so callers stop reading as soon as they are done.
+    """
+    last_id = 0
+    while True:
+        batch = list(
+            StockBox.objects
+            .filter(product_id=product_id, remaining_kg__gt=0, id__gt=last_id)
+            .order_by("id")[:window]
+        )
+        yield from batch
+        if len(batch) < window:
+            return
+        last_id = batch[-1].id
+
+
+def _open_counter_boxes(product: Product, received_by=None) -> int:
+    """
+    Materialise Product.boxes_in_stock / box_remaining_kg as StockBox rows
+    (products stocked before the box ledger existed, or counters set by hand).
+    The current (part-used) box is the oldest one. Returns boxes created.
+    """
+    boxes = int(product.boxes_in_stock or 0)
+    bw = q2(product.box_weight_kg)
+    if boxes <= 0 or bw <= 0:
+        return 0
+
+    br = q2(product.box_remaining_kg)
+    if br <= 0:
+        br = bw
+
+    receipt = StockReceipt.objects.create(
+        product=product,
+        boxes_received=boxes,
+        box_weight_kg=bw,
+        batch_code="OPENING",
+        received_by=received_by,
+    )
+    StockBox.objects.bulk_create([
+        StockBox(
+            receipt=receipt,
+            product=product,
+            capacity_kg=bw,
+            remaining_kg=br if i == 0 else bw,
+        )
+        for i in range(boxes)
+    ])
+    return boxes
+
+
+def sync_product_box_counters(product: Product) -> Product:
+    """
+    Recompute Product.boxes_in_stock & box_remaining_kg from the box ledger (in memory).
+    StockBox remains the source of truth; caller saves the counters.
+    """
+    open_boxes = StockBox.objects.filter(product_id=product.id, remaining_kg__gt=0).order_by("id")
+    head = open_boxes.first()
+    product.boxes_in_stock = open_boxes.count() if head else 0
+    product.box_remaining_kg = q2(head.remaining_kg) if head else Decimal("0.00")
+    return product
+
+
+@transaction.atomic
+def receive_weight_boxes(
+    *,
+    product: Product,
+    boxes_received: int,
+    box_weight_kg: Decimal,
+    received_by=None,
+    batch_code: str = "",
+    expiry_date=None,
+) -> Product:
     """
     Receive boxes for a weighted product.
-    Updates Product fields only (no StockBox).
+    Creates one StockReceipt + bulk-created StockBox rows, then re-syncs the Product counters.
     """
     product = Product.objects.select_for_update().get(id=product.id)
 
@@ -26,16 +222,28 @@ def receive_weight_boxes(*, product: Product, boxes_received: int, box_weight_kg
     if bw <= 0:
         raise ValueError("box_weight_kg must be > 0")
 
+    # stock that only exists on the counters goes into the ledger first (FIFO: oldest)
+    if not StockBox.objects.filter(product_id=product.id, remaining_kg__gt=0).exists():
+        _open_counter_boxes(product, received_by=received_by)
+
     product.is_weighted = True
     product.track_method = "boxed_weight"
     product.box_weight_kg = bw
 
-    product.boxes_in_stock = int(product.boxes_in_stock or 0) + boxes_received
-
-    # If current remaining not initialized, initialize as full
-    if q2(product.box_remaining_kg) <= 0 and product.boxes_in_stock > 0:
-        product.box_remaining_kg = bw
+    receipt = StockReceipt.objects.create(
+        product=product,
+        boxes_received=boxes_received,
+        box_weight_kg=bw,
+        batch_code=batch_code or "",
+        expiry_date=expiry_date,
+        received_by=received_by,
+    )
+    StockBox.objects.bulk_create([
+        StockBox(receipt=receipt, product=product, capacity_kg=bw, remaining_kg=bw)
+        for _ in range(boxes_received)
+    ])
 
+    sync_product_box_counters(product)
     product.save(update_fields=[
         "is_weighted", "track_method", "box_weight_kg",
         "boxes_in_stock", "box_remaining_kg"
@@ -43,15 +251,43 @@ def receive_weight_boxes(*, product: Product, boxes_received: int, box_weight_kg
     return product
 
 
-@transaction.atomic
-def consume_weight(*, product: Product, kg_to_sell: Decimal) -> Product:
+def compute_weight_consumption(*, boxes_in_stock: int, box_remaining_kg, box_weight_kg, kg) -> tuple[int, Decimal]:
+    """
+    O(1) Code B arithmetic (same result as draining box by box).
+    Returns (boxes_in_stock, box_remaining_kg) after selling kg.
+
+    Assumes validated input: boxes_in_stock >= 1, box_weight_kg > 0, 0 < kg <= available.
+    - kg smaller than the current box: only the current box shrinks
+    - otherwise the current box and `full` more boxes are used up, and `part` kg
+      is taken from the next box (a box is deducted only when it hits exactly 0)
     """
-    Deduct kg using Code B rule:
+    boxes = int(boxes_in_stock or 0)
+    bw = q2(box_weight_kg)
+    br = q2(box_remaining_kg)
+    kg = q2(kg)
+    if br <= 0:
+        br = bw
+
+    if kg < br:
+        return boxes, q2(br - kg)
+
+    full, part = divmod(kg - br, bw)
+    boxes -= 1 + int(full)
+
+    if boxes <= 0:
+        return 0, Decimal("0.00")
+    if part:
+        return boxes, q2(bw - part)
+    return boxes, (bw if boxes > 0 else Decimal("0.00"))
+
+
+def apply_weight_consumption(product: Product, kg_to_sell: Decimal) -> Product:
+    """
+    Deduct kg from an already locked product in memory (Code B rule):
     - Deduct from current box (box_remaining_kg)
     - When it hits 0, decrement boxes_in_stock and move to next full box if any
+    Caller is responsible for saving boxes_in_stock / box_remaining_kg.
     """
-    product = Product.objects.select_for_update().get(id=product.id)
-
     if not product.is_weighted or product.track_method != "boxed_weight":
         raise ValueError("Product is not configured for boxed-weight sales.")
 
@@ -59,11 +295,12 @@ def consume_weight(*, product: Product, kg_to_sell: Decimal) -> Product:
     if bw <= 0:
         raise ValueError("box_weight_kg is not set.")
 
-    if int(product.boxes_in_stock or 0) <= 0:
+    boxes = int(product.boxes_in_stock or 0)
+    if boxes <= 0:
         raise ValueError("No boxes in stock.")
 
-    kg_left = q2(kg_to_sell)
-    if kg_left <= 0:
+    kg = q2(kg_to_sell)
+    if kg <= 0:
         return product
 
     # init remaining if not set
@@ -74,40 +311,193 @@ def consume_weight(*, product: Product, kg_to_sell: Decimal) -> Product:
 
     # check available
     available = product.available_weight_kg()
-    if kg_left > available:
+    if kg > available:
         raise ValueError(f"Not enough kg in stock. Available: {available}kg")
 
-    while kg_left > 0:
-        br = q2(product.box_remaining_kg)
-
-        # if current box empty, move to next box (decrement then refill)
-        if br <= 0:
-            product.boxes_in_stock -= 1
-            if product.boxes_in_stock <= 0:
-                product.boxes_in_stock = 0
-                product.box_remaining_kg = Decimal("0.00")
-                break
-            product.box_remaining_kg = bw
-            br = bw
-
-        take = min(br, kg_left)
-        product.box_remaining_kg = q2(br - take)
-        kg_left = q2(kg_left - take)
-
-        # if finished current box exactly, consume one box
-        if q2(product.box_remaining_kg) == Decimal("0.00"):
-            product.boxes_in_stock -= 1
-            if product.boxes_in_stock > 0:
-                product.box_remaining_kg = bw
-            else:
-                product.boxes_in_stock = 0
-                product.box_remaining_kg = Decimal("0.00")
-                break
+    product.boxes_in_stock, product.box_remaining_kg = compute_weight_consumption(
+        boxes_in_stock=boxes, box_remaining_kg=br, box_weight_kg=bw, kg=kg,
+    )
+    return product
+
+
+def _open_box_state(product_ids) -> dict[int, dict]:
+    """
+    One grouped read of the open boxes of many products:
+    {product_id: {"open": count, "head": oldest open box id, "odd": count, "first_odd": id}}
+    "odd" boxes are open boxes that are not full boxes of the product's box_weight_kg.
+    """
+    odd = ~Q(remaining_kg=F("capacity_kg")) | ~Q(capacity_kg=F("product__box_weight_kg"))
+    rows = (
+        StockBox.objects
+        .filter(product_id__in=product_ids, remaining_kg__gt=0)
+        .values("product_id")
+        .annotate(
+            open=Count("id"),
+            head=Min("id"),
+            odd=Count("id", filter=odd),
+            first_odd=Min("id", filter=odd),
+        )
+        .order_by()
+    )
+    return {row.pop("product_id"): row for row in rows}
+
+
+def _drain_closed_form(product: Product, kg: Decimal, state: dict, head: StockBox) -> Product:
+    """
+    Every open box after the head is a full box of box_weight_kg, so the ledger is
+    exactly the Code B counters: apply_weight_consumption gives the result in O(1) and
+    the boxes it used up are closed with one ranged UPDATE (no per-box reads).
+    """
+    product.boxes_in_stock = state["open"]
+    product.box_remaining_kg = q2(head.remaining_kg)
+    apply_weight_consumption(product, kg)
+
+    drained = state["open"] - product.boxes_in_stock
+    open_boxes = StockBox.objects.filter(product_id=product.id, remaining_kg__gt=0)
+    now = timezone.now()
+
+    if drained == 0:
+        StockBox.objects.filter(id=head.id).update(remaining_kg=product.box_remaining_kg)
+    elif product.boxes_in_stock == 0:
+        open_boxes.update(remaining_kg=Decimal("0.00"), consumed_on=now)
+    else:
+        new_head = open_boxes.order_by("id").values_list("id", flat=True)[drained]
+        open_boxes.filter(id__lt=new_head).update(remaining_kg=Decimal("0.00"), consumed_on=now)
+        if product.box_remaining_kg != q2(product.box_weight_kg):
+            StockBox.objects.filter(id=new_head).update(remaining_kg=product.box_remaining_kg)
+    return product
+
+
+def _drain_box_by_box(product: Product, kg: Decimal, state: dict) -> Product:
+    """
+    Mixed box sizes: walk the open boxes oldest-first, reading only as many as the
+    sale needs (+ the next head box), and write back the touched ones in one bulk UPDATE.
+    """
+    bw = q2(product.box_weight_kg)
+    window = int(kg / bw) + 2 if bw > 0 else 50
+    now = timezone.now()
+
+    left = kg
+    drained = 0
+    touched = []
+    head = None  # first box still open after this sale
+
+    for box in _open_boxes(product.id, window):
+        if left <= 0:
+            head = box
+            break
+        take = min(q2(box.remaining_kg), left)
+        box.remaining_kg = q2(box.remaining_kg - take)
+        left = q2(left - take)
+        touched.append(box)
+
+        if box.remaining_kg <= 0:
+            box.remaining_kg = Decimal("0.00")
+            box.consumed_on = now
+            drained += 1
+        else:
+            head = box
+            break
+
+    if left > 0:
+        raise ValueError(f"Not enough kg in stock. Available: {q2(kg - left)}kg")
+
+    StockBox.objects.bulk_update(touched, ["remaining_kg", "consumed_on"])
+
+    product.boxes_in_stock = state["open"] - drained
+    product.box_remaining_kg = q2(head.remaining_kg) if head else Decimal("0.00")
+    return product
+
 
-    product.save(update_fields=["boxes_in_stock", "box_remaining_kg"])
+@transaction.atomic
+def consume_weight(*, product: Product, kg_to_sell: Decimal) -> Product:
+    """
+    Lock the product row and deduct kg FIFO from its boxes
+    (see apply_weight_batch).
+    """
+    product = Product.objects.select_for_update().get(id=product.id)
+    apply_weight_batch({product.id: product}, {product.id: kg_to_sell})
+
+    if q2(kg_to_sell) > 0:
+        product.save(update_fields=["boxes_in_stock", "box_remaining_kg"])
     return product
 
 
+def apply_weight_batch(products: dict, kg_by_product: dict) -> list[Product]:
+    """
+    FIFO-drain one sale from the StockBox ledger: {product_id: kg} against
+    {product_id: already locked product}.
+    - one grouped read of every product's open boxes + one read of their head boxes
+    - uniform boxes (full boxes of box_weight_kg behind the head): O(1) closed form,
+      ranged UPDATEs whatever the kg; mixed box sizes: windowed box-by-box walk
+    - boxes_in_stock / box_remaining_kg are derived from the ledger (open boxes and head
+      box after the drain), never from the old counters
+    Returns the products that changed (id order); caller saves their counters.
+    """
+    wanted = {}
+    for pid in sorted(kg_by_product):
+        product = products.get(pid)
+        if product is None:
+            raise ValueError(f"Product #{pid} does not exist.")
+        kg = q2(kg_by_product[pid])
+        if kg <= 0:
+            continue
+        if not product.is_weighted or product.track_method != "boxed_weight":
+            raise ValueError(f"{product.name}: Product is not configured for boxed-weight sales.")
+        wanted[pid] = kg
+    if not wanted:
+        return []
+
+    states = _open_box_state(wanted.keys())
+    # stock that only exists on the counters goes into the ledger first
+    opened = [pid for pid in wanted if pid not in states and _open_counter_boxes(products[pid])]
+    if opened:
+        states.update(_open_box_state(opened))
+    heads = StockBox.objects.in_bulk([state["head"] for state in states.values()])
+
+    touched = []
+    for pid, kg in wanted.items():
+        product = products[pid]
+        state = states.get(pid)
+        try:
+            if state is None:
+                raise ValueError("No boxes in stock.")
+            uniform = state["odd"] == 0 or (state["odd"] == 1 and state["first_odd"] == state["head"])
+            if uniform and q2(product.box_weight_kg) > 0:
+                _drain_closed_form(product, kg, state, heads[state["head"]])
+            else:
+                _drain_box_by_box(product, kg, state)
+        except ValueError as e:
+            raise ValueError(f"{product.name}: {e}")
+        touched.append(product)
+    return touched
+
+
+@transaction.atomic
+def consume_weight_batch(*, items) -> dict[int, Product]:
+    """
+    Vectorised consume_weight for one sale.
+    items: iterable of (product or product_id, kg) pairs; kg of the same product is summed.
+
+    One ordered SELECT ... FOR UPDATE for all products, FIFO box drain (apply_weight_batch),
+    one bulk UPDATE for the counters. Returns {product_id: product}.
+    """
+    kg_by_product = defaultdict(Decimal)
+    for product, kg in items:
+        kg_by_product[getattr(product, "id", product)] += q2(kg)
+    if not kg_by_product:
+        return {}
+
+    products = {
+        p.id: p
+        for p in Product.objects.select_for_update().filter(id__in=kg_by_product.keys()).order_by("id")
+    }
+    touched = apply_weight_batch(products, kg_by_product)
+    sync_stock_status(touched)
+    Product.objects.bulk_update(touched, ["boxes_in_stock", "box_remaining_kg", "stock_status"])
+    return products
+
+
 
 
 # from decimal import Decimal
@@ -119,6 +509,84 @@ def consume_weight(*, product: Product, kg_to_sell: Decimal) -> Product:
 
 
 # @transaction.atomic
+
+
+# ------------------------------------------------------------
+# ✅ POS catalogue (products + weight sizes), versioned
+# ------------------------------------------------------------
+CATALOGUE_VERSION_KEY = "inventory:catalogue_version"
+# Product columns that appear in the catalogue; saves touching only other columns (stock) keep the version
+CATALOGUE_FIELDS = frozenset({"name", "unit_price", "wholesale_price", "is_weighted", "track_method"})
+
+CATALOGUE_MAX_AGE = 300  # seconds
+
+# in-process copy of the last built payload: {"version", "built_at", "body", "etag", "last_modified"}
+_catalogue = {}
+
+
+def catalogue_version() -> int:
+    """Catalogue version; bumped by inventory.signals on product / weight-price changes."""
+    return cache.get(CATALOGUE_VERSION_KEY, 0)
+
+
+def bump_catalogue_version():
+    cache.add(CATALOGUE_VERSION_KEY, 0, timeout=None)
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:  # evicted between add and incr
+        cache.set(CATALOGUE_VERSION_KEY, 1, timeout=None)
+
+
+def build_catalogue() -> dict:
+    """Everything the POS needs to price a line, in two queries."""
+    sizes = Prefetch(
+        "weight_prices",
+        queryset=ProductWeightPrice.objects.filter(is_active=True).only(
+            "id", "product_id", "weight_kg", "retail_price", "wholesale_price",
+        ),
+    )
+    products = []
+    for p in (
+        Product.objects.only("id", "name", "unit_price", "wholesale_price", "is_weighted")
+        .order_by("name", "id")
+        .prefetch_related(sizes)
+    ):
+        products.append({
+            "id": p.id,
+            "name": p.name,
+            "is_weighted": bool(p.is_weighted),
+            "retail_price": float(p.unit_price or 0),
+            "wholesale_price": float(p.wholesale_price or 0),
+            "sizes": [
+                {
+                    "id": wp.id,
+                    "label": f"{wp.weight_kg:g}kg",
+                    "weight_kg": float(wp.weight_kg),
+                    "retail_price": float(wp.retail_price),
+                    "wholesale_price": float(wp.wholesale_price),
+                }
+                for wp in p.weight_prices.all()
+            ],
+        })
+    return {"products": products}
+
+
+def get_catalogue() -> dict:
+    """
+    Serialised catalogue, rebuilt when the version moves (or after CATALOGUE_MAX_AGE,
+    in case the cache holding the version is not shared between processes).
+    Returns {"version", "body", "etag", "last_modified"}; the ETag only changes with the content.
+    """
+    version = catalogue_version()
+    now = time.time()
+    if _catalogue.get("version") != version or now - _catalogue.get("built_at", 0) > CATALOGUE_MAX_AGE:
+        body = json.dumps(build_catalogue(), separators=(",", ":")).encode()
+        if body != _catalogue.get("body"):
+            _catalogue.update(body=body, etag=f'"{hashlib.sha1(body).hexdigest()[:16]}"', last_modified=now)
+        _catalogue.update(version=version, built_at=now)
+    return dict(_catalogue)
+
+
 # def sync_product_box_counters(product: Product):
 #     """
 #     Optional: keep Product.boxes_in_stock & Product.box_remaining_kg in sync for display.
@@ -0,0 +1,25 @@
+# inventory/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Product, ProductWeightPrice
+from .services import CATALOGUE_FIELDS, bump_catalogue_version, invalidate_stock_summary
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, update_fields=None, **kwargs):
+    # stock-only saves (boxes_in_stock, quantity, ...) don't change what the POS shows
+    if update_fields is not None and not (CATALOGUE_FIELDS & set(update_fields)):
+        return
+    bump_catalogue_version()
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, **kwargs):
+    bump_catalogue_version()
+    invalidate_stock_summary()
+
+
+@receiver([post_save, post_delete], sender=ProductWeightPrice)
+def catalogue_changed(sender, **kwargs):
+    bump_catalogue_version()
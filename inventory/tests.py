@@ -1,3 +1,396 @@
-from django.test import TestCase
+from decimal import Decimal
+from itertools import product as grid
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import search
+from .models import Category, Product, StockBox, StockEntry, StockOut
+from .services import (
+    apply_stock_deltas, apply_weight_consumption, compute_weight_consumption, consume_weight,
+    consume_weight_batch, low_stock_feed, q2, receive_stock_entries, receive_weight_boxes, stock_summary,
+    sync_product_box_counters,
+)
+
+
+class StockCounterTests(TestCase):
+    def setUp(self):
+        self.sausage = Product.objects.create(name="Sausage", unit_price=Decimal("12.00"), quantity=10)
+        self.wings = Product.objects.create(name="Wings", unit_price=Decimal("30.00"), quantity=0)
+
+    def quantity(self, product):
+        return Product.objects.values_list("quantity", flat=True).get(pk=product.pk)
+
+    def test_entry_edit_reverses_the_old_quantity(self):
+        entry = StockEntry.objects.create(product=self.sausage, quantity=5, unit_price=Decimal("9.00"))
+        self.assertEqual(self.quantity(self.sausage), 15)
+
+        entry.quantity = 8
+        entry.save()
+        self.assertEqual(self.quantity(self.sausage), 18)
+        self.assertEqual(entry.product.quantity, 18)  # loaded product refreshed after the UPDATE
+
+    def test_entry_moved_to_another_product(self):
+        entry = StockEntry.objects.create(product=self.sausage, quantity=5, unit_price=Decimal("9.00"))
+        entry.product = self.wings
+        entry.save()
+        self.assertEqual(self.quantity(self.sausage), 10)
+        self.assertEqual(self.quantity(self.wings), 5)
+
+    def test_stock_out_edit_gives_back_the_old_quantity(self):
+        out = StockOut.objects.create(product=self.sausage, quantity=4, reason="Disposed")
+        self.assertEqual(self.quantity(self.sausage), 6)
+
+        out.quantity = 1
+        out.save()
+        self.assertEqual(self.quantity(self.sausage), 9)
+        self.assertEqual(out.product.quantity, 9)
+
+    def test_stock_out_clamps_at_zero(self):
+        StockOut.objects.create(product=self.sausage, quantity=25, reason="Disposed")
+        self.assertEqual(self.quantity(self.sausage), 0)
+
+    def test_deltas_are_summed_in_one_update(self):
+        with self.assertNumQueries(1):
+            apply_stock_deltas([(self.sausage.id, 3), (self.wings.id, 2), (self.sausage.id, -1)])
+        self.assertEqual((self.quantity(self.sausage), self.quantity(self.wings)), (12, 2))
+
+    def test_receive_stock_entries(self):
+        entries = [
+            StockEntry(product=self.sausage, quantity=6, unit_price=Decimal("9.00")),
+            StockEntry(product=self.wings, quantity=3, unit_price=Decimal("20.00")),
+            StockEntry(product=self.sausage, quantity=0, unit_price=Decimal("9.00")),
+        ]
+        created = receive_stock_entries(entries)
+        self.assertEqual(len(created), 2)
+        self.assertEqual((self.quantity(self.sausage), self.quantity(self.wings)), (16, 3))
+
+    def test_stock_in_view(self):
+        user = User.objects.create_user("clerk", password="x")
+        user.groups.add(Group.objects.create(name="Admin"))
+        self.client.force_login(user)
+
+        response = self.client.post(reverse("stock_in"), {
+            "product": self.wings.id, "quantity": 7, "unit_price": "20.00", "notes": "",
+        })
+        self.assertRedirects(response, reverse("inventory_dashboard"), fetch_redirect_response=False)
+        self.assertEqual(self.quantity(self.wings), 7)
+        self.assertEqual(StockEntry.objects.get().created_by, user)
+
+
+def loop_weight_consumption(product, kg_to_sell):
+    """The box-by-box Code B loop apply_weight_consumption used before the closed form (reference)."""
+    if not product.is_weighted or product.track_method != "boxed_weight":
+        raise ValueError("Product is not configured for boxed-weight sales.")
+
+    bw = q2(product.box_weight_kg)
+    if bw <= 0:
+        raise ValueError("box_weight_kg is not set.")
+
+    if int(product.boxes_in_stock or 0) <= 0:
+        raise ValueError("No boxes in stock.")
+
+    kg_left = q2(kg_to_sell)
+    if kg_left <= 0:
+        return product
+
+    br = q2(product.box_remaining_kg)
+    if br <= 0:
+        br = bw
+        product.box_remaining_kg = br
+
+    available = product.available_weight_kg()
+    if kg_left > available:
+        raise ValueError(f"Not enough kg in stock. Available: {available}kg")
+
+    while kg_left > 0:
+        br = q2(product.box_remaining_kg)
+        if br <= 0:
+            product.boxes_in_stock -= 1
+            if product.boxes_in_stock <= 0:
+                product.boxes_in_stock = 0
+                product.box_remaining_kg = Decimal("0.00")
+                break
+            product.box_remaining_kg = bw
+            br = bw
+
+        take = min(br, kg_left)
+        product.box_remaining_kg = q2(br - take)
+        kg_left = q2(kg_left - take)
+
+        if q2(product.box_remaining_kg) == Decimal("0.00"):
+            product.boxes_in_stock -= 1
+            if product.boxes_in_stock > 0:
+                product.box_remaining_kg = bw
+            else:
+                product.boxes_in_stock = 0
+                product.box_remaining_kg = Decimal("0.00")
+                break
+
+    return product
+
+
+def boxed(boxes, remaining, box_weight):
+    return Product(
+        name="Boxed", unit_price=Decimal("1.00"), is_weighted=True, track_method="boxed_weight",
+        boxes_in_stock=boxes, box_remaining_kg=Decimal(remaining), box_weight_kg=Decimal(box_weight),
+    )
+
+
+def outcome(consume, boxes, remaining, box_weight, kg):
+    product = boxed(boxes, remaining, box_weight)
+    try:
+        consume(product, Decimal(kg))
+    except ValueError as e:
+        return "error", str(e)
+    return product.boxes_in_stock, q2(product.box_remaining_kg)
+
+
+class WeightConsumptionEquivalenceTests(SimpleTestCase):
+    """
+    apply_weight_consumption (closed form) against the old loop over exhaustive grids:
+    every remaining / kg combination on small boxes, so each box boundary, the unset
+    remaining (0), the last box and overselling all come up.
+    """
+
+    def assertSameAsLoop(self, cases):
+        for boxes, remaining, box_weight, kg in cases:
+            expected = outcome(loop_weight_consumption, boxes, remaining, box_weight, kg)
+            actual = outcome(apply_weight_consumption, boxes, remaining, box_weight, kg)
+            if actual != expected:
+                self.fail(f"boxes={boxes} remaining={remaining} box_weight={box_weight} kg={kg}: {actual} != {expected}")
+
+    def test_every_cent(self):
+        # box weights 0.01 .. 0.25, remaining 0 .. one cent over a full box, kg up to one cent oversold
+        def cases():
+            for bw, boxes in grid((1, 2, 3, 5, 7, 10, 25), range(1, 5)):
+                for br, kg in grid(range(bw + 2), range(1, boxes * bw + 2)):
+                    yield boxes, Decimal(br) / 100, Decimal(bw) / 100, Decimal(kg) / 100
+
+        self.assertSameAsLoop(cases())
+
+    def test_rounding_to_cents(self):
+        # 3dp remaining and kg: both sides round half-even to 0.01 (0.005 -> 0.00, 0.015 -> 0.02)
+        def cases():
+            for boxes, br, kg in grid(range(1, 4), range(0, 61), range(0, 160)):
+                yield boxes, Decimal(br) / 1000, Decimal("0.05"), Decimal(kg) / 1000
+
+        self.assertSameAsLoop(cases())
+
+    def test_whole_boxes(self):
+        # realistic box sizes, kg in half-kg steps across many boxes
+        def cases():
+            for bw, boxes in grid(("20.00", "30.00", "7.35"), (1, 2, 5, 25)):
+                bw = Decimal(bw)
+                for br in (Decimal("0.00"), Decimal("0.01"), bw / 2, bw - Decimal("0.01"), bw):
+                    for half_kg in range(1, int(boxes * bw * 2) + 3):
+                        yield boxes, br, bw, Decimal(half_kg) / 2
+
+        self.assertSameAsLoop(cases())
+
+    def test_invalid_products(self):
+        cases = [(0, "5.00", "10.00", "1.00"), (2, "5.00", "0.00", "1.00"), (2, "5.00", "10.00", "0.00"), (2, "5.00", "10.00", "-3.00")]
+        self.assertSameAsLoop(cases)
+        unit = boxed(2, "5.00", "10.00")
+        unit.track_method = "unit"
+        with self.assertRaises(ValueError):
+            apply_weight_consumption(unit, Decimal("1.00"))
+
+    def test_compute_matches_exact_boundaries(self):
+        state = {"boxes_in_stock": 3, "box_remaining_kg": Decimal("4.00"), "box_weight_kg": Decimal("10.00")}
+        self.assertEqual(compute_weight_consumption(kg=Decimal("3.99"), **state), (3, Decimal("0.01")))
+        self.assertEqual(compute_weight_consumption(kg=Decimal("4.00"), **state), (2, Decimal("10.00")))
+        self.assertEqual(compute_weight_consumption(kg=Decimal("14.00"), **state), (1, Decimal("10.00")))
+        self.assertEqual(compute_weight_consumption(kg=Decimal("24.00"), **state), (0, Decimal("0.00")))
+
+
+class ConsumeWeightBatchTests(TestCase):
+    def setUp(self):
+        self.mackerel = Product.objects.create(
+            name="Mackerel", unit_price=Decimal("1.00"), is_weighted=True, track_method="boxed_weight",
+            box_weight_kg=Decimal("20.00"), boxes_in_stock=3, box_remaining_kg=Decimal("20.00"),
+        )
+        self.tilapia = Product.objects.create(
+            name="Tilapia", unit_price=Decimal("1.00"), is_weighted=True, track_method="boxed_weight",
+            box_weight_kg=Decimal("10.00"), boxes_in_stock=1, box_remaining_kg=Decimal("4.00"),
+        )
+
+    def counters(self, product):
+        product.refresh_from_db()
+        return product.boxes_in_stock, product.box_remaining_kg
+
+    def test_many_pairs_one_lock_one_counter_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            consume_weight_batch(items=[
+                (self.mackerel, Decimal("15.00")),
+                (self.tilapia.id, Decimal("1.50")),
+                (self.mackerel.id, Decimal("10.00")),
+            ])
+        sql = [q["sql"] for q in ctx.captured_queries]
+        self.assertEqual(sum(s.startswith("SELECT") and 'FROM "inventory_product"' in s for s in sql), 1)
+        self.assertEqual(sum(s.startswith('UPDATE "inventory_product"') for s in sql), 1)
+        self.assertEqual(self.counters(self.mackerel), (2, Decimal("15.00")))
+        self.assertEqual(self.counters(self.tilapia), (1, Decimal("2.50")))
+
+    def test_one_short_product_fails_the_batch(self):
+        with self.assertRaisesMessage(ValueError, "Tilapia"):
+            consume_weight_batch(items=[(self.mackerel, Decimal("5.00")), (self.tilapia, Decimal("4.01"))])
+        self.assertEqual(self.counters(self.mackerel), (3, Decimal("20.00")))
+
+
+class StockBoxLedgerTests(TestCase):
+    def setUp(self):
+        self.mackerel = Product.objects.create(name="Mackerel", unit_price=Decimal("1.00"))
+
+    def receive(self, boxes, box_weight):
+        receive_weight_boxes(product=self.mackerel, boxes_received=boxes, box_weight_kg=Decimal(box_weight))
+
+    def counters(self):
+        self.mackerel.refresh_from_db()
+        return self.mackerel.boxes_in_stock, self.mackerel.box_remaining_kg
+
+    def ledger(self):
+        return list(StockBox.objects.filter(product=self.mackerel).order_by("id").values_list("remaining_kg", flat=True))
+
+    def test_counters_come_from_the_ledger_not_the_old_counters(self):
+        self.receive(3, "10.00")
+        Product.objects.filter(pk=self.mackerel.pk).update(boxes_in_stock=7, box_remaining_kg=Decimal("2.50"))
+
+        consume_weight(product=self.mackerel, kg_to_sell=Decimal("5.00"))
+        self.assertEqual(self.counters(), (3, Decimal("5.00")))
+        self.assertEqual(self.ledger(), [Decimal("5.00"), Decimal("10.00"), Decimal("10.00")])
+
+        Product.objects.filter(pk=self.mackerel.pk).update(boxes_in_stock=1, box_remaining_kg=Decimal("1.00"))
+        consume_weight(product=self.mackerel, kg_to_sell=Decimal("12.00"))  # more than the counters claim
+        self.assertEqual(self.counters(), (2, Decimal("3.00")))
+        synced = sync_product_box_counters(Product.objects.get(pk=self.mackerel.pk))
+        self.assertEqual((synced.boxes_in_stock, synced.box_remaining_kg), self.counters())
+
+    def test_uniform_boxes_drain_in_constant_queries(self):
+        self.receive(40, "10.00")
+
+        def queries(kg):
+            with CaptureQueriesContext(connection) as ctx:
+                consume_weight(product=self.mackerel, kg_to_sell=Decimal(kg))
+            return len([q for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]])
+
+        with mock.patch("inventory.services._drain_box_by_box", side_effect=AssertionError("walked the boxes")):
+            few, many = queries("15.00"), queries("252.50")
+        self.assertEqual(few, many)
+        self.assertEqual(self.counters(), (14, Decimal("2.50")))
+        ledger = self.ledger()
+        self.assertEqual(ledger[:26], [Decimal("0.00")] * 26)
+        self.assertEqual(ledger[26:28], [Decimal("2.50"), Decimal("10.00")])
+        self.assertEqual(StockBox.objects.filter(product=self.mackerel, consumed_on__isnull=False).count(), 26)
+
+    def test_mixed_box_sizes_drain_fifo(self):
+        self.receive(2, "10.00")
+        self.receive(2, "20.00")  # box_weight_kg is now 20, the older boxes hold 10
+
+        consume_weight(product=self.mackerel, kg_to_sell=Decimal("25.00"))
+        self.assertEqual(self.ledger(), [Decimal("0.00"), Decimal("0.00"), Decimal("15.00"), Decimal("20.00")])
+        self.assertEqual(self.counters(), (2, Decimal("15.00")))
+
+        with self.assertRaisesMessage(ValueError, "Not enough kg in stock. Available: 35.00kg"):
+            consume_weight(product=self.mackerel, kg_to_sell=Decimal("35.01"))
+
+        consume_weight(product=self.mackerel, kg_to_sell=Decimal("35.00"))
+        self.assertEqual(self.counters(), (0, Decimal("0.00")))
+
+    def test_counter_only_stock_is_opened_on_first_sale(self):
+        Product.objects.filter(pk=self.mackerel.pk).update(
+            is_weighted=True, track_method="boxed_weight", box_weight_kg=Decimal("10.00"),
+            boxes_in_stock=2, box_remaining_kg=Decimal("5.00"),
+        )
+        consume_weight(product=self.mackerel, kg_to_sell=Decimal("7.00"))
+        self.assertEqual(self.ledger(), [Decimal("0.00"), Decimal("8.00")])
+        self.assertEqual(self.counters(), (1, Decimal("8.00")))
+
+    def test_overselling_rolls_back_the_ledger(self):
+        self.receive(2, "10.00")
+        with self.assertRaises(ValueError):
+            consume_weight(product=self.mackerel, kg_to_sell=Decimal("20.01"))
+        self.assertEqual(self.ledger(), [Decimal("10.00"), Decimal("10.00")])
+        self.assertEqual(self.counters(), (2, Decimal("10.00")))
+
+
+class StockStatusTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # low at or below 2 boxes' worth (40kg)
+        self.mackerel = Product.objects.create(
+            name="Mackerel", unit_price=Decimal("1.00"), is_weighted=True, track_method="boxed_weight",
+            box_weight_kg=Decimal("20.00"), min_quantity_alert=2,
+        )
+        receive_weight_boxes(product=self.mackerel, boxes_received=3, box_weight_kg=Decimal("20.00"))
+
+    def status(self):
+        return Product.objects.values_list("stock_status", flat=True).get(pk=self.mackerel.pk)
+
+    def consume(self, kg):
+        consume_weight_batch(items=[(self.mackerel.id, Decimal(kg))])
+
+    def test_weighted_threshold_is_boxes_worth_of_kg(self):
+        self.assertEqual(self.status(), Product.STOCK_OK)   # 60kg
+        self.consume("19.99")
+        self.assertEqual(self.status(), Product.STOCK_OK)   # 40.01kg
+        self.consume("0.01")
+        self.assertEqual(self.status(), Product.STOCK_LOW)  # exactly 40kg
+        self.consume("40.00")
+        self.assertEqual(self.status(), Product.STOCK_OUT)
+
+    def test_unit_products_flag_after_bulk_deltas(self):
+        sausage = Product.objects.create(name="Sausage", unit_price=Decimal("12.00"), quantity=6, min_quantity_alert=5)
+        apply_stock_deltas({sausage.id: -1})
+        self.assertEqual(Product.objects.get(pk=sausage.pk).stock_status, Product.STOCK_LOW)
+
+    def test_summary_and_feed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.consume("60.00")
+            Product.objects.create(name="Wings", unit_price=Decimal("30.00"), quantity=3, min_quantity_alert=5)
+            Product.objects.create(name="Sausage", unit_price=Decimal("12.00"), quantity=50, min_quantity_alert=5)
+
+        self.assertEqual(stock_summary(), {"total": 3, "ok": 1, "low": 1, "out": 1})
+        feed = low_stock_feed(per_page=1)
+        self.assertEqual(([r["name"] for r in feed["results"]], feed["total"], feed["has_next"]), (["Mackerel"], 2, True))
+
+
+@skipUnless(connection.vendor == "sqlite", "FTS5 backend")
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        frozen = Category.objects.create(name="Frozen")
+        self.wings = Product.objects.create(name="Chicken Wings", sku="6001001", unit_price=Decimal("30.00"), category=frozen)
+        self.pack = Product.objects.create(
+            name="Chicken Wings Family Value Party Pack", sku="60010012", unit_price=Decimal("90.00"), category=frozen,
+        )
+        self.sausage = Product.objects.create(name="Sausage", sku="6002001", unit_price=Decimal("12.00"))
+
+    def search(self, q, qs=None):
+        qs, _ranked = search.search_products(qs if qs is not None else Product.objects.all(), q)
+        return list(qs)
+
+    def test_backend_is_fts(self):
+        self.assertIsInstance(search.get_search_backend(), search.SqliteFtsBackend)
+
+    def test_exact_sku_skips_the_search(self):
+        with mock.patch.object(search.SqliteFtsBackend, "filter") as fts:
+            self.assertEqual(self.search("6001001"), [self.wings])
+        fts.assert_not_called()
+
+    def test_prefix_words_ranked_by_bm25(self):
+        self.assertEqual(self.search("chick wing"), [self.wings, self.pack])
+        self.assertEqual(self.search("froz"), [self.wings, self.pack])
+
+    def test_substring_falls_back_to_icontains(self):
+        self.assertEqual(set(self.search("hick")), {self.wings, self.pack})
+        self.assertEqual(self.search("ausag"), [self.sausage])
+
+    def test_hit_cap_applies_after_the_other_filters(self):
+        with mock.patch.object(search, "FTS_MAX_HITS", 1):
+            self.assertEqual(self.search("chicken", Product.objects.filter(unit_price__gt=50)), [self.pack])
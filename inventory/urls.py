@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.dashboard, name='inventory_dashboard'),
+    path('low-stock/', views.low_stock_feed_json, name='low_stock_feed'),
     path('products/', views.ProductListView.as_view(), name='product_list'),
     path('products/add/', views.product_create, name='product_add'),
     path('products/<int:pk>/edit/', views.product_edit, name='product_edit'),
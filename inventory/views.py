@@ -11,17 +11,36 @@ from users.utils import has_any_group
 from .models import Product, StockEntry, StockOut, Category
 from .forms import ProductForm, StockEntryForm, StockOutForm
 # from .services import ensure_default_sizes
-from .services import receive_weight_boxes
+from .services import receive_stock_entries, receive_weight_boxes, stock_summary, low_stock_feed
+from .search import search_products
+
+DASHBOARD_PAGE_SIZE = 25
 
 # 🧊 Dashboard (View-only for Admin, Staff, Accountant)
 @login_required
 @has_any_group("Admin", "Staff", "Accountant")
 def dashboard(request):
-    products = Product.objects.all().order_by("category", "-quantity")
-    low_stock = products.filter(quantity__lte=F('min_quantity_alert'))
-    context = {"products": products, "low_stock": low_stock}
+    products = Product.objects.select_related("category").order_by("category", "-quantity")
+    page_obj = Paginator(products, DASHBOARD_PAGE_SIZE).get_page(request.GET.get("page"))
+    context = {
+        "products": page_obj.object_list,
+        "page_obj": page_obj,
+        "summary": stock_summary(),
+        "low_stock": low_stock_feed(page=1, per_page=10),
+    }
     return render(request, "inventory/dashboard.html", context)
 
+
+@login_required
+@has_any_group("Admin", "Staff", "Accountant")
+def low_stock_feed_json(request):
+    # ?page=N -> {"results": [...], "page", "total", "has_next"}
+    try:
+        page = int(request.GET.get("page", 1))
+    except ValueError:
+        page = 1
+    return JsonResponse(low_stock_feed(page=page))
+
 class ProductListView(ListView):
     model = Product
     template_name = "inventory/product_list.html"
@@ -31,19 +50,11 @@ class ProductListView(ListView):
     def get_queryset(self):
         qs = Product.objects.select_related("category").all().order_by("category__name", "-quantity")
 
-        q = self.request.GET.get("q", "").strip()
-        if q:
-            qs = qs.filter(
-                Q(name__icontains=q) |
-                Q(sku__icontains=q) |
-                Q(category__name__icontains=q)
-            )
-
         filter_mode = self.request.GET.get("filter")
         if filter_mode == "low":
-            qs = qs.filter(quantity__lte=F("min_quantity_alert"))
+            qs = qs.filter(stock_status__in=[Product.STOCK_LOW, Product.STOCK_OUT])
         elif filter_mode == "high":
-            qs = qs.filter(quantity__gt=F("min_quantity_alert"))
+            qs = qs.filter(stock_status=Product.STOCK_OK)
 
         category_id = self.request.GET.get("category")
         if category_id:
@@ -66,6 +77,9 @@ class ProductListView(ListView):
         if max_val is not None:
             qs = qs.filter(unit_price__lte=max_val)
 
+        # ✅ exact SKU first, then ranked search (relevance order unless the user sorts)
+        qs, _ranked = search_products(qs, self.request.GET.get("q", ""))
+
         sort = self.request.GET.get("sort")
         if sort == "price_asc":
             qs = qs.order_by("unit_price")
@@ -199,7 +213,10 @@ def receive_stock_boxes(request):
         receive_weight_boxes(
             product=product,
             boxes_received=boxes,
-            box_weight_kg=box_weight
+            box_weight_kg=box_weight,
+            received_by=request.user,
+            batch_code=(request.POST.get("batch_code") or "").strip(),
+            expiry_date=request.POST.get("expiry_date") or None,
         )
         # product = get_object_or_404(Product, id=product_id)
         # # ✅ configure product for boxed weight + Code B fields
@@ -318,7 +335,7 @@ def stock_in(request):
         if form.is_valid():
             obj = form.save(commit=False)
             obj.created_by = request.user
-            obj.save()
+            receive_stock_entries([obj])
             messages.success(request, f"📦 Stock-in recorded for {obj.product.name}")
             return redirect("inventory_dashboard")
         else:
@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import ReportJob
 
-# Register your models here.
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "requested_by", "created_on", "finished_on", "attempts")
+    list_filter = ("kind", "status")
+    readonly_fields = ("created_on", "started_on", "finished_on")
@@ -0,0 +1,95 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from reports.models import ReportJob
+from reports.services import (
+    claim_report_jobs, release_report_jobs, requeue_stale_report_jobs, run_report_job,
+)
+
+
+class Command(BaseCommand):
+    help = "Render queued ReportJob exports (PDF / Excel) in a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int,
+            help="Worker processes (default: settings.REPORT_WORKER_CONCURRENCY).",
+        )
+        parser.add_argument("--poll", type=float, default=2.0, help="Seconds between queue polls when idle.")
+        parser.add_argument(
+            "--stale-minutes", type=int, default=30,
+            help="Requeue RUNNING jobs started longer ago than this (crashed worker).",
+        )
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"] or getattr(settings, "REPORT_WORKER_CONCURRENCY", 2)
+        if concurrency < 1:
+            raise CommandError("--concurrency must be at least 1")
+
+        requeued, failed = requeue_stale_report_jobs(older_than=timedelta(minutes=options["stale_minutes"]))
+        if requeued or failed:
+            self.stdout.write(f"Stale jobs: {requeued} requeued, {failed} failed.")
+
+        self.stdout.write(f"Report worker started ({concurrency} process(es)).")
+        try:
+            while not self.serve(concurrency, options):
+                self.stdout.write("A worker process died; starting a new pool.")
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping report worker...")
+
+    def serve(self, concurrency, options) -> bool:
+        """
+        Run one process pool. Returns True when --once has drained the queue, False when
+        a child process died: the pool is then unusable (BrokenProcessPool), so the jobs
+        it held are released and the caller starts a new pool.
+        """
+        # spawned children start from a clean interpreter (no shared DB connection);
+        # django.setup is the initializer so it runs before any job is unpickled
+        connections.close_all()
+        ctx = multiprocessing.get_context("spawn")
+        running = {}
+
+        with ProcessPoolExecutor(max_workers=concurrency, mp_context=ctx, initializer=django.setup) as pool:
+            while True:
+                claimed = claim_report_jobs(concurrency - len(running))
+                try:
+                    for job_id in claimed:
+                        running[pool.submit(run_report_job, job_id)] = job_id
+                except BrokenProcessPool:
+                    self.release(set(running.values()) | set(claimed))
+                    return False
+
+                if not running:
+                    if options["once"]:
+                        return True
+                    time.sleep(options["poll"])
+                    continue
+
+                done, _ = wait(running, timeout=options["poll"], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        status = future.result()
+                    except BrokenProcessPool:
+                        self.release(set(running.values()) | {job_id})
+                        return False
+                    except Exception as e:  # the job could not even be handed to the child
+                        status = ReportJob.FAILED
+                        ReportJob.objects.filter(id=job_id, status=ReportJob.RUNNING).update(
+                            status=status, error=f"Worker error: {e}", finished_on=timezone.now(),
+                        )
+                    self.stdout.write(f"Job #{job_id}: {status}")
+
+    def release(self, job_ids):
+        requeued, failed = release_report_jobs(job_ids, reason="Worker process died")
+        self.stdout.write(f"Released {len(job_ids)} job(s): {requeued} requeued, {failed} failed.")
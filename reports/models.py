@@ -1,3 +1,56 @@
+from django.contrib.auth.models import User
 from django.db import models
 
-# Create your models here.
+
+class ReportJob(models.Model):
+    """
+    Export rendered off-request by `manage.py run_report_worker`.
+    The finished file is stored under MEDIA_ROOT/reports/.
+    """
+    KIND_SALES_PDF = "sales_pdf"
+    KIND_SALES_EXCEL = "sales_excel"
+    KIND_EXPENSES_PDF = "expenses_pdf"
+    KIND_CHOICES = [
+        (KIND_SALES_PDF, "Sales PDF"),
+        (KIND_SALES_EXCEL, "Sales Excel"),
+        (KIND_EXPENSES_PDF, "Expenses PDF"),
+    ]
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)  # start / end / sale_type
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="report_jobs")
+
+    file = models.FileField(upload_to="reports/%Y/%m/", blank=True)
+    filename = models.CharField(max_length=120, blank=True)  # download name
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    started_on = models.DateTimeField(null=True, blank=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            # the worker's "next queued job" lookup
+            models.Index(fields=["status", "id"], name="reportjob_status_idx"),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.status})"
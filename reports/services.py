@@ -0,0 +1,494 @@
+# reports/services.py
+import csv
+import tempfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import DateField, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import ReportJob
+
+BUCKETS = ("day", "week", "month")
+
+# widest window a single request may ask for, per bucket
+MAX_WINDOW_DAYS = {"day": 366, "week": 3 * 366, "month": 5 * 366}
+
+
+def _trunc(field: str, bucket: str):
+    """Bucket expression, evaluated in the current timezone."""
+    if bucket == "month":
+        return TruncMonth(field, output_field=DateField())
+    if bucket == "week":
+        return TruncWeek(field, output_field=DateField())
+    return TruncDate(field)
+
+
+def bucket_start(d: date, bucket: str) -> date:
+    if bucket == "month":
+        return d.replace(day=1)
+    if bucket == "week":
+        return d - timedelta(days=d.weekday())  # Monday, like TruncWeek
+    return d
+
+
+def bucket_keys(start: date, end: date, bucket: str) -> list[date]:
+    """Every bucket between start and end (inclusive), used to gap-fill the series."""
+    keys = []
+    cur = bucket_start(start, bucket)
+    while cur <= end:
+        keys.append(cur)
+        if bucket == "month":
+            cur = (cur.replace(day=28) + timedelta(days=4)).replace(day=1)
+        elif bucket == "week":
+            cur += timedelta(days=7)
+        else:
+            cur += timedelta(days=1)
+    return keys
+
+
+def bucket_label(d: date, bucket: str) -> str:
+    return d.strftime("%Y-%m") if bucket == "month" else d.strftime("%Y-%m-%d")
+
+
+def clamp_window(start: date, end: date, bucket: str) -> tuple[date, date]:
+    """Order the range and cap it at MAX_WINDOW_DAYS[bucket] (keeping the end)."""
+    if start > end:
+        start, end = end, start
+    max_days = MAX_WINDOW_DAYS.get(bucket, MAX_WINDOW_DAYS["day"])
+    if (end - start).days + 1 > max_days:
+        start = end - timedelta(days=max_days - 1)
+    return start, end
+
+
+def time_series(qs, *, date_field: str, value_field: str, start: date, end: date, bucket: str = "day") -> list[Decimal]:
+    """
+    Sum value_field per bucket between start and end (local dates, inclusive)
+    in ONE grouped query, gap-filled with zeros.
+
+    The range filter is on the raw datetime column (index-friendly);
+    bucketing uses TruncDate/TruncWeek/TruncMonth in the current timezone.
+    """
+    tz = timezone.get_current_timezone()
+    start_dt = timezone.make_aware(datetime.combine(start, time.min), tz)
+    end_dt = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+
+    rows = (
+        qs.filter(**{f"{date_field}__gte": start_dt, f"{date_field}__lt": end_dt})
+        .annotate(bucket=_trunc(date_field, bucket))
+        .values("bucket")
+        .annotate(total=Sum(value_field))
+        .order_by("bucket")
+    )
+    totals = {r["bucket"]: r["total"] or Decimal("0.00") for r in rows}
+    return [totals.get(k, Decimal("0.00")) for k in bucket_keys(start, end, bucket)]
+
+
+# ------------------------------------------------------------
+# Period filters (same start/end semantics as reports.summary)
+# ------------------------------------------------------------
+def _day_start(d: date):
+    return timezone.make_aware(datetime.combine(d, time.min), timezone.get_current_timezone())
+
+
+def _parse_day(value):
+    """"YYYY-MM-DD" -> date; None for empty, malformed or impossible dates (2024-02-30)."""
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def filter_period(qs, *, start=None, end=None, field: str = "timestamp"):
+    """
+    start/end are local dates (date or "YYYY-MM-DD"), both inclusive.
+    Filters on the raw datetime column so an index on it can be used.
+    Unparseable values are ignored (that side of the period stays open).
+    """
+    if isinstance(start, str):
+        start = _parse_day(start)
+    if isinstance(end, str):
+        end = _parse_day(end)
+    if start:
+        qs = qs.filter(**{f"{field}__gte": _day_start(start)})
+    if end:
+        qs = qs.filter(**{f"{field}__lt": _day_start(end + timedelta(days=1))})
+    return qs
+
+
+def report_filters(request) -> dict:
+    """start / end / sale_type from the query string."""
+    return {
+        "start": request.GET.get("start") or None,
+        "end": request.GET.get("end") or None,
+        "sale_type": request.GET.get("sale_type") or None,
+    }
+
+
+# ------------------------------------------------------------
+# Streaming CSV
+# ------------------------------------------------------------
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() just hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename: str, header, rows) -> StreamingHttpResponse:
+    """
+    CSV download built row by row: constant memory no matter how many rows.
+    rows: any iterable of sequences (typically values_list(...).iterator()).
+    """
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def sales_export_rows(*, start=None, end=None, sale_type=None):
+    """(id, timestamp, username, total) for the sales CSV – one query, no per-row lookups."""
+    from sales.models import Sale
+
+    qs = filter_period(Sale.objects.all(), start=start, end=end)
+    if sale_type:
+        qs = qs.filter(sale_type=sale_type)
+    rows = (
+        qs.order_by("-timestamp", "-id")
+        .values_list("id", "timestamp", "created_by__username", "total_amount")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for sale_id, ts, username, total in rows:
+        yield (sale_id, ts, username or "", total)
+
+
+def expenses_export_rows(*, start=None, end=None):
+    """(id, timestamp, username, amount, category, note) for the expenses CSV – one query."""
+    from expenses.models import Expense
+
+    qs = filter_period(Expense.objects.all(), start=start, end=end)
+    rows = (
+        qs.order_by("-timestamp", "-id")
+        .values_list("id", "timestamp", "created_by__username", "amount", "category__name", "note")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for exp_id, ts, username, amount, category, note in rows:
+        yield (exp_id, ts, username or "", amount, category or "", note)
+
+
+# ------------------------------------------------------------
+# Excel (openpyxl write-only)
+# ------------------------------------------------------------
+# (header, width) per column – widths are fixed up front so nothing has to
+# re-walk the cells after writing (write-only sheets can't be read back anyway).
+SALES_COLUMNS = [("Sale ID", 10), ("Date", 21), ("Created By", 18), ("Sale Type", 11),
+                 ("Payment", 10), ("Total", 14), ("Paid", 14), ("Credit", 8)]
+ITEM_COLUMNS = [("Sale ID", 10), ("Date", 21), ("Product", 30), ("Size (kg)", 10),
+                ("Quantity", 10), ("Unit Price", 14), ("Line Total", 14)]
+PAYMENT_COLUMNS = [("Payment ID", 12), ("Sale ID", 10), ("Paid On", 21), ("Amount", 14),
+                   ("Method", 10), ("Reference", 24), ("Received By", 18)]
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _xl_time(ts) -> str:
+    return timezone.localtime(ts).strftime("%Y-%m-%d %H:%M:%S") if ts else ""
+
+
+def _write_only_sheet(wb, title: str, columns, rows):
+    from openpyxl.utils import get_column_letter
+
+    ws = wb.create_sheet(title=title)
+    for idx, (_, width) in enumerate(columns, 1):
+        ws.column_dimensions[get_column_letter(idx)].width = width
+    ws.append([header for header, _ in columns])
+    for row in rows:
+        ws.append(row)
+    return ws
+
+
+def _sales_sheet_rows(qs):
+    rows = (
+        qs.order_by("-timestamp", "-id")
+        .values_list("id", "timestamp", "created_by__username", "sale_type",
+                     "payment_method", "total_amount", "amount_paid", "is_credit")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for sale_id, ts, username, sale_type, method, total, paid, is_credit in rows:
+        yield [sale_id, _xl_time(ts), username or "", sale_type, method,
+               float(total or 0), float(paid or 0), "Yes" if is_credit else "No"]
+
+
+def _item_sheet_rows(qs):
+    rows = (
+        qs.order_by("-sale__timestamp", "-sale_id", "id")
+        .values_list("sale_id", "sale__timestamp", "product__name", "weight_price__weight_kg",
+                     "quantity", "unit_price")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for sale_id, ts, product, size_kg, qty, unit_price in rows:
+        unit_price = unit_price or Decimal("0.00")
+        yield [sale_id, _xl_time(ts), product or "Deleted Product",
+               float(size_kg) if size_kg is not None else "", qty,
+               float(unit_price), float(Decimal(qty or 0) * unit_price)]
+
+
+def _payment_sheet_rows(qs):
+    rows = (
+        qs.order_by("-paid_on", "-id")
+        .values_list("id", "sale_id", "paid_on", "amount", "payment_method", "reference",
+                     "received_by__username")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for pay_id, sale_id, paid_on, amount, method, reference, username in rows:
+        yield [pay_id, sale_id, _xl_time(paid_on), float(amount or 0), method, reference, username or ""]
+
+
+def write_sales_workbook(fileobj, *, start=None, end=None, sale_type=None):
+    """
+    Sales / Items / Credit Payments workbook written straight into fileobj.
+
+    openpyxl write-only mode keeps one row in memory at a time; each sheet is
+    fed from a values_list(...).iterator() (server-side cursor on Postgres).
+    Items and payments belong to the sales in the selected period.
+    """
+    from openpyxl import Workbook
+    from sales.models import CreditPayment, Sale, SaleItem
+
+    sales = filter_period(Sale.objects.all(), start=start, end=end)
+    items = filter_period(SaleItem.objects.all(), start=start, end=end, field="sale__timestamp")
+    payments = filter_period(CreditPayment.objects.all(), start=start, end=end, field="sale__timestamp")
+    if sale_type:
+        sales = sales.filter(sale_type=sale_type)
+        items = items.filter(sale__sale_type=sale_type)
+        payments = payments.filter(sale__sale_type=sale_type)
+
+    wb = Workbook(write_only=True)
+    _write_only_sheet(wb, "Sales", SALES_COLUMNS, _sales_sheet_rows(sales))
+    _write_only_sheet(wb, "Items", ITEM_COLUMNS, _item_sheet_rows(items))
+    _write_only_sheet(wb, "Credit Payments", PAYMENT_COLUMNS, _payment_sheet_rows(payments))
+    wb.save(fileobj)
+    return fileobj
+
+
+# ------------------------------------------------------------
+# PDF (reportlab)
+# ------------------------------------------------------------
+def render_sales_pdf(fileobj, *, start=None, end=None, sale_type=None):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from sales.models import Sale
+
+    sales = filter_period(Sale.objects.all(), start=start, end=end)
+    if sale_type:
+        sales = sales.filter(sale_type=sale_type)
+    rows = (
+        sales.order_by("-timestamp", "-id")
+        .values_list("id", "timestamp", "created_by__first_name", "created_by__last_name", "total_amount")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    p = canvas.Canvas(fileobj, pagesize=A4)
+    width, height = A4
+
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(40, height - 50, "Sales Report")
+    p.setFont("Helvetica", 9)
+    p.drawString(40, height - 65, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    y = height - 90
+    p.setFont("Helvetica-Bold", 9)
+    p.drawString(40, y, "ID")
+    p.drawString(90, y, "Date")
+    p.drawString(220, y, "User")
+    p.drawRightString(width - 40, y, "Total (₵)")
+    p.line(35, y-3, width-35, y-3)
+    y -= 14
+    p.setFont("Helvetica", 9)
+
+    for sale_id, ts, first_name, last_name, total in rows:
+        if y < 60:
+            p.showPage()
+            y = height - 40
+        p.drawString(40, y, str(sale_id))
+        p.drawString(90, y, timezone.localtime(ts).strftime("%Y-%m-%d"))
+        p.drawString(220, y, f"{first_name or ''} {last_name or ''}".strip())
+        p.drawRightString(width - 40, y, f"{float(total):.2f}")
+        y -= 12
+
+    p.showPage()
+    p.save()
+    return fileobj
+
+
+def render_expenses_pdf(fileobj, *, start=None, end=None, **_):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from expenses.models import Expense
+
+    rows = (
+        filter_period(Expense.objects.all(), start=start, end=end)
+        .order_by("-timestamp", "-id")
+        .values_list("timestamp", "category__name", "note", "amount")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    p = canvas.Canvas(fileobj, pagesize=A4)
+    width, height = A4
+
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(40, height - 50, "Expenses Report")
+    p.setFont("Helvetica", 9)
+    p.drawString(40, height - 65, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    y = height - 90
+    p.setFont("Helvetica-Bold", 9)
+    p.drawString(40, y, "Date")
+    p.drawString(140, y, "Category")
+    p.drawString(320, y, "Note")
+    p.drawRightString(width - 40, y, "Amount (₵)")
+    p.line(35, y-3, width-35, y-3)
+    y -= 14
+    p.setFont("Helvetica", 9)
+
+    for ts, category, note, amount in rows:
+        if y < 60:
+            p.showPage()
+            y = height - 40
+        p.drawString(40, y, timezone.localtime(ts).strftime("%Y-%m-%d %H:%M"))
+        p.drawString(140, y, category or "—")
+        p.drawString(320, y, (note[:30] + '...') if note and len(note) > 30 else (note or "—"))
+        p.drawRightString(width - 40, y, f"{float(amount):.2f}")
+        y -= 12
+
+    p.showPage()
+    p.save()
+    return fileobj
+
+
+# ------------------------------------------------------------
+# Report jobs (rendered by `manage.py run_report_worker`)
+# ------------------------------------------------------------
+# kind -> (renderer, download name prefix, extension)
+REPORT_RENDERERS = {
+    ReportJob.KIND_SALES_PDF: (render_sales_pdf, "sales", "pdf"),
+    ReportJob.KIND_SALES_EXCEL: (write_sales_workbook, "sales", "xlsx"),
+    ReportJob.KIND_EXPENSES_PDF: (render_expenses_pdf, "expenses", "pdf"),
+}
+
+REPORT_SPOOL_MAX_BYTES = 10 * 1024 * 1024
+REPORT_JOB_MAX_ATTEMPTS = 3
+
+
+def enqueue_report_job(*, kind: str, params: dict, user) -> ReportJob:
+    """
+    Queue an export for the worker.
+    The same user asking for the same export while it is still pending gets the pending job back.
+    """
+    if kind not in REPORT_RENDERERS:
+        raise ValueError(f"Unknown report type: {kind}")
+    params = {k: v for k, v in (params or {}).items() if v}
+
+    pending = (
+        ReportJob.objects
+        .filter(kind=kind, params=params, requested_by=user, status__in=[ReportJob.QUEUED, ReportJob.RUNNING])
+        .first()
+    )
+    if pending:
+        return pending
+
+    job = ReportJob.objects.create(kind=kind, params=params, requested_by=user)
+    if getattr(settings, "REPORT_JOBS_INLINE", False):
+        run_report_job(job.id)
+        job.refresh_from_db()
+    return job
+
+
+def claim_report_jobs(limit: int) -> list[int]:
+    """
+    Move up to `limit` queued jobs to RUNNING and return their ids (oldest first).
+    SKIP LOCKED lets several workers poll the same table; the status-guarded
+    UPDATE keeps the claim safe on backends without row locks (SQLite).
+    """
+    if limit <= 0:
+        return []
+    claimed = []
+    with transaction.atomic():
+        candidates = list(
+            ReportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ReportJob.QUEUED)
+            .order_by("id")
+            .values_list("id", flat=True)[:limit]
+        )
+        now = timezone.now()
+        for job_id in candidates:
+            won = ReportJob.objects.filter(id=job_id, status=ReportJob.QUEUED).update(
+                status=ReportJob.RUNNING, started_on=now, attempts=F("attempts") + 1,
+            )
+            if won:
+                claimed.append(job_id)
+    return claimed
+
+
+def _release_running_jobs(qs, *, reason: str) -> tuple[int, int]:
+    """
+    RUNNING jobs in qs go back to the queue; a job that has already been claimed
+    REPORT_JOB_MAX_ATTEMPTS times fails instead (it keeps killing its worker).
+    Returns (requeued, failed).
+    """
+    qs = qs.filter(status=ReportJob.RUNNING)
+    failed = qs.filter(attempts__gte=REPORT_JOB_MAX_ATTEMPTS).update(
+        status=ReportJob.FAILED,
+        error=f"{reason}; gave up after {REPORT_JOB_MAX_ATTEMPTS} attempts.",
+        finished_on=timezone.now(),
+    )
+    requeued = qs.update(status=ReportJob.QUEUED, started_on=None)
+    return requeued, failed
+
+
+def requeue_stale_report_jobs(*, older_than: timedelta) -> tuple[int, int]:
+    """RUNNING jobs whose worker died (started longer ago than older_than): requeue or fail."""
+    stale = ReportJob.objects.filter(started_on__lt=timezone.now() - older_than)
+    return _release_running_jobs(stale, reason="Worker stopped while rendering")
+
+
+def release_report_jobs(job_ids, *, reason: str) -> tuple[int, int]:
+    """Jobs a worker claimed but could not finish (its process pool broke): requeue or fail."""
+    return _release_running_jobs(ReportJob.objects.filter(id__in=list(job_ids)), reason=reason)
+
+
+def run_report_job(job_id: int) -> str:
+    """Render one job into MEDIA_ROOT and record the outcome. Returns the final status."""
+    job = ReportJob.objects.get(id=job_id)
+    renderer, prefix, ext = REPORT_RENDERERS[job.kind]
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_BYTES) as out:
+            renderer(out, **job.params)
+            out.seek(0)
+            stamp = timezone.localtime().strftime("%Y%m%d_%H%M%S")
+            job.filename = f"{prefix}_{stamp}.{ext}"
+            job.file.save(f"{prefix}_{job.id}_{stamp}.{ext}", File(out), save=False)
+    except Exception as e:
+        job.status = ReportJob.FAILED
+        job.error = f"{type(e).__name__}: {e}"
+    else:
+        job.status = ReportJob.DONE
+        job.error = ""
+    job.finished_on = timezone.now()
+    job.save(update_fields=["status", "error", "file", "filename", "finished_on"])
+    return job.status
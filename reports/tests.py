@@ -1,3 +1,266 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from expenses.models import Expense
+from inventory.models import Product
+from sales.models import CreditPayment, Sale, SaleItem
+
+from .models import ReportJob
+from .services import (
+    REPORT_JOB_MAX_ATTEMPTS, bucket_keys, claim_report_jobs, enqueue_report_job, filter_period,
+    requeue_stale_report_jobs, time_series, write_sales_workbook,
+)
+
+
+def at(d: date, hour=12):
+    return timezone.make_aware(datetime.combine(d, time(hour)))
+
+
+class TimeSeriesTests(TestCase):
+    def sale(self, d, total, hour=12):
+        sale = Sale.objects.create(total_amount=Decimal(total))
+        Sale.objects.filter(pk=sale.pk).update(timestamp=at(d, hour))  # timestamp is auto_now_add
+
+    def test_days_without_rows_are_zero(self):
+        self.sale(date(2025, 3, 1), "10.00")
+        self.sale(date(2025, 3, 1), "5.50", hour=23)
+        self.sale(date(2025, 3, 4), "7.00")
+        self.sale(date(2025, 3, 6), "99.00")  # outside the window
+
+        series = time_series(Sale.objects.all(), date_field="timestamp", value_field="total_amount",
+                             start=date(2025, 3, 1), end=date(2025, 3, 5))
+        self.assertEqual(series, [Decimal("15.50"), 0, 0, Decimal("7.00"), 0])
+
+    def test_week_and_month_buckets(self):
+        self.sale(date(2025, 3, 3), "1.00")   # Monday
+        self.sale(date(2025, 3, 9), "2.00")   # Sunday, same week
+        self.sale(date(2025, 3, 20), "4.00")
+        self.sale(date(2025, 5, 2), "8.00")
+
+        weeks = time_series(Sale.objects.all(), date_field="timestamp", value_field="total_amount",
+                            start=date(2025, 3, 5), end=date(2025, 3, 23), bucket="week")
+        self.assertEqual(bucket_keys(date(2025, 3, 5), date(2025, 3, 23), "week"),
+                         [date(2025, 3, 3), date(2025, 3, 10), date(2025, 3, 17)])
+        self.assertEqual(weeks, [Decimal("2.00"), 0, Decimal("4.00")])  # the window starts on the 5th
+
+        months = time_series(Sale.objects.all(), date_field="timestamp", value_field="total_amount",
+                             start=date(2025, 3, 1), end=date(2025, 5, 31), bucket="month")
+        self.assertEqual(months, [Decimal("7.00"), 0, Decimal("8.00")])
+
+    def test_chart_endpoint(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user("viewer"))
+        self.sale(date(2025, 3, 2), "12.00")
+        expense = Expense.objects.create(amount=Decimal("3.00"))
+        Expense.objects.filter(pk=expense.pk).update(timestamp=at(date(2025, 3, 3)))
+
+        response = self.client.get(reverse("chart_sales_vs_expenses"), {"start": "2025-03-01", "end": "2025-03-03"})
+        self.assertEqual(response.json()["labels"], ["2025-03-01", "2025-03-02", "2025-03-03"])
+        self.assertEqual(response.json()["sales"], [0.0, 12.0, 0.0])
+        self.assertEqual(response.json()["expenses"], [0.0, 0.0, 3.0])
+
+        bad = self.client.get(reverse("chart_sales_vs_expenses"), {"start": "March"})
+        self.assertEqual(bad.status_code, 400)
+
+
+class FilterPeriodTests(TestCase):
+    def setUp(self):
+        self.sale = Sale.objects.create(total_amount=Decimal("10.00"))
+        self.today = timezone.localdate(self.sale.timestamp)
+
+    def test_impossible_dates_are_ignored(self):
+        qs = filter_period(Sale.objects.all(), start="2024-02-30", end="2024-13-01")
+        self.assertEqual(list(qs), [self.sale])
+
+    def test_malformed_and_empty_dates_are_ignored(self):
+        self.assertEqual(list(filter_period(Sale.objects.all(), start="yesterday", end="")), [self.sale])
+
+    def test_valid_bounds_still_apply(self):
+        self.assertFalse(filter_period(Sale.objects.all(), start=date(2099, 1, 1)).exists())
+        qs = filter_period(Sale.objects.all(), start="2024-02-30", end=self.today.isoformat())
+        self.assertEqual(list(qs), [self.sale])
+
+    def test_summary_survives_an_impossible_date(self):
+        user = User.objects.create_user("accountant")
+        user.groups.add(Group.objects.create(name="Accountant"))
+        self.client.force_login(user)
+        response = self.client.get(reverse("reports_summary"), {"start": "2024-02-30"})
+        self.assertEqual(response.status_code, 200)
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("accountant")
+        self.user.groups.add(Group.objects.create(name="Accountant"))
+        self.client.force_login(self.user)
+
+    def download(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_sales_csv_filters_and_joins_the_cashier(self):
+        Sale.objects.create(total_amount=Decimal("12.50"), created_by=self.user, sale_type="wholesale")
+        Sale.objects.create(total_amount=Decimal("3.00"))
+
+        lines = self.download("export_sales_csv", sale_type="wholesale")
+        self.assertEqual(lines[0], "Sale ID,Date,Created By,Total")
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith(",accountant,12.50"))
+
+    def test_expenses_csv_period(self):
+        Expense.objects.create(amount=Decimal("4.00"), note="ice")
+        old = Expense.objects.create(amount=Decimal("9.00"))
+        Expense.objects.filter(pk=old.pk).update(timestamp=at(date(2020, 1, 1)))
+
+        lines = self.download("export_expenses_csv", start=timezone.localdate().isoformat())
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith(",4.00,,ice"))
+
+
+class SalesWorkbookTests(TestCase):
+    def setUp(self):
+        self.cashier = User.objects.create_user("cashier")
+        wings = Product.objects.create(name="Wings", unit_price=Decimal("30.00"))
+        self.sale = Sale.objects.create(
+            created_by=self.cashier, sale_type="wholesale", payment_method="credit", is_credit=True,
+            total_amount=Decimal("90.00"),
+        )
+        SaleItem.objects.create(sale=self.sale, product=wings, quantity=3, unit_price=Decimal("30.00"))
+        CreditPayment.objects.create(sale=self.sale, amount=Decimal("40.00"), reference="MOMO-1", received_by=self.cashier)
+        Sale.objects.create(total_amount=Decimal("5.00"))  # retail, filtered out below
+
+    def sheets(self, **filters):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(write_sales_workbook(BytesIO(), **filters))
+        return {ws.title: [list(row) for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets}
+
+    def test_three_sheets_one_query_each(self):
+        with self.assertNumQueries(3):
+            write_sales_workbook(BytesIO(), sale_type="wholesale")
+
+        sheets = self.sheets(sale_type="wholesale")
+        self.assertEqual(list(sheets), ["Sales", "Items", "Credit Payments"])
+
+        sales = sheets["Sales"]
+        self.assertEqual(sales[0][0], "Sale ID")
+        self.assertEqual(len(sales), 2)
+        self.assertEqual([sales[1][i] for i in (0, 2, 3, 5, 6, 7)], [self.sale.id, "cashier", "wholesale", 90, 40, "Yes"])
+
+        self.assertEqual(sheets["Items"][1][2:], ["Wings", None, 3, 30, 90])
+        self.assertEqual([sheets["Credit Payments"][1][i] for i in (1, 3, 5, 6)], [self.sale.id, 40, "MOMO-1", "cashier"])
+
+    def test_period_excludes_everything(self):
+        sheets = self.sheets(start="2099-01-01")
+        self.assertEqual([len(rows) for rows in sheets.values()], [1, 1, 1])  # headers only
+
+
+class ReportJobTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media, REPORT_JOBS_INLINE=False)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user("accountant")
+        Sale.objects.create(total_amount=Decimal("12.00"))
+
+    def queue(self, kind=ReportJob.KIND_SALES_EXCEL, **params):
+        return enqueue_report_job(kind=kind, params=params, user=self.user)
+
+    def test_pending_export_is_reused(self):
+        job = self.queue(start="2025-01-01")
+        self.assertEqual(self.queue(start="2025-01-01"), job)
+        self.assertNotEqual(self.queue(start="2025-02-01"), job)
+
+    def test_claim_takes_each_job_once(self):
+        first, second, third = self.queue(), self.queue(start="2025-01-01"), self.queue(start="2025-02-01")
+        self.assertEqual(claim_report_jobs(2), [first.id, second.id])
+        self.assertEqual(claim_report_jobs(2), [third.id])
+        self.assertEqual(claim_report_jobs(2), [])
+
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), (ReportJob.RUNNING, 1))
+
+    def test_stale_jobs_requeue_until_attempts_run_out(self):
+        job = self.queue()
+        for attempt in range(1, REPORT_JOB_MAX_ATTEMPTS + 1):
+            self.assertEqual(claim_report_jobs(1), [job.id])
+            ReportJob.objects.filter(id=job.id).update(started_on=timezone.now() - timedelta(hours=1))
+            expected = (1, 0) if attempt < REPORT_JOB_MAX_ATTEMPTS else (0, 1)
+            self.assertEqual(requeue_stale_report_jobs(older_than=timedelta(minutes=30)), expected)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ReportJob.FAILED, REPORT_JOB_MAX_ATTEMPTS))
+        self.assertIn("gave up", job.error)
+
+    def test_recent_running_jobs_are_left_alone(self):
+        job = self.queue()
+        claim_report_jobs(1)
+        self.assertEqual(requeue_stale_report_jobs(older_than=timedelta(minutes=30)), (0, 0))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.RUNNING)
+
+    def test_inline_renders_in_the_request(self):
+        self.user.groups.add(Group.objects.create(name="Accountant"))
+        self.client.force_login(self.user)
+        with override_settings(REPORT_JOBS_INLINE=True):
+            response = self.client.get(reverse("export_sales_excel"))
+
+        job = ReportJob.objects.get()
+        self.assertRedirects(response, reverse("report_job_detail", args=[job.id]), fetch_redirect_response=False)
+        self.assertEqual(job.status, ReportJob.DONE)
+        download = self.client.get(reverse("report_job_download", args=[job.id]))
+        self.assertEqual(download.status_code, 200)
+        download.close()
+        self.assertTrue(job.filename.endswith(".xlsx"))
+
+    def test_worker_restarts_a_broken_pool(self):
+        job = self.queue()
+        pools = []
+
+        class FakePool:
+            """First pool: the child dies. Later pools: render in this process."""
+
+            def __init__(self, **kwargs):
+                self.broken = not pools
+                pools.append(self)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def submit(self, fn, job_id):
+                future = Future()
+                if self.broken:
+                    future.set_exception(BrokenProcessPool("child died"))
+                else:
+                    future.set_result(fn(job_id))
+                return future
+
+        out = StringIO()
+        with mock.patch("reports.management.commands.run_report_worker.ProcessPoolExecutor", FakePool):
+            call_command("run_report_worker", "--once", "--poll", "0", stdout=out)
+
+        job.refresh_from_db()
+        self.assertEqual(len(pools), 2)
+        self.assertEqual((job.status, job.attempts), (ReportJob.DONE, 2))
+        self.assertIn("1 requeued", out.getvalue())
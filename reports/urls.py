@@ -14,7 +14,11 @@ from . import views
 urlpatterns = [
     path("", views.summary, name="reports_summary"),
     path("export/sales/csv/", views.export_sales_csv, name="export_sales_csv"),
+    path("export/expenses/csv/", views.export_expenses_csv, name="export_expenses_csv"),
     path("export/sales/excel/", views.export_sales_excel, name="export_sales_excel"),
     path("export/sales/pdf/", views.export_sales_pdf, name="export_sales_pdf"),
+    path("jobs/<int:pk>/", views.report_job_detail, name="report_job_detail"),
+    path("jobs/<int:pk>/status/", views.report_job_status, name="report_job_status"),
+    path("jobs/<int:pk>/download/", views.report_job_download, name="report_job_download"),
     path("api/chart-sales-expenses/", views.chart_sales_vs_expenses, name="chart_sales_vs_expenses"),
 ]
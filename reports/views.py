@@ -19,6 +19,19 @@ from django.db.models import Sum
 from datetime import datetime, timedelta
 from users.utils import has_any_group
 from django.template.loader import render_to_string
+from django.core.cache import cache
+from django.utils import timezone
+from .services import (
+    BUCKETS, MAX_WINDOW_DAYS, bucket_keys, bucket_label, clamp_window, time_series,
+    report_filters, stream_csv, sales_export_rows, expenses_export_rows, filter_period,
+    enqueue_report_job,
+)
+from .models import ReportJob
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+
+CHART_CACHE_SECONDS = 60
 
 try:
     import openpyxl  # type: ignore
@@ -63,15 +76,9 @@ def summary(request):
     start = request.GET.get("start")
     end = request.GET.get("end")
 
-    qs_sales = Sale.objects.all()
-    qs_expenses = Expense.objects.all()
-
-    if start:
-        qs_sales = qs_sales.filter(timestamp__date__gte=start)
-        qs_expenses = qs_expenses.filter(timestamp__date__gte=start)
-    if end:
-        qs_sales = qs_sales.filter(timestamp__date__lte=end)
-        qs_expenses = qs_expenses.filter(timestamp__date__lte=end)
+    # same period rules as the exports (impossible dates are ignored, not a 500)
+    qs_sales = filter_period(Sale.objects.all(), start=start, end=end)
+    qs_expenses = filter_period(Expense.objects.all(), start=start, end=end)
 
     total_sales = qs_sales.aggregate(total=Sum("total_amount"))["total"] or Decimal("0.00")
     total_expenses = qs_expenses.aggregate(total=Sum("amount"))["total"] or Decimal("0.00")
@@ -162,15 +169,14 @@ def summary(request):
 #     return response
 # added by frank for exporting expenses to csv
 @login_required
+@has_any_group("SuperAdmin","Admin","Accountant")
 def export_expenses_csv(request):
-    expenses = Expense.objects.all().order_by("-timestamp")
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = f'attachment; filename="expenses_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    writer = csv.writer(response)
-    writer.writerow(["Expense ID", "Date", "Created By", "Amount", "Category", "Note"])
-    for e in expenses:
-        writer.writerow([e.id, e.timestamp, e.created_by.username if e.created_by else "", e.amount, e.category.name if e.category else "", e.note])
-    return response
+    f = report_filters(request)
+    return stream_csv(
+        f'expenses_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
+        ["Expense ID", "Date", "Created By", "Amount", "Category", "Note"],
+        expenses_export_rows(start=f["start"], end=f["end"]),
+    )
 
 
 
@@ -179,14 +185,12 @@ def export_expenses_csv(request):
 @login_required
 @has_any_group("Admin","Accountant")
 def export_sales_csv(request):
-    sales = Sale.objects.all().order_by("-timestamp")
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = f'attachment; filename="sales_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    writer = csv.writer(response)
-    writer.writerow(["Sale ID", "Date", "Created By", "Total"])
-    for s in sales:
-        writer.writerow([s.id, s.timestamp, s.created_by.username if s.created_by else "", s.total_amount])
-    return response
+    # ?start=YYYY-MM-DD&end=YYYY-MM-DD&sale_type=retail|wholesale
+    return stream_csv(
+        f'sales_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
+        ["Sale ID", "Date", "Created By", "Total"],
+        sales_export_rows(**report_filters(request)),
+    )
 
 @login_required
 @has_any_group("SuperAdmin","Admin","Accountant")       
@@ -197,95 +201,96 @@ def export_sales_excel(request):
             status=500,
         )
 
-    sales = Sale.objects.all().order_by("-timestamp")
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Sales"
-
-    headers = ["Sale ID", "Date", "Created By", "Total"]
-    for col, h in enumerate(headers, 1):
-        ws.cell(row=1, column=col, value=h)
-
-    for idx, s in enumerate(sales, start=2):
-        ws.cell(row=idx, column=1, value=s.id)
-        ws.cell(row=idx, column=2, value=s.timestamp.strftime("%Y-%m-%d %H:%M:%S"))
-        ws.cell(row=idx, column=3, value=s.created_by.username if s.created_by else "")
-        ws.cell(row=idx, column=4, value=float(s.total_amount))
-
-    # Autosize columns
-    for col in ws.columns:
-        max_length = 0
-        col_letter = get_column_letter(col[0].column)
-        for cell in col:
-            try:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-        ws.column_dimensions[col_letter].width = max_length + 2
-
-    out = io.BytesIO()
-    wb.save(out)
-    out.seek(0)
-    response = HttpResponse(out.read(), content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-    response["Content-Disposition"] = f'attachment; filename="sales_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-    return response
+    return _enqueue_export(request, ReportJob.KIND_SALES_EXCEL)
 
 @login_required
 @has_any_group("SuperAdmin","SubAdmin","Admin","Accountant")
 def export_sales_pdf(request):
-    sales = Sale.objects.all().order_by('-timestamp')
-
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(40, height - 50, "Sales Report")
-    p.setFont("Helvetica", 9)
-    p.drawString(40, height - 65, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-
-    y = height - 90
-    p.setFont("Helvetica-Bold", 9)
-    p.drawString(40, y, "ID")
-    p.drawString(90, y, "Date")
-    p.drawString(220, y, "User")
-    p.drawRightString(width - 40, y, "Total (₵)")
-    p.line(35, y-3, width-35, y-3)
-    y -= 14
-    p.setFont("Helvetica", 9)
-
-    for s in sales:
-        if y < 60:
-            p.showPage()
-            y = height - 40
-        p.drawString(40, y, str(s.id))
-        p.drawString(90, y, s.timestamp.strftime("%Y-%m-%d"))
-        p.drawString(220, y, s.created_by.get_full_name() if hasattr(s, 'created_by') and s.created_by else "")
-        p.drawRightString(width - 40, y, f"{float(s.total_amount):.2f}")
-        y -= 12
-
-    p.showPage()
-    p.save()
-    pdf = buffer.getvalue()
-    buffer.close()
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="sales_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"'
-    return response
+    return _enqueue_export(request, ReportJob.KIND_SALES_PDF)
+
+
+# ------------------------------------------------------------
+# ✅ Report jobs: exports are rendered by `manage.py run_report_worker`
+# ------------------------------------------------------------
+def _enqueue_export(request, kind):
+    job = enqueue_report_job(kind=kind, params=report_filters(request), user=request.user)
+    return redirect("report_job_detail", pk=job.pk)
+
+
+def _get_own_job(request, pk):
+    job = get_object_or_404(ReportJob, pk=pk)
+    if job.requested_by_id != request.user.id and not request.user.is_superuser:
+        raise Http404("Report not found")
+    return job
+
+
+def _job_payload(job):
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "error": job.error,
+        "download_url": reverse("report_job_download", args=[job.id]) if job.status == ReportJob.DONE else None,
+    }
+
+
+@login_required
+def report_job_detail(request, pk):
+    job = _get_own_job(request, pk)
+    return render(request, "reports/report_job.html", {"job": job, "payload": _job_payload(job)})
+
+
+@login_required
+def report_job_status(request, pk):
+    return JsonResponse(_job_payload(_get_own_job(request, pk)))
+
+
+@login_required
+def report_job_download(request, pk):
+    job = _get_own_job(request, pk)
+    if job.status != ReportJob.DONE or not job.file:
+        raise Http404("Report is not ready")
+    return FileResponse(job.file.open("rb"), as_attachment=True, filename=job.filename or None)
 
  
+@login_required
 def chart_sales_vs_expenses(request):
-    # last 30 days
-    days = int(request.GET.get("days", 30))
-    labels = []
-    sales_data = []
-    expenses_data = []
-    today = datetime.today().date()
-    for i in range(days - 1, -1, -1):
-        day = today - timedelta(days=i)
-        labels.append(day.strftime("%Y-%m-%d"))
-        ds = Sale.objects.filter(timestamp__date=day).aggregate(total=Sum("total_amount"))["total"] or 0
-        de = Expense.objects.filter(timestamp__date=day).aggregate(total=Sum("amount"))["total"] or 0
-        sales_data.append(float(ds))
-        expenses_data.append(float(de))
-    return JsonResponse({"labels": labels, "sales": sales_data, "expenses": expenses_data})
+    """
+    Sales vs expenses series.
+    ?days=30 (default) or ?start=YYYY-MM-DD&end=YYYY-MM-DD, ?bucket=day|week|month
+    One grouped query per source; window capped per bucket; response cached per range + bucket.
+    """
+    bucket = request.GET.get("bucket", "day")
+    if bucket not in BUCKETS:
+        bucket = "day"
+
+    today = timezone.localdate()
+    try:
+        end = datetime.strptime(request.GET["end"], "%Y-%m-%d").date() if request.GET.get("end") else today
+        if request.GET.get("start"):
+            start = datetime.strptime(request.GET["start"], "%Y-%m-%d").date()
+        else:
+            days = max(1, int(request.GET.get("days", 30)))
+            start = end - timedelta(days=min(days, MAX_WINDOW_DAYS[bucket]) - 1)
+    except ValueError:
+        return JsonResponse({"error": "Invalid days/start/end."}, status=400)
+
+    start, end = clamp_window(start, end, bucket)
+
+    cache_key = f"reports:chart_sales_vs_expenses:{bucket}:{start}:{end}"
+    data = cache.get(cache_key)
+    if data is None:
+        sales = time_series(Sale.objects.all(), date_field="timestamp", value_field="total_amount",
+                            start=start, end=end, bucket=bucket)
+        expenses = time_series(Expense.objects.all(), date_field="timestamp", value_field="amount",
+                               start=start, end=end, bucket=bucket)
+        data = {
+            "labels": [bucket_label(k, bucket) for k in bucket_keys(start, end, bucket)],
+            "sales": [float(v) for v in sales],
+            "expenses": [float(v) for v in expenses],
+            "bucket": bucket,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+        }
+        cache.set(cache_key, data, CHART_CACHE_SECONDS)
+    return JsonResponse(data)
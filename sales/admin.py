@@ -2,7 +2,7 @@
 # from .models import Sale, SaleItem, CreditPayment
 
 from django.contrib import admin
-from .models import Sale, SaleItem, CreditPayment
+from .models import Customer, Sale, SaleItem, CreditPayment
 
 # @admin.register(Sale)
 # class SaleAdmin(admin.ModelAdmin):
@@ -16,10 +16,19 @@ from .models import Sale, SaleItem, CreditPayment
 class SaleAdmin(admin.ModelAdmin):
     list_display = ('id', 'sale_type', 'customer_name', 'customer_phone', 'payment_method', 'apply_vat', 'subtotal_amount', 'vat_amount', 'total_amount', 'is_credit', 'amount_paid', 'balance_due_calc', 'due_date', 'timestamp')
     list_filter = ('sale_type', 'payment_method', 'apply_vat', 'is_credit', 'timestamp', 'due_date')
-    search_fields = ('customer_name', 'customer_phone', 'id')#     readonly_fields = ('subtotal_amount', 'vat_amount', 'total_amount', 'amount_paid', 'balance_due_calc', 'timestamp')
+    search_fields = ('customer_name', 'customer_phone', 'id')
+    raw_id_fields = ('customer',)
+#     readonly_fields = ('subtotal_amount', 'vat_amount', 'total_amount', 'amount_paid', 'balance_due_calc', 'timestamp')
 #     list_editable = ('is_credit', 'due_date')
 #     ordering = ('-timestamp',)
 
+
+@admin.register(Customer)
+class CustomerAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'phone', 'credit_total', 'balance_due', 'created_on')
+    search_fields = ('phone', 'name_key')
+    readonly_fields = ('name_key', 'credit_total', 'balance_due', 'created_on')
+
 # @admin.register(SaleItem)
 # class SaleItemAdmin(admin.ModelAdmin):
 #     list_display = ('id', 'sale', 'product', 'weight_size', 'quantity', 'unit_price', 'line_total')
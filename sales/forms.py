@@ -48,6 +48,12 @@ class SaleItemForm(forms.ModelForm):
         self.fields["product"].queryset = Product.objects.all()
         # self.fields["unit_price"].widget.attrs["readonly"] = "readonly"
 
+        # ✅ options are filled client-side from the cached catalogue (sales_catalogue);
+        # each row only renders its current value instead of every product / weight size
+        for name in ("product", "weight_price"):
+            value = self[name].value()
+            self.fields[name].widget.choices = [("", "---------")] + ([(value, value)] if value else [])
+
     def clean(self):
         cleaned = super().clean()
         product = cleaned.get("product")
@@ -129,7 +135,7 @@ class CreditPaymentForm(forms.ModelForm):
         amt = self.cleaned_data.get("amount") or Decimal("0.00")
         if amt <= Decimal("0.00"):
             raise forms.ValidationError("Payment amount must be greater than 0.")
-#         return amt
+        return amt
 # """
 
 # # sales/forms.py
@@ -0,0 +1,121 @@
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import (
+    Case, DecimalField, Exists, F, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from sales.models import CreditPayment, Customer, Sale
+
+ZERO = Value(Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+class Command(BaseCommand):
+    help = (
+        "Check stored Sale.amount_paid / balance_due against the credit payments "
+        "(one grouped query), then the Customer running credit columns against their "
+        "sales, and optionally repair the mismatches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Write the recomputed values back.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        paid_sum = (
+            CreditPayment.objects.filter(sale=OuterRef("pk"))
+            .order_by()
+            .values("sale")
+            .annotate(s=Sum("amount"))
+            .values("s")
+        )
+        has_payments = Exists(CreditPayment.objects.filter(sale=OuterRef("pk")))
+
+        # credit sales (open or settled) are paid through CreditPayment rows;
+        # cash / momo / card sales carry amount_paid = total_amount and no payments
+        expected_paid = Case(
+            When(Q(is_credit=True) | Q(has_payments=True), then=Coalesce(Subquery(paid_sum), ZERO)),
+            default=F("amount_paid"),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+
+        qs = (
+            Sale.objects.annotate(has_payments=has_payments)
+            .annotate(expected_paid=expected_paid)
+            .annotate(expected_balance=Greatest(F("total_amount") - F("expected_paid"), ZERO))
+            .filter(~Q(amount_paid=F("expected_paid")) | ~Q(balance_due=F("expected_balance")))
+            .order_by("id")
+        )
+
+        mismatched = []
+        for sale in qs.iterator(chunk_size=options["batch_size"]):
+            self.stdout.write(
+                f"Sale #{sale.id}: paid {sale.amount_paid} -> {sale.expected_paid}, "
+                f"balance {sale.balance_due} -> {sale.expected_balance}"
+            )
+            sale.amount_paid = sale.expected_paid
+            sale.balance_due = sale.expected_balance
+            if sale.is_credit and sale.balance_due <= 0:
+                sale.is_credit = False
+            mismatched.append(sale)
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS("All stored credit balances match the payments."))
+        elif not options["fix"]:
+            self.stdout.write(self.style.WARNING(f"{len(mismatched)} sale(s) out of step. Re-run with --fix to repair."))
+        else:
+            with transaction.atomic():
+                Sale.objects.bulk_update(
+                    mismatched, ["amount_paid", "balance_due", "is_credit"], batch_size=options["batch_size"],
+                )
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(mismatched)} sale(s)."))
+
+            # bulk_update skips the rollup signals: redo the affected days
+            since = min(timezone.localdate(sale.timestamp) for sale in mismatched)
+            call_command("rebuild_daily_rollups", since=since.isoformat(), stdout=self.stdout)
+
+        self.reconcile_customers(options)
+
+    def reconcile_customers(self, options):
+        def credit_sum(field):
+            return Coalesce(
+                Subquery(
+                    Sale.objects.filter(customer=OuterRef("pk"), payment_method="credit")
+                    .order_by()
+                    .values("customer")
+                    .annotate(s=Sum(field))
+                    .values("s")
+                ),
+                ZERO,
+            )
+
+        qs = (
+            Customer.objects.annotate(expected_total=credit_sum("total_amount"), expected_balance=credit_sum("balance_due"))
+            .filter(~Q(credit_total=F("expected_total")) | ~Q(balance_due=F("expected_balance")))
+            .order_by("id")
+        )
+
+        mismatched = []
+        for customer in qs.iterator(chunk_size=options["batch_size"]):
+            self.stdout.write(
+                f"Customer #{customer.id}: credit {customer.credit_total} -> {customer.expected_total}, "
+                f"balance {customer.balance_due} -> {customer.expected_balance}"
+            )
+            customer.credit_total = customer.expected_total
+            customer.balance_due = customer.expected_balance
+            mismatched.append(customer)
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS("All customer credit balances match their sales."))
+            return
+
+        if not options["fix"]:
+            self.stdout.write(self.style.WARNING(f"{len(mismatched)} customer(s) out of step. Re-run with --fix to repair."))
+            return
+
+        Customer.objects.bulk_update(mismatched, ["credit_total", "balance_due"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(mismatched)} customer(s)."))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['-timestamp', '-id'], name='sale_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['sale_type', '-timestamp', '-id'], name='sale_type_ts_id_idx'),
+        ),
+    ]
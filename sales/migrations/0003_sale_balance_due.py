@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:16
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0002_sale_sale_ts_id_idx_sale_sale_type_ts_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='balance_due',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+    ]
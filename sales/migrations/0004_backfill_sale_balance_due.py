@@ -0,0 +1,22 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+
+def backfill_balance_due(apps, schema_editor):
+    """balance_due = max(0, total_amount - amount_paid) for every existing sale, in one UPDATE."""
+    Sale = apps.get_model("sales", "Sale")
+    Sale.objects.update(balance_due=Greatest(F("total_amount") - F("amount_paid"), Value(Decimal("0.00"))))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0003_sale_balance_due"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_balance_due, migrations.RunPython.noop),
+    ]
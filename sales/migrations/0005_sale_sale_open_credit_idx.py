@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0004_backfill_sale_balance_due'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(condition=models.Q(('balance_due__gt', 0), ('is_credit', True)), fields=['sale_type', '-timestamp'], name='sale_open_credit_idx'),
+        ),
+    ]
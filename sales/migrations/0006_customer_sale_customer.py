@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:20
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_sale_sale_open_credit_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Customer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, default='', max_length=100)),
+                ('phone', models.CharField(max_length=20, unique=True)),
+                ('name_key', models.CharField(blank=True, db_index=True, default='', max_length=100)),
+                ('credit_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('balance_due', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales', to='sales.customer'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+import re
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Sum
+
+BATCH_SIZE = 1000
+
+
+def _normalize_phone(raw):
+    # frozen copy of sales.models.normalize_phone
+    digits = re.sub(r"\D", "", raw or "")
+    for prefix in ("00233", "233"):
+        if digits.startswith(prefix) and len(digits) > len(prefix) + 8:
+            return "0" + digits[len(prefix):]
+    return digits
+
+
+def backfill_customers(apps, schema_editor):
+    """
+    One Customer per normalised Sale.customer_phone, linked back to its sales.
+    Walks the sales by id in batches so large tables are never loaded at once.
+    """
+    Sale = apps.get_model("sales", "Sale")
+    Customer = apps.get_model("sales", "Customer")
+
+    customer_ids = dict(Customer.objects.values_list("phone", "id"))
+    last_id = 0
+    while True:
+        batch = list(
+            Sale.objects.filter(id__gt=last_id, customer__isnull=True)
+            .exclude(customer_phone__isnull=True).exclude(customer_phone="")
+            .order_by("id")
+            .only("id", "customer_name", "customer_phone")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        new = {}
+        for sale in batch:
+            phone = _normalize_phone(sale.customer_phone)
+            if phone and phone not in customer_ids and phone not in new:
+                name = (sale.customer_name or "").strip()
+                new[phone] = Customer(phone=phone, name=name, name_key=name.lower())
+        if new:
+            Customer.objects.bulk_create(new.values(), ignore_conflicts=True)
+            customer_ids.update(Customer.objects.filter(phone__in=new).values_list("phone", "id"))
+
+        linked = []
+        for sale in batch:
+            customer_id = customer_ids.get(_normalize_phone(sale.customer_phone))
+            if customer_id:
+                sale.customer_id = customer_id
+                linked.append(sale)
+        Sale.objects.bulk_update(linked, ["customer"], batch_size=BATCH_SIZE)
+
+    # running credit columns from one grouped query
+    rows = (
+        Sale.objects.filter(customer__isnull=False, payment_method="credit")
+        .values("customer_id")
+        .annotate(credit_total=Sum("total_amount"), balance_due=Sum("balance_due"))
+        .order_by()
+    )
+    totals = {r["customer_id"]: r for r in rows}
+    customers = list(Customer.objects.filter(id__in=totals))
+    for c in customers:
+        c.credit_total = totals[c.id]["credit_total"] or Decimal("0.00")
+        c.balance_due = totals[c.id]["balance_due"] or Decimal("0.00")
+    Customer.objects.bulk_update(customers, ["credit_total", "balance_due"], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0006_customer_sale_customer"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_customers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 21:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_backfill_customers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
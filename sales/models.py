@@ -1,16 +1,121 @@
 # sales/models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from inventory.models import Product, ProductWeightPrice
 from decimal import Decimal
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import F, Sum
+import re
+
+
+class StoredValuesMixin:
+    """
+    Remembers each field's value as last loaded from / written to the database,
+    so save() hooks can compare against the stored row without SELECTing it again.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_stored()
+        return instance
+
+    def _remember_stored(self, fields=None):
+        stored = getattr(self, "_stored_values", {})
+        for field in self._meta.concrete_fields:
+            if fields is not None and field.name not in fields and field.attname not in fields:
+                continue
+            if field.attname in self.__dict__:  # deferred fields are not known
+                stored[field.attname] = self.__dict__[field.attname]
+        self._stored_values = stored
+
+    def stored_instance(self, fields):
+        """
+        A detached copy of this row as stored, with `fields` set (None for inserts).
+        Served from the snapshot; one SELECT only if it doesn't cover `fields`.
+        """
+        if self._state.adding or self.pk is None:
+            return None
+        stored = getattr(self, "_stored_values", {})
+        fields = [self._meta.get_field(f) for f in fields]
+        if all(f.attname in stored for f in fields):
+            return type(self)(**{f.attname: stored[f.attname] for f in fields}, pk=self.pk)
+        return type(self)._default_manager.filter(pk=self.pk).only(*(f.name for f in fields)).first()
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._remember_stored(fields)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_stored(kwargs.get("update_fields"))
+
+
+def normalize_phone(raw):
+    """
+    Canonical local form of a phone number: digits only, +233 / 233 / 00233 -> leading 0.
+    "+233 24 123 4567" and "024-123-4567" both become "0241234567". Empty -> "".
+    """
+    digits = re.sub(r"\D", "", raw or "")
+    for prefix in ("00233", "233"):
+        if digits.startswith(prefix) and len(digits) > len(prefix) + 8:
+            return "0" + digits[len(prefix):]
+    return digits
+
+
+class Customer(models.Model):
+    name = models.CharField(max_length=100, blank=True, default="")
+    # normalize_phone() output; the unique index doubles as the prefix index for autocomplete
+    phone = models.CharField(max_length=20, unique=True)
+    # lower-cased name for indexed "starts with" lookups
+    name_key = models.CharField(max_length=100, blank=True, default="", db_index=True)
+
+    # ✅ running credit columns (payment_method="credit" sales only)
+    credit_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    balance_due = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def save(self, *args, **kwargs):
+        self.phone = normalize_phone(self.phone)
+        self.name_key = (self.name or "").strip().lower()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "name_key"}
+        super().save(*args, **kwargs)
 
+    @classmethod
+    def shift_credit_totals(cls, old=None, new=None):
+        """
+        Move a credit sale's share of the running columns with F() deltas (no SUM over the sales).
+        old / new: the sale's CREDIT_FIELDS values before and after the write (None: no row).
+        Only payment_method="credit" sales with a customer count.
+        """
+        deltas = {}
+        for row, sign in ((old, -1), (new, 1)):
+            if not row or not row["customer_id"] or row["payment_method"] != "credit":
+                continue
+            credit, balance = deltas.get(row["customer_id"], (Decimal("0.00"), Decimal("0.00")))
+            deltas[row["customer_id"]] = (
+                credit + sign * Decimal(row["total_amount"] or 0),
+                balance + sign * Decimal(row["balance_due"] or 0),
+            )
+
+        for customer_id, (credit, balance) in deltas.items():
+            if credit or balance:
+                cls.objects.filter(pk=customer_id).update(
+                    credit_total=F("credit_total") + credit,
+                    balance_due=F("balance_due") + balance,
+                )
 
+    def __str__(self):
+        return f"{self.name or 'Customer'} ({self.phone})"
 
 
-class Sale(models.Model):
+class Sale(StoredValuesMixin, models.Model):
     PAYMENT_METHODS = [
         ('cash', 'Cash'),
         ('momo', 'Mobile Money'),
@@ -28,6 +133,7 @@ class Sale(models.Model):
 
     customer_name = models.CharField(max_length=100, blank=True, null=True)
     customer_phone = models.CharField(max_length=15, blank=True, null=True)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name="sales")
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHODS, default='cash')
 
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
@@ -43,10 +149,31 @@ class Sale(models.Model):
     # ✅ CREDIT
     is_credit = models.BooleanField(default=False)
     amount_paid = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    # stored max(0, total_amount - amount_paid); kept current by save() and CreditPayment
+    balance_due = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"), db_index=True)
     due_date = models.DateField(null=True, blank=True)
 
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    # client-generated key for one submission; a resubmitted POST / offline replay finds this sale again
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    # what a sale contributes to Customer.credit_total / balance_due
+    CREDIT_FIELDS = ("customer_id", "payment_method", "total_amount", "balance_due")
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the sales list: newest first, id breaks ties
+            models.Index(fields=["-timestamp", "-id"], name="sale_ts_id_idx"),
+            models.Index(fields=["sale_type", "-timestamp", "-id"], name="sale_type_ts_id_idx"),
+            # the open credit book only (a small slice of all sales)
+            models.Index(
+                fields=["sale_type", "-timestamp"],
+                condition=models.Q(is_credit=True, balance_due__gt=0),
+                name="sale_open_credit_idx",
+            ),
+        ]
+
     @property
     def balance_due_calc(self):
         return max(Decimal("0.00"), (self.total_amount or Decimal("0.00")) - (self.amount_paid or Decimal("0.00")))
@@ -56,6 +183,7 @@ class Sale(models.Model):
         return self.balance_due_calc <= Decimal("0.00")
 
     def recalc_credit(self, save=False):
+        """Full re-aggregation of the payments (reconciliation; payments themselves update incrementally)."""
         total_paid = self.credit_payments.aggregate(s=Sum("amount"))["s"] or Decimal("0.00")
         self.amount_paid = Decimal(total_paid)
 
@@ -65,6 +193,57 @@ class Sale(models.Model):
         if save:
             self.save(update_fields=["amount_paid", "is_credit"])
 
+    def apply_payment_delta(self, delta):
+        """
+        Add `delta` to amount_paid (no SUM over the payments): the row is locked and
+        read once, then one UPDATE writes amount_paid, balance_due and the is_credit
+        close-out. Going through save() keeps the daily rollup in step.
+        """
+        delta = Decimal(delta or 0)
+        if not delta:
+            return
+        with transaction.atomic():
+            current = Sale.objects.select_for_update().get(pk=self.pk)
+            current.amount_paid += delta
+            if current.is_credit and current.is_paid:
+                current.is_credit = False
+            current.save(update_fields=["amount_paid", "is_credit"])
+
+        paid_fields = ["amount_paid", "balance_due", "is_credit"]
+        for name in paid_fields:
+            setattr(self, name, getattr(current, name))
+        self._remember_stored(paid_fields)
+
+    def credit_values(self, update_fields=None, previous=None):
+        """CREDIT_FIELDS as written by a save (fields left out of update_fields keep the stored value)."""
+        values = {f: getattr(self, f) for f in self.CREDIT_FIELDS}
+        if update_fields is not None and previous is not None:
+            saved = {self._meta.get_field(f).attname for f in update_fields}
+            values = {f: (v if f in saved else previous[f]) for f, v in values.items()}
+        return values
+
+    def save(self, *args, **kwargs):
+        self.balance_due = self.balance_due_calc
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"total_amount", "amount_paid"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "balance_due"}
+        was_credit = getattr(self, "_stored_values", {}).get("is_credit", False)
+
+        # customer running columns: take the old share off, add the new one (customer / method / amounts may change)
+        stored = self.stored_instance(self.CREDIT_FIELDS)
+        previous = {f: getattr(stored, f) for f in self.CREDIT_FIELDS} if stored else None
+        written = self.credit_values(kwargs.get("update_fields"), previous)
+        if written == previous:
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                Customer.shift_credit_totals(previous, written)
+
+        if self.is_credit or was_credit:  # opened, paid into or closed out
+            from .services import invalidate_credit_summary
+            invalidate_credit_summary()
+
     def __str__(self):
         tag = "CREDIT" if self.is_credit and not self.is_paid else "PAID"
         return f"{self.get_sale_type_display()} Sale #{self.id} ({tag}) - ₵{self.total_amount}"
@@ -96,7 +275,7 @@ class SaleItem(models.Model):
         return f"{pname} x {self.quantity}"
 
 
-class CreditPayment(models.Model):
+class CreditPayment(StoredValuesMixin, models.Model):
     sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name="credit_payments")
     amount = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
     payment_method = models.CharField(
@@ -112,8 +291,20 @@ class CreditPayment(models.Model):
         ordering = ["-paid_on"]
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.sale.recalc_credit(save=True)
+        # only the difference reaches the sale (new payment: amount; edit: new - old)
+        with transaction.atomic():
+            stored = self.stored_instance(["amount"])
+            previous = stored.amount if stored else Decimal("0.00")
+            super().save(*args, **kwargs)
+            self.sale.apply_payment_delta(Decimal(self.amount or 0) - previous)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            stored = self.stored_instance(["amount"])
+            amount = stored.amount if stored else Decimal("0.00")
+            result = super().delete(*args, **kwargs)
+            self.sale.apply_payment_delta(-amount)
+        return result
 
     def __str__(self):
         return f"Payment ₵{self.amount} for Sale #{self.sale_id}"
@@ -0,0 +1,677 @@
+# sales/services.py
+import base64
+import hashlib
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO
+
+import qrcode
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from inventory.models import Product, ProductWeightPrice
+from inventory.services import apply_weight_batch, sync_stock_status
+from reports.services import filter_period
+from .models import CreditPayment, Customer, Sale, SaleItem, normalize_phone
+
+VAT_RATE = Decimal("0.04")
+
+
+def line_unit_price(*, product: Product, weight_price, sale_type: str) -> Decimal:
+    """
+    Server-side price for one line.
+    Weight size price wins over the product price for boxed-weight lines.
+    """
+    if weight_price:
+        return weight_price.wholesale_price if sale_type == "wholesale" else weight_price.retail_price
+    return product.wholesale_price if sale_type == "wholesale" else product.unit_price
+
+
+def _pk(value):
+    return getattr(value, "pk", value)
+
+
+@transaction.atomic
+def reserve_sale_items(*, sale, lines, sale_type: str) -> Decimal:
+    """
+    Stock reservation for a whole ticket.
+
+    lines: iterable of dicts with "product", "weight_price" (optional) and "quantity";
+    product / weight_price may be instances (formset cleaned_data works as-is) or ids.
+
+    - locks every product on the ticket in ONE ordered SELECT ... FOR UPDATE (id order => no deadlocks)
+    - validates unit availability in memory (lines of the same product are summed)
+    - drains boxed-weight demand FIFO from the StockBox ledger (apply_weight_batch)
+    - writes all SaleItem rows with one bulk_create and all product counters with one bulk_update
+
+    Returns the items subtotal (before discount / VAT).
+    """
+    lines = [line for line in lines if line and line.get("product")]
+    if not lines:
+        return Decimal("0.00")
+
+    product_ids = sorted({_pk(line["product"]) for line in lines})
+    products = {
+        p.id: p
+        for p in Product.objects.select_for_update().filter(id__in=product_ids).order_by("id")
+    }
+
+    wp_ids = {_pk(line["weight_price"]) for line in lines if line.get("weight_price")}
+    weight_prices = ProductWeightPrice.objects.filter(is_active=True).in_bulk(wp_ids) if wp_ids else {}
+
+    unit_demand = defaultdict(int)
+    kg_demand = defaultdict(Decimal)
+    items = []
+    subtotal = Decimal("0.00")
+
+    for line in lines:
+        product = products.get(_pk(line["product"]))
+        if product is None:
+            raise ValueError(f"Product {_pk(line['product'])} does not exist.")
+
+        qty = int(line.get("quantity") or 0)
+        if qty <= 0:
+            raise ValueError(f"Quantity for {product.name} must be at least 1.")
+
+        item = SaleItem(sale=sale, product=product, quantity=qty)
+
+        # ✅ CASE 1: Weight sale (fish)
+        if line.get("weight_price"):
+            wp = weight_prices.get(_pk(line["weight_price"]))
+            if wp is None or wp.product_id != product.id:
+                raise ValueError(f"Selected weight size does not belong to {product.name}.")
+            item.weight_price = wp
+            kg_demand[product.id] += Decimal(qty) * Decimal(wp.weight_kg)
+
+        # ✅ CASE 2: Normal unit sale (sausage)
+        else:
+            if product.is_weighted:
+                raise ValueError(f"{product.name} is weighted. Please select a weight size.")
+            unit_demand[product.id] += qty
+
+        item.unit_price = line_unit_price(product=product, weight_price=item.weight_price, sale_type=sale_type)
+        items.append(item)
+        subtotal += item.line_total()
+
+    for pid, qty in unit_demand.items():
+        product = products[pid]
+        if qty > product.quantity:
+            raise ValueError(f"Not enough stock for {product.name}. Available: {product.quantity}")
+        product.quantity = max(0, product.quantity - qty)
+
+    apply_weight_batch(products, kg_demand)
+
+    SaleItem.objects.bulk_create(items)
+
+    touched = [products[pid] for pid in sorted(unit_demand.keys() | kg_demand.keys())]
+    sync_stock_status(touched)
+    Product.objects.bulk_update(touched, ["quantity", "boxes_in_stock", "box_remaining_kg", "stock_status"])
+
+    return subtotal
+
+
+def finalize_sale(sale, *, lines, sale_type: str, amount_paid=Decimal("0.00"), user=None) -> Sale:
+    """
+    Everything after the Sale row exists: items + stock, totals and the deposit on a credit
+    sale (or amount_paid = total otherwise); the daily rollup follows from the saves.
+    Runs inside the caller's transaction; raises ValueError when the basket can't be served.
+    """
+    subtotal = reserve_sale_items(sale=sale, lines=lines, sale_type=sale_type)
+
+    discount = Decimal(sale.discount or Decimal("0.00"))
+    after_discount = max(Decimal("0.00"), subtotal - discount)
+    vat = (after_discount * VAT_RATE).quantize(Decimal("0.01")) if sale.apply_vat else Decimal("0.00")
+    grand = (after_discount + vat).quantize(Decimal("0.01"))
+
+    sale.subtotal_amount = after_discount
+    sale.vat_amount = vat
+    sale.total_amount = grand
+    sale.save(update_fields=["subtotal_amount", "vat_amount", "total_amount"])
+
+    if sale.is_credit:
+        deposit = max(Decimal("0.00"), min(Decimal(amount_paid or Decimal("0.00")), grand))
+        if deposit > 0:
+            # updates sale.amount_paid / balance_due / is_credit
+            CreditPayment.objects.create(
+                sale=sale, amount=deposit, payment_method="cash", reference="", received_by=user,
+            )
+    else:
+        # fully paid
+        sale.amount_paid = sale.total_amount
+        sale.save(update_fields=["amount_paid"])
+
+    return sale
+
+
+def submit_sale(*, sale, lines, sale_type: str, amount_paid=Decimal("0.00"), user=None, validate=False) -> tuple[Sale, bool]:
+    """
+    Idempotent sale creation: returns (sale, created).
+    When sale.idempotency_key was already used, nothing is written and the original sale
+    comes back with created=False, so a retried submission never deducts stock twice.
+    validate=True runs validate_basket() first (raises BasketError) for input that skipped the forms.
+    """
+    key = sale.idempotency_key or None
+    if key:
+        existing = Sale.objects.filter(idempotency_key=key).first()
+        if existing:
+            return existing, False
+
+    if validate:
+        errors = validate_basket(lines)
+        if errors:
+            raise BasketError(errors)
+
+    try:
+        with transaction.atomic():
+            sale.idempotency_key = key
+            if sale.customer_id is None:
+                sale.customer = resolve_customer(name=sale.customer_name, phone=sale.customer_phone)
+            sale.is_credit = sale.payment_method == "credit"
+            sale.amount_paid = Decimal("0.00")  # built up by the deposit (or set to total for cash)
+            sale.save()
+            finalize_sale(sale, lines=lines, sale_type=sale_type, amount_paid=amount_paid, user=user)
+    except IntegrityError:
+        # the same key committed by a concurrent request
+        existing = Sale.objects.filter(idempotency_key=key).first() if key else None
+        if existing is None:
+            raise
+        return existing, False
+    return sale, True
+
+
+# ------------------------------------------------------------
+# ✅ JSON sale payloads (offline POS queue)
+# ------------------------------------------------------------
+SALE_BATCH_LIMIT = 100
+
+
+class BasketError(ValueError):
+    """A basket that failed validation; .errors holds one message per problem."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("; ".join(self.errors))
+
+
+def _decimal(value, field) -> Decimal:
+    try:
+        d = Decimal(str(value if value not in (None, "") else "0"))
+    except Exception:
+        raise ValueError(f"{field} must be a number.")
+    if not d.is_finite() or d < 0:
+        raise ValueError(f"{field} must be a positive number.")
+    return d.quantize(Decimal("0.01"))
+
+
+def sale_from_payload(data, *, user, sale_type: str):
+    """
+    Unsaved Sale + basket lines from one JSON sale:
+    {"idempotency_key", "customer_name", "customer_phone", "payment_method", "discount",
+     "amount_paid", "due_date": "YYYY-MM-DD", "items": [{"product", "weight_price", "quantity"}]}
+    Returns (sale, lines, amount_paid); raises ValueError on malformed input.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Each sale must be an object.")
+
+    key = str(data.get("idempotency_key") or "").strip()
+    if len(key) > 64:
+        raise ValueError("idempotency_key is too long (max 64 characters).")
+
+    payment_method = data.get("payment_method") or "cash"
+    if payment_method not in dict(Sale.PAYMENT_METHODS):
+        raise ValueError(f"Unknown payment_method {payment_method!r}.")
+
+    due_date = None
+    if payment_method == "credit" and data.get("due_date"):
+        try:
+            due_date = datetime.strptime(str(data["due_date"]), "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError("due_date must be YYYY-MM-DD.")
+
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        raise ValueError("A sale needs at least one item.")
+    lines = []
+    for n, item in enumerate(items, start=1):
+        try:
+            lines.append({
+                "product": int(item["product"]),
+                "weight_price": int(item["weight_price"]) if item.get("weight_price") else None,
+                "quantity": int(item.get("quantity") or 0),
+            })
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Item {n}: product, weight_price and quantity must be ids / whole numbers.")
+        if lines[-1]["quantity"] <= 0:
+            raise ValueError(f"Item {n}: quantity must be at least 1.")
+
+    customer_name = str(data.get("customer_name") or "").strip()[:100]
+    customer_phone = str(data.get("customer_phone") or "").strip()[:15]
+    sale = Sale(
+        created_by=user,
+        sale_type=sale_type,
+        customer_name=customer_name,
+        customer_phone=customer_phone,
+        payment_method=payment_method,
+        discount=_decimal(data.get("discount"), "discount"),
+        due_date=due_date,
+        idempotency_key=key or None,
+    )
+    amount_paid = _decimal(data.get("amount_paid"), "amount_paid") if payment_method == "credit" else Decimal("0.00")
+    return sale, lines, amount_paid
+
+
+def validate_basket(lines) -> list[str]:
+    """
+    Pre-flight check of a whole basket before any lock is taken: one in_bulk for the products,
+    one for the weight sizes. Returns error messages ("Item n: ...") - empty when the basket looks
+    sellable. reserve_sale_items re-checks stock under the row locks.
+    """
+    products = Product.objects.only(
+        "id", "name", "is_weighted", "quantity", "boxes_in_stock", "box_weight_kg", "box_remaining_kg",
+    ).in_bulk({_pk(line["product"]) for line in lines})
+    wp_ids = {_pk(line["weight_price"]) for line in lines if line.get("weight_price")}
+    weight_prices = ProductWeightPrice.objects.filter(is_active=True).in_bulk(wp_ids) if wp_ids else {}
+
+    errors = []
+    unit_demand = defaultdict(int)
+    kg_demand = defaultdict(Decimal)
+    for n, line in enumerate(lines, start=1):
+        product = products.get(_pk(line["product"]))
+        if product is None:
+            errors.append(f"Item {n}: product {_pk(line['product'])} does not exist.")
+            continue
+        qty = int(line.get("quantity") or 0)
+        if line.get("weight_price"):
+            wp = weight_prices.get(_pk(line["weight_price"]))
+            if wp is None or wp.product_id != product.id:
+                errors.append(f"Item {n}: selected weight size does not belong to {product.name}.")
+            elif not product.is_weighted:
+                errors.append(f"Item {n}: {product.name} is not configured for weight-based sales.")
+            else:
+                kg_demand[product.id] += Decimal(qty) * Decimal(wp.weight_kg)
+        elif product.is_weighted:
+            errors.append(f"Item {n}: {product.name} is weighted. Please select a weight size.")
+        else:
+            unit_demand[product.id] += qty
+
+    # lines of the same product are summed, exactly as the reservation does
+    for pid, qty in unit_demand.items():
+        if qty > products[pid].quantity:
+            errors.append(f"Not enough stock for {products[pid].name}. Available: {products[pid].quantity}")
+    for pid, kg in kg_demand.items():
+        available = products[pid].available_weight_kg()
+        if kg > available:
+            errors.append(f"Not enough kg for {products[pid].name}. Available: {available}kg")
+    return errors
+
+
+def submit_json_sale(data, *, user, sale_type: str) -> tuple[Sale, bool]:
+    """Parse, pre-validate and submit one JSON sale (used by the sale API and the offline batch)."""
+    sale, lines, amount_paid = sale_from_payload(data, user=user, sale_type=sale_type)
+    return submit_sale(
+        sale=sale, lines=lines, sale_type=sale_type, amount_paid=amount_paid, user=user, validate=True,
+    )
+
+
+# ------------------------------------------------------------
+# ✅ Receipts (cached: a finalised sale only changes through credit payments)
+# ------------------------------------------------------------
+RECEIPT_CACHE_SECONDS = 60 * 60 * 24
+
+
+def receipt_digest(sale) -> str:
+    """
+    Hash of everything a receipt prints from the Sale row.
+    Items are immutable once the sale is saved; amount_paid / is_credit move with
+    credit payments, so a payment changes the digest (and therefore the cache key).
+    """
+    parts = [
+        sale.id, sale.timestamp.isoformat(), sale.created_by_id, sale.customer_name, sale.payment_method,
+        sale.discount, sale.apply_vat, sale.subtotal_amount, sale.vat_amount, sale.total_amount,
+        sale.is_credit, sale.amount_paid, sale.due_date,
+    ]
+    return hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:16]
+
+
+def _receipt_key(kind: str, sale) -> str:
+    return f"receipt:{kind}:{sale.id}:{receipt_digest(sale)}"
+
+
+def invalidate_receipt_cache(sale):
+    """Drop the cached receipt for the sale's CURRENT state (call before the state changes)."""
+    cache.delete_many([_receipt_key("pdf", sale), _receipt_key("qr", sale)])
+
+
+def receipt_items(sale):
+    """All lines of a receipt in one query (product + weight size joined, line total computed in SQL)."""
+    return list(
+        sale.items.select_related("product", "weight_price")
+        .annotate(line_total_amount=ExpressionWrapper(
+            F("quantity") * F("unit_price"), output_field=DecimalField(max_digits=14, decimal_places=2),
+        ))
+        .order_by("id")
+    )
+
+
+def receipt_qr_png(sale) -> bytes:
+    key = _receipt_key("qr", sale)
+    png = cache.get(key)
+    if png is None:
+        try:
+            qr_text = f"Receipt:CS-{sale.id:04d}|Amount:₵{float(sale.total_amount):.2f}|Date:{sale.timestamp.strftime('%Y-%m-%d %H:%M')}"
+            buf = BytesIO()
+            qrcode.make(qr_text).save(buf, format="PNG")
+            png = buf.getvalue()
+        except Exception:
+            png = b""
+        cache.set(key, png, RECEIPT_CACHE_SECONDS)
+    return png
+
+
+def receipt_pdf(sale) -> bytes:
+    key = _receipt_key("pdf", sale)
+    pdf = cache.get(key)
+    if pdf is None:
+        pdf = _draw_receipt_pdf(sale, receipt_items(sale), receipt_qr_png(sale))
+        cache.set(key, pdf, RECEIPT_CACHE_SECONDS)
+    return pdf
+
+
+def _draw_receipt_pdf(sale, items, qr_png: bytes) -> bytes:
+    from reportlab.lib.pagesizes import A5, landscape
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=landscape(A5))
+    width, height = landscape(A5)
+
+    p.setFont("Helvetica-Bold", 14)
+    p.drawCentredString(width/2, height - 20, "❄️ FRESH CHILL COLD STORE ❄️")
+    p.setFont("Helvetica", 9)
+    p.drawCentredString(width/2, height - 34, "Accra - Ghana | Tel: +233 20 854 3630")
+
+    y = height - 56
+    p.setFont("Helvetica", 8)
+    p.drawString(20, y, f"Date: {sale.timestamp.strftime('%Y-%m-%d %H:%M')}")
+    p.drawRightString(width - 20, y, f"Receipt: CS-{sale.id:04d}")
+    y -= 14
+
+    cashier = sale.created_by.get_full_name() if sale.created_by and sale.created_by.get_full_name() else (sale.created_by.username if sale.created_by else "—")
+    p.drawString(20, y, f"Cashier: {cashier}")
+    y -= 12
+    p.drawString(20, y, f"Customer: {sale.customer_name or 'Walk-in Customer'}")
+    y -= 12
+    p.drawString(20, y, f"Payment: {sale.get_payment_method_display()}")
+
+    y -= 18
+    p.setFont("Helvetica-Bold", 9)
+    p.drawString(20, y, "Item")
+    p.drawRightString(220, y, "Qty")
+    p.drawRightString(290, y, "Price (₵)")
+    p.drawRightString(370, y, "Total (₵)")
+    p.line(15, y-2, width-15, y-2)
+    y -= 12
+    p.setFont("Helvetica", 9)
+
+    for it in items:
+        name = it.product.name if it.product else "Deleted Product"
+        if it.weight_price:
+            name = f"{name} ({it.weight_price.weight_kg}kg)"
+
+        p.drawString(20, y, name[:32])
+        p.drawRightString(220, y, str(it.quantity))
+        p.drawRightString(290, y, f"{float(it.unit_price):.2f}")
+        p.drawRightString(370, y, f"{float(it.line_total_amount):.2f}")
+        y -= 12
+        if y < 70:
+            p.showPage()
+            y = height - 40
+            p.setFont("Helvetica", 9)
+
+    y -= 6
+    p.line(15, y, width-15, y)
+    y -= 14
+
+    p.drawRightString(320, y, "Subtotal:")
+    p.drawRightString(370, y, f"₵{float(sale.subtotal_amount):.2f}")
+    y -= 12
+
+    if sale.apply_vat:
+        p.drawRightString(320, y, "VAT (4%):")
+        p.drawRightString(370, y, f"₵{float(sale.vat_amount):.2f}")
+        y -= 12
+
+    p.setFont("Helvetica-Bold", 10)
+    p.drawRightString(320, y, "Total:")
+    p.drawRightString(370, y, f"₵{float(sale.total_amount):.2f}")
+
+    # QR
+    if qr_png:
+        p.drawImage(ImageReader(BytesIO(qr_png)), width - 120, 20, width=80, height=80)
+
+    p.setFont("Helvetica-Oblique", 8)
+    p.drawCentredString(width/2, 18, "Thank you for your purchase! — Fresh Chill Cold Store")
+
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+# ------------------------------------------------------------
+# ✅ Sales list: filters + keyset (timestamp, id) pagination
+# ------------------------------------------------------------
+SALE_LIST_PRESETS = {"today": 0, "week": 6, "month": 29}  # days back from today
+SALE_LIST_PAGE_SIZES = (10, 25, 50, 100)
+SALE_LIST_COUNT_LIMIT = 10000  # "Total Records" stops counting here
+
+
+def filter_sales(qs, *, q="", preset="", start="", end=""):
+    """
+    q: customer name / phone (contains) or receipt number ("42", "CS-0042").
+    preset: today | week | month | all; a preset overrides start/end.
+    """
+    q = (q or "").strip()
+    if q:
+        match = Q(customer_name__icontains=q) | Q(customer_phone__icontains=q)
+        digits = q.upper().removeprefix("CS-").lstrip("#")
+        if digits.isdigit():
+            match |= Q(id=int(digits))
+        qs = qs.filter(match)
+
+    if preset in SALE_LIST_PRESETS:
+        today = timezone.localdate()
+        return filter_period(qs, start=today - timedelta(days=SALE_LIST_PRESETS[preset]), end=today)
+    if preset == "all":
+        return qs
+    return filter_period(qs, start=start, end=end)
+
+
+def encode_cursor(sale) -> str:
+    raw = f"{sale.timestamp.isoformat()}|{sale.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(timestamp, id) or None for a missing / tampered cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, sale_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(sale_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, object_list, *, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = encode_cursor(object_list[-1]) if object_list and has_next else ""
+        self.prev_cursor = encode_cursor(object_list[0]) if object_list and has_previous else ""
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_page(qs, *, per_page: int, after: str = "", before: str = "") -> KeysetPage:
+    """
+    Newest-first page of sales anchored on a (timestamp, id) cursor.
+    Cost depends on per_page only, not on how deep into history the page is
+    (backed by the (timestamp, id) indexes on Sale).
+    """
+    after_key, before_key = decode_cursor(after), decode_cursor(before)
+
+    if before_key:
+        ts, sale_id = before_key
+        rows = list(
+            qs.filter(Q(timestamp__gt=ts) | Q(timestamp=ts, id__gt=sale_id))
+            .order_by("timestamp", "id")[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        if not rows:  # nothing newer than the cursor any more: newest page
+            return keyset_page(qs, per_page=per_page)
+        # the rows between this page and the cursor are exactly the ones skipped, so
+        # there is a next page when the cursor row (or anything older) still matches
+        has_next = qs.filter(Q(timestamp__lt=ts) | Q(timestamp=ts, id__lte=sale_id)).exists()
+        return KeysetPage(rows, has_next=has_next, has_previous=has_previous)
+
+    if after_key:
+        ts, sale_id = after_key
+        qs = qs.filter(Q(timestamp__lt=ts) | Q(timestamp=ts, id__lt=sale_id))
+
+    rows = list(qs.order_by("-timestamp", "-id")[:per_page + 1])
+    return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=bool(after_key))
+
+
+def capped_count(qs, limit: int = SALE_LIST_COUNT_LIMIT):
+    """Exact count up to `limit`, then "<limit>+" (never scans the whole table)."""
+    n = qs.order_by()[:limit + 1].count()
+    return f"{limit}+" if n > limit else n
+
+
+# ------------------------------------------------------------
+# ✅ Outstanding credit book (partial index sale_open_credit_idx + cached summary)
+# ------------------------------------------------------------
+CREDIT_SUMMARY_CACHE_KEY = "sales:credit_summary"
+CREDIT_SUMMARY_CACHE_SECONDS = 300
+AGING_BUCKETS = ("0_30", "31_60", "61_90", "90_plus")
+
+
+def open_credit_sales():
+    """Credit sales with something still owed (matches the partial index condition)."""
+    return Sale.objects.filter(is_credit=True, balance_due__gt=0)
+
+
+def _empty_credit_totals():
+    return {"count": 0, "outstanding": Decimal("0.00"), **{b: Decimal("0.00") for b in AGING_BUCKETS}}
+
+
+def build_credit_summary(today=None) -> dict:
+    """
+    Outstanding totals and aging per sale_type in ONE grouped query.
+    Age counts from due_date (sale date when no due date was set); not yet due falls in 0-30.
+    Returns {"retail": {...}, "wholesale": {...}, "all": {...}}.
+    """
+    today = today or timezone.localdate()
+    d30, d60, d90 = (today - timedelta(days=n) for n in (30, 60, 90))
+    money = DecimalField(max_digits=14, decimal_places=2)
+
+    rows = (
+        open_credit_sales()
+        .annotate(aged_from=Coalesce("due_date", TruncDate("timestamp")))
+        .values("sale_type")
+        .annotate(
+            count=Count("id"),
+            outstanding=Sum("balance_due", output_field=money),
+            b0_30=Sum("balance_due", filter=Q(aged_from__gte=d30), output_field=money),
+            b31_60=Sum("balance_due", filter=Q(aged_from__lt=d30, aged_from__gte=d60), output_field=money),
+            b61_90=Sum("balance_due", filter=Q(aged_from__lt=d60, aged_from__gte=d90), output_field=money),
+            b90_plus=Sum("balance_due", filter=Q(aged_from__lt=d90), output_field=money),
+        )
+        .order_by()
+    )
+
+    summary = {"all": _empty_credit_totals()}
+    for r in rows:
+        totals = {
+            "count": r["count"],
+            "outstanding": r["outstanding"] or Decimal("0.00"),
+            **{b: r[f"b{b}"] or Decimal("0.00") for b in AGING_BUCKETS},
+        }
+        summary[r["sale_type"]] = totals
+        for k, v in totals.items():
+            summary["all"][k] += v
+    for sale_type, _ in Sale.SALE_TYPES:
+        summary.setdefault(sale_type, _empty_credit_totals())
+    return summary
+
+
+def credit_summary() -> dict:
+    """Cached build_credit_summary(); dropped whenever a credit balance moves (see invalidate_credit_summary)."""
+    today = timezone.localdate()
+    key = f"{CREDIT_SUMMARY_CACHE_KEY}:{today.isoformat()}"
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_credit_summary(today)
+        cache.set(key, summary, CREDIT_SUMMARY_CACHE_SECONDS)
+    return summary
+
+
+def invalidate_credit_summary():
+    """Drop the cached credit summary once the current transaction commits."""
+    key = f"{CREDIT_SUMMARY_CACHE_KEY}:{timezone.localdate().isoformat()}"
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+# ------------------------------------------------------------
+# ✅ Customers (normalised phone is the key)
+# ------------------------------------------------------------
+CUSTOMER_AUTOCOMPLETE_LIMIT = 10
+
+
+def resolve_customer(*, name="", phone=""):
+    """Customer for this phone (created on first sight); None when no usable phone was given."""
+    phone = normalize_phone(phone)
+    if not phone:
+        return None
+    name = (name or "").strip()
+    customer, created = Customer.objects.get_or_create(phone=phone, defaults={"name": name})
+    if not created and name and not customer.name:
+        customer.name = name
+        customer.save(update_fields=["name"])
+    return customer
+
+
+def customer_autocomplete(q: str, limit: int = CUSTOMER_AUTOCOMPLETE_LIMIT):
+    """
+    Prefix match on the normalised phone (digits typed) or the lower-cased name.
+    Both lookups are LIKE 'q%' on an indexed column, never a scan of the sales table.
+    """
+    q = (q or "").strip()
+    if not q:
+        return []
+    if re.fullmatch(r"[\d\s+\-()]+", q):
+        phone = normalize_phone(q)
+        # a partly typed international number ("+23355") has no full match for normalize_phone yet
+        for prefix in ("+233", "00233"):
+            if q.replace(" ", "").startswith(prefix):
+                phone = "0" + re.sub(r"\D", "", q)[len(prefix.lstrip("+")):]
+        qs = Customer.objects.filter(phone__startswith=phone).order_by("phone")
+    else:
+        qs = Customer.objects.filter(name_key__startswith=q.lower()).order_by("name_key")
+    return [
+        {"id": c["id"], "name": c["name"], "phone": c["phone"], "balance_due": float(c["balance_due"])}
+        for c in qs.values("id", "name", "phone", "balance_due")[:limit]
+    ]
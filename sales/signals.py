@@ -0,0 +1,14 @@
+# sales/signals.py
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Customer, Sale
+
+
+@receiver(post_delete, sender=Sale)
+def sale_deleted(sender, instance, **kwargs):
+    # admin deletes (single and bulk) take the sale's share off its customer's running columns
+    Customer.shift_credit_totals(instance.credit_values(), None)
+    if instance.is_credit:
+        from .services import invalidate_credit_summary
+        invalidate_credit_summary()
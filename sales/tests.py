@@ -1,3 +1,539 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from analytics.models import DailyRollup
+from inventory import services as inventory_services
+from inventory.models import Product, ProductWeightPrice
+
+from . import services
+from .models import CreditPayment, Customer, Sale, SaleItem, normalize_phone
+from .services import (
+    build_credit_summary, capped_count, credit_summary, customer_autocomplete, filter_sales, invalidate_receipt_cache, keyset_page,
+    receipt_digest, receipt_pdf, receipt_qr_png, reserve_sale_items, resolve_customer, submit_sale,
+)
+
+
+class ReserveSaleItemsTests(TestCase):
+    def setUp(self):
+        self.sausage = Product.objects.create(name="Sausage", unit_price=Decimal("12.00"), wholesale_price=Decimal("10.00"), quantity=10)
+        self.wings = Product.objects.create(name="Wings", unit_price=Decimal("30.00"), quantity=4)
+        self.mackerel = Product.objects.create(
+            name="Mackerel", unit_price=Decimal("1.00"), is_weighted=True, track_method="boxed_weight",
+            box_weight_kg=Decimal("20.00"), boxes_in_stock=2, box_remaining_kg=Decimal("20.00"),
+        )
+        self.size = ProductWeightPrice.objects.create(
+            product=self.mackerel, weight_kg=Decimal("5.00"), retail_price=Decimal("60.00"),
+            wholesale_price=Decimal("50.00"),
+        )
+        self.sale = Sale.objects.create()
+
+    def reserve(self, lines, sale_type="retail"):
+        return reserve_sale_items(sale=self.sale, lines=lines, sale_type=sale_type)
+
+    def test_whole_ticket_in_one_locked_select(self):
+        lines = [
+            {"product": self.sausage, "quantity": 3},
+            {"product": self.wings, "quantity": 1},
+            {"product": self.sausage, "quantity": 2},
+            {"product": self.mackerel, "weight_price": self.size, "quantity": 3},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            subtotal = self.reserve(lines)
+
+        selects = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(sum('FROM "inventory_product"' in sql for sql in selects), 1)
+        self.assertEqual(sum(q["sql"].startswith('INSERT INTO "sales_saleitem"') for q in ctx.captured_queries), 1)
+        self.assertEqual(sum(q["sql"].startswith('UPDATE "inventory_product"') for q in ctx.captured_queries), 1)
+        self.assertEqual(subtotal, Decimal("270.00"))
+
+    def test_stock_decremented(self):
+        self.reserve([
+            {"product": self.sausage, "quantity": 3},
+            {"product": self.sausage, "quantity": 2},
+            {"product": self.mackerel, "weight_price": self.size, "quantity": 5},
+        ], sale_type="wholesale")
+
+        self.sausage.refresh_from_db()
+        self.mackerel.refresh_from_db()
+        self.assertEqual(self.sausage.quantity, 5)
+        self.assertEqual((self.mackerel.boxes_in_stock, self.mackerel.box_remaining_kg), (1, Decimal("15.00")))
+        self.assertEqual(
+            sorted(SaleItem.objects.filter(sale=self.sale).values_list("quantity", "unit_price")),
+            [(2, Decimal("10.00")), (3, Decimal("10.00")), (5, Decimal("50.00"))],
+        )
+
+    def test_insufficient_stock_rolls_back(self):
+        lines = [
+            {"product": self.sausage, "quantity": 3},
+            {"product": self.mackerel, "weight_price": self.size, "quantity": 9},  # 45kg of 40kg
+        ]
+        with self.assertRaises(ValueError):
+            self.reserve(lines)
+
+        self.sausage.refresh_from_db()
+        self.mackerel.refresh_from_db()
+        self.assertEqual(self.sausage.quantity, 10)
+        self.assertEqual((self.mackerel.boxes_in_stock, self.mackerel.box_remaining_kg), (2, Decimal("20.00")))
+        self.assertFalse(SaleItem.objects.exists())
+
+    def test_unit_demand_is_summed_per_product(self):
+        with self.assertRaises(ValueError):
+            self.reserve([{"product": self.wings, "quantity": 3}, {"product": self.wings, "quantity": 2}])
+        self.wings.refresh_from_db()
+        self.assertEqual(self.wings.quantity, 4)
+
+    def test_inactive_weight_size_is_rejected(self):
+        self.size.is_active = False
+        self.size.save()
+        with self.assertRaises(ValueError):
+            self.reserve([{"product": self.mackerel, "weight_price": self.size, "quantity": 1}])
+
+        self.mackerel.refresh_from_db()
+        self.assertEqual(self.mackerel.available_weight_kg(), Decimal("40.00"))
+
+
+class ReceiptCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.sale = Sale.objects.create(
+            payment_method="credit", is_credit=True, total_amount=Decimal("50.00"), customer_name="Ama",
+        )
+        wings = Product.objects.create(name="Wings", unit_price=Decimal("25.00"))
+        SaleItem.objects.create(sale=self.sale, product=wings, quantity=2, unit_price=Decimal("25.00"))
+
+    def draws(self):
+        return mock.patch.object(services, "_draw_receipt_pdf", wraps=services._draw_receipt_pdf)
+
+    def test_pdf_is_drawn_once(self):
+        with self.draws() as draw:
+            first = receipt_pdf(self.sale)
+            self.assertEqual(receipt_pdf(self.sale), first)
+        self.assertEqual(draw.call_count, 1)
+        self.assertTrue(first.startswith(b"%PDF"))
+
+    def test_credit_payment_moves_the_key(self):
+        before = receipt_digest(self.sale)
+        receipt_pdf(self.sale)
+
+        CreditPayment.objects.create(sale=self.sale, amount=Decimal("20.00"))
+        self.sale.refresh_from_db()
+        self.assertNotEqual(receipt_digest(self.sale), before)
+        with self.draws() as draw:
+            receipt_pdf(self.sale)
+        self.assertEqual(draw.call_count, 1)  # the old entry is not served for the new balance
+
+    def test_invalidate_drops_the_current_entries(self):
+        receipt_pdf(self.sale)
+        invalidate_receipt_cache(self.sale)
+        with self.draws() as draw, mock.patch.object(services.qrcode, "make", wraps=services.qrcode.make) as qr:
+            receipt_pdf(self.sale)
+        self.assertEqual((draw.call_count, qr.call_count), (1, 1))
+
+    def test_cached_receipt_view_is_one_query(self):
+        receipt_qr_png(self.sale)
+        self.client.get(reverse("receipt_view", args=[self.sale.id]))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("receipt_view", args=[self.sale.id]))
+        self.assertEqual(response["Content-Type"], "application/pdf")
+
+
+class KeysetPageTests(TestCase):
+    def setUp(self):
+        # 23 sales on 8 distinct timestamps: ties are broken by id
+        base = timezone.now() - timedelta(days=1)
+        for i in range(23):
+            sale = Sale.objects.create(customer_name=f"Customer {i}")
+            Sale.objects.filter(pk=sale.pk).update(timestamp=base + timedelta(minutes=i // 3))
+        self.expected = list(Sale.objects.order_by("-timestamp", "-id").values_list("id", flat=True))
+
+    def ids(self, page):
+        return [s.id for s in page]
+
+    def test_forward_and_back_round_trip(self):
+        pages, page = [], keyset_page(Sale.objects.all(), per_page=5)
+        while True:
+            pages.append(page)
+            if not page.has_next:
+                break
+            page = keyset_page(Sale.objects.all(), per_page=5, after=page.next_cursor)
+
+        self.assertEqual([i for p in pages for i in self.ids(p)], self.expected)
+        self.assertEqual([(p.has_previous, p.has_next) for p in (pages[0], pages[2], pages[-1])],
+                         [(False, True), (True, True), (True, False)])
+
+        for newer, older in zip(reversed(pages[:-1]), reversed(pages[1:])):
+            back = keyset_page(Sale.objects.all(), per_page=5, before=older.prev_cursor)
+            self.assertEqual(self.ids(back), self.ids(newer))
+            self.assertEqual((back.has_previous, back.has_next), (newer.has_previous, True))
+
+    def test_before_knows_when_nothing_is_older(self):
+        newest = keyset_page(Sale.objects.all(), per_page=5)
+        older = keyset_page(Sale.objects.all(), per_page=5, after=newest.next_cursor)
+        Sale.objects.filter(id__lte=older.object_list[0].id).delete()  # the cursor row and everything older
+
+        back = keyset_page(Sale.objects.all(), per_page=5, before=older.prev_cursor)
+        self.assertEqual(self.ids(back), self.ids(newest))
+        self.assertFalse(back.has_next)
+
+    def test_bad_cursor_is_the_first_page(self):
+        page = keyset_page(Sale.objects.all(), per_page=5, after="not-a-cursor")
+        self.assertEqual(self.ids(page), self.expected[:5])
+        self.assertFalse(page.has_previous)
+
+    def test_search_and_count(self):
+        target = Sale.objects.order_by("id")[4]
+        self.assertEqual(list(filter_sales(Sale.objects.all(), q=f"CS-{target.id:04d}")), [target])
+        self.assertEqual(filter_sales(Sale.objects.all(), q="Customer 1").count(), 11)  # 1, 10..19
+        self.assertEqual(capped_count(Sale.objects.all(), limit=10), "10+")
+        self.assertEqual(capped_count(Sale.objects.all(), limit=50), 23)
+
+
+class CreditBalanceTests(TestCase):
+    def setUp(self):
+        self.sale = Sale.objects.create(payment_method="credit", is_credit=True, total_amount=Decimal("100.00"))
+
+    def pay(self, amount):
+        return CreditPayment.objects.create(sale=self.sale, amount=Decimal(amount))
+
+    def stored(self):
+        return Sale.objects.values_list("amount_paid", "balance_due", "is_credit").get(pk=self.sale.pk)
+
+    def outstanding(self):
+        return DailyRollup.objects.get().credit_outstanding
+
+    def test_new_sale_owes_its_total(self):
+        self.assertEqual(self.stored(), (Decimal("0.00"), Decimal("100.00"), True))
+
+    def test_payment_applies_the_amount_without_summing(self):
+        self.pay("30.00")
+        with CaptureQueriesContext(connection) as ctx:
+            self.pay("20.00")
+
+        self.assertFalse([q for q in ctx.captured_queries if "SUM(" in q["sql"]])
+        self.assertEqual(self.stored(), (Decimal("50.00"), Decimal("50.00"), True))
+        self.assertEqual((self.sale.amount_paid, self.sale.balance_due), (Decimal("50.00"), Decimal("50.00")))
+        self.assertEqual(self.outstanding(), Decimal("50.00"))
+
+    def test_full_payment_closes_the_credit(self):
+        self.pay("100.00")
+        self.assertEqual(self.stored(), (Decimal("100.00"), Decimal("0.00"), False))
+        self.assertEqual(self.outstanding(), Decimal("0.00"))
+
+    def test_edit_applies_the_difference_from_the_loaded_row(self):
+        payment = CreditPayment.objects.get(pk=self.pay("30.00").pk)
+        payment.amount = Decimal("45.00")
+        with CaptureQueriesContext(connection) as ctx:
+            payment.save()
+
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "sales_creditpayment"' in q["sql"]])
+        self.assertEqual(self.stored(), (Decimal("45.00"), Decimal("55.00"), True))
+        self.assertEqual(self.outstanding(), Decimal("55.00"))
+
+    def test_delete_gives_the_amount_back(self):
+        self.pay("30.00")
+        CreditPayment.objects.get(pk=self.pay("25.00").pk).delete()
+        self.assertEqual(self.stored(), (Decimal("30.00"), Decimal("70.00"), True))
+        self.assertEqual(self.outstanding(), Decimal("70.00"))
+
+    def test_sale_save_reads_no_previous_row(self):
+        sale = Sale.objects.get(pk=self.sale.pk)
+        sale.total_amount = Decimal("120.00")
+        with CaptureQueriesContext(connection) as ctx:
+            sale.save()
+
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith("SELECT") and 'FROM "sales_sale"' in q["sql"]])
+        self.assertEqual(self.stored(), (Decimal("0.00"), Decimal("120.00"), True))
+        self.assertEqual(self.outstanding(), Decimal("120.00"))
+
+    def test_payment_form_posts_the_amount(self):
+        user = User.objects.create_user("cashier")
+        user.groups.add(Group.objects.create(name="Admin"))
+        self.client.force_login(user)
+
+        response = self.client.post(
+            reverse("credit_payment_add", args=[self.sale.id]), {"amount": "30.00", "payment_method": "cash"},
+        )
+        self.assertRedirects(response, reverse("credit_sales_list"), fetch_redirect_response=False)
+        self.assertEqual(self.stored(), (Decimal("30.00"), Decimal("70.00"), True))
+
+
+class ReconcileCreditBalancesTests(TestCase):
+    def setUp(self):
+        self.sale = Sale.objects.create(payment_method="credit", is_credit=True, total_amount=Decimal("100.00"))
+        CreditPayment.objects.create(sale=self.sale, amount=Decimal("40.00"))
+        self.cash = Sale.objects.create(total_amount=Decimal("15.00"), amount_paid=Decimal("15.00"))
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command("reconcile_credit_balances", *args, stdout=out)
+        return out.getvalue()
+
+    def test_in_step_balances_are_reported_clean(self):
+        self.assertIn("All stored credit balances match", self.reconcile())
+
+    def test_drift_is_reported_and_only_written_with_fix(self):
+        Sale.objects.filter(pk=self.sale.pk).update(amount_paid=Decimal("100.00"), balance_due=Decimal("0.00"))
+
+        self.assertIn(f"Sale #{self.sale.id}: paid 100.00 -> 40", self.reconcile())
+        self.sale.refresh_from_db()
+        self.assertEqual(self.sale.balance_due, Decimal("0.00"))
+
+        self.assertIn("Repaired 1 sale(s)", self.reconcile("--fix"))
+        self.sale.refresh_from_db()
+        self.assertEqual((self.sale.amount_paid, self.sale.balance_due), (Decimal("40.00"), Decimal("60.00")))
+        self.assertEqual(DailyRollup.objects.get().credit_outstanding, Decimal("60.00"))
+        self.assertIn("All stored credit balances match", self.reconcile())
+
+
+class CreditSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.today = timezone.localdate()
+
+    def credit_sale(self, total, *, due_in=None, sale_type="retail"):
+        due_date = self.today + timedelta(days=due_in) if due_in is not None else None
+        return Sale.objects.create(
+            payment_method="credit", is_credit=True, total_amount=Decimal(total), due_date=due_date, sale_type=sale_type,
+        )
+
+    def test_aging_buckets_per_sale_type(self):
+        self.credit_sale("10.00", due_in=5)     # not yet due: 0-30
+        self.credit_sale("20.00", due_in=-30)
+        self.credit_sale("30.00", due_in=-31)
+        self.credit_sale("40.00", due_in=-75, sale_type="wholesale")
+        self.credit_sale("50.00", due_in=-91, sale_type="wholesale")
+        old = self.credit_sale("60.00")         # no due date: aged from the sale date
+        Sale.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(days=45))
+        Sale.objects.create(total_amount=Decimal("99.00"), amount_paid=Decimal("99.00"))  # cash, not in the book
+
+        with self.assertNumQueries(1):
+            summary = build_credit_summary(self.today)
+
+        self.assertEqual(
+            [summary["retail"][k] for k in ("count", "outstanding", "0_30", "31_60", "61_90", "90_plus")],
+            [4, Decimal("120.00"), Decimal("30.00"), Decimal("90.00"), 0, 0],
+        )
+        self.assertEqual(
+            [summary["wholesale"][k] for k in ("count", "61_90", "90_plus")], [2, Decimal("40.00"), Decimal("50.00")],
+        )
+        self.assertEqual((summary["all"]["count"], summary["all"]["outstanding"]), (6, Decimal("210.00")))
+
+    def test_payment_and_close_out_drop_the_cached_summary(self):
+        sale = self.credit_sale("100.00")
+        self.assertEqual(credit_summary()["all"]["outstanding"], Decimal("100.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CreditPayment.objects.create(sale=sale, amount=Decimal("40.00"))
+        self.assertEqual(credit_summary()["all"]["outstanding"], Decimal("60.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CreditPayment.objects.create(sale=sale, amount=Decimal("60.00"))  # closes the credit
+        self.assertEqual(credit_summary()["all"]["count"], 0)
+
+    def test_reads_between_changes_are_cached(self):
+        self.credit_sale("100.00")
+        credit_summary()
+        with self.assertNumQueries(0):
+            self.assertEqual(credit_summary()["retail"]["count"], 1)
+
+
+class CustomerCreditTotalsTests(TestCase):
+    """Customer.credit_total / balance_due follow every sale write as deltas."""
+
+    def setUp(self):
+        self.ama = Customer.objects.create(name="Ama", phone="0241234567")
+        self.kofi = Customer.objects.create(name="Kofi", phone="0201112222")
+
+    def assertTotals(self, customer, credit, balance):
+        customer.refresh_from_db()
+        self.assertEqual((customer.credit_total, customer.balance_due), (Decimal(credit), Decimal(balance)))
+
+    def credit_sale(self, **kwargs):
+        values = {"customer": self.ama, "payment_method": "credit", "is_credit": True, "total_amount": Decimal("100.00")}
+        return Sale.objects.create(**{**values, **kwargs})
+
+    def test_create_edit_and_pay(self):
+        sale = self.credit_sale()
+        self.credit_sale(total_amount=Decimal("40.00"))
+        self.assertTotals(self.ama, "140.00", "140.00")
+
+        sale.total_amount = Decimal("120.00")
+        sale.save()
+        self.assertTotals(self.ama, "160.00", "160.00")
+
+        CreditPayment.objects.create(sale=sale, amount=Decimal("50.00"))
+        self.assertTotals(self.ama, "160.00", "110.00")
+
+    def test_edit_of_a_loaded_sale_reads_no_previous_row(self):
+        sale = Sale.objects.get(pk=self.credit_sale().pk)
+        sale.total_amount = Decimal("90.00")
+        with CaptureQueriesContext(connection) as ctx:
+            sale.save()
+
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith("SELECT")])
+        self.assertTotals(self.ama, "90.00", "90.00")
+
+    def test_update_fields_save(self):
+        sale = self.credit_sale()
+        sale.amount_paid = Decimal("30.00")
+        sale.customer = self.kofi  # not in update_fields: stays with Ama
+        sale.save(update_fields=["amount_paid"])
+        self.assertTotals(self.ama, "100.00", "70.00")
+        self.assertTotals(self.kofi, "0.00", "0.00")
+
+    def test_customer_change_moves_the_sale(self):
+        sale = self.credit_sale()
+        sale.customer = self.kofi
+        sale.save()
+        self.assertTotals(self.ama, "0.00", "0.00")
+        self.assertTotals(self.kofi, "100.00", "100.00")
+
+    def test_payment_method_change(self):
+        sale = self.credit_sale()
+        sale.payment_method = "cash"
+        sale.amount_paid = sale.total_amount
+        sale.save()
+        self.assertTotals(self.ama, "0.00", "0.00")
+
+        sale.payment_method = "credit"
+        sale.amount_paid = Decimal("0.00")
+        sale.save()
+        self.assertTotals(self.ama, "100.00", "100.00")
+
+    def test_delete_reverses(self):
+        sale = self.credit_sale()
+        self.credit_sale(total_amount=Decimal("40.00"))
+        Sale.objects.create(customer=self.ama, payment_method="cash", total_amount=Decimal("9.00"), amount_paid=Decimal("9.00"))
+
+        sale.delete()
+        self.assertTotals(self.ama, "40.00", "40.00")
+
+        Sale.objects.filter(customer=self.ama).delete()
+        self.assertTotals(self.ama, "0.00", "0.00")
+
+
+class CustomerLookupTests(TestCase):
+    def test_phone_forms_normalise_to_one_customer(self):
+        self.assertEqual(normalize_phone("+233 24 123 4567"), "0241234567")
+        self.assertEqual(normalize_phone("024-123-4567"), "0241234567")
+        first = resolve_customer(name="Ama", phone="+233241234567")
+        self.assertEqual(resolve_customer(phone="024 123 4567"), first)
+        self.assertIsNone(resolve_customer(name="Walk-in", phone=""))
+
+    def test_autocomplete_by_phone_or_name_prefix(self):
+        Customer.objects.create(name="Kofi Mensah", phone="0201112222")
+        Customer.objects.create(name="Ama", phone="0241234567")
+        self.assertEqual([c["name"] for c in customer_autocomplete("kof")], ["Kofi Mensah"])
+        self.assertEqual([c["name"] for c in customer_autocomplete("+23324")], ["Ama"])
+        self.assertEqual(customer_autocomplete(""), [])
+
+
+class CatalogueEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        inventory_services._catalogue.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(inventory_services._catalogue.clear)
+
+        user = User.objects.create_user("cashier")
+        user.groups.add(Group.objects.create(name="Retail"))
+        self.client.force_login(user)
+        self.wings = Product.objects.create(name="Wings", unit_price=Decimal("30.00"))
+        mackerel = Product.objects.create(name="Mackerel", unit_price=Decimal("1.00"), is_weighted=True)
+        ProductWeightPrice.objects.create(
+            product=mackerel, weight_kg=Decimal("5.00"), retail_price=Decimal("60.00"), wholesale_price=Decimal("50.00"),
+        )
+
+    def get(self, **headers):
+        return self.client.get(reverse("sales_catalogue"), headers=headers)
+
+    def test_body_is_built_in_two_queries(self):
+        with self.assertNumQueries(2):
+            catalogue = inventory_services.build_catalogue()
+        self.assertEqual([p["name"] for p in catalogue["products"]], ["Mackerel", "Wings"])
+        self.assertEqual(catalogue["products"][0]["sizes"][0]["weight_kg"], 5.0)
+
+    def test_matching_etag_gets_304(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first["Cache-Control"], "private, no-cache")
+
+        again = self.get(If_None_Match=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], first["ETag"])
+        self.assertEqual(self.get(If_None_Match=f'"other", {first["ETag"]}').status_code, 304)
+        self.assertEqual(self.get(If_Modified_Since=first["Last-Modified"]).status_code, 304)
+
+    def test_price_change_moves_the_etag_stock_change_does_not(self):
+        etag = self.get()["ETag"]
+        version = inventory_services.catalogue_version()
+
+        self.wings.quantity = 3
+        self.wings.save(update_fields=["quantity"])
+        self.assertEqual(inventory_services.catalogue_version(), version)
+
+        self.wings.unit_price = Decimal("32.00")
+        self.wings.save()
+        response = self.get(If_None_Match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn(b"32.0", response.content)
+
+
+class IdempotentSubmitTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cashier")
+        self.user.groups.add(Group.objects.create(name="Retail"))
+        self.wings = Product.objects.create(name="Wings", unit_price=Decimal("30.00"), quantity=10)
+
+    def submit(self, key, quantity=2):
+        return submit_sale(
+            sale=Sale(created_by=self.user, idempotency_key=key),
+            lines=[{"product": self.wings.id, "quantity": quantity}], sale_type="retail", user=self.user,
+        )
+
+    def test_replayed_key_returns_the_existing_sale(self):
+        sale, created = self.submit("till-1:0001")
+        again, created_again = self.submit("till-1:0001", quantity=5)
+
+        self.assertEqual((created, created_again), (True, False))
+        self.assertEqual(again.pk, sale.pk)
+        self.assertEqual(again.total_amount, Decimal("60.00"))
+        self.wings.refresh_from_db()
+        self.assertEqual(self.wings.quantity, 8)  # deducted once
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_resubmitted_form_redirects_to_the_first_receipt(self):
+        sale, _ = self.submit("form-key")
+        self.client.force_login(self.user)
+        response = self.client.post(reverse("create_sale"), {"idempotency_key": "form-key"})
+        self.assertRedirects(response, reverse("sale_receipt", args=[sale.id]), fetch_redirect_response=False)
+
+    def test_batch_replay_reports_duplicates(self):
+        self.client.force_login(self.user)
+        queue = {"sales": [
+            {"idempotency_key": "q-1", "items": [{"product": self.wings.id, "quantity": 1}]},
+            {"items": [{"product": self.wings.id, "quantity": 1}]},
+        ]}
+
+        def post():
+            response = self.client.post(reverse("sale_batch_api"), queue, content_type="application/json")
+            return [r["status"] for r in response.json()["results"]]
 
-# Create your tests here.
+        self.assertEqual(post(), ["created", "error"])
+        self.assertEqual(post(), ["duplicate", "error"])
+        self.wings.refresh_from_db()
+        self.assertEqual(self.wings.quantity, 9)
@@ -13,7 +13,11 @@ urlpatterns = [
     path("sales/receipt/<int:sale_id>/", views.sale_receipt, name="sale_receipt"),
     path("receipt/<int:sale_id>/", views.receipt_view, name="receipt_view"),
     path("sales/retail/", views.retail_sales_list, name="retail_sales_list"),
-    path("sales/wholesale/", views.wholesale_sales_list, name="wholesale_sales_list")
+    path("sales/wholesale/", views.wholesale_sales_list, name="wholesale_sales_list"),
+    path("customers/lookup/", views.customer_lookup, name="customer_lookup"),
+    path("api/catalogue/", views.catalogue_json, name="sales_catalogue"),
+    path("api/sales/", views.sale_create_api, name="sale_create_api"),
+    path("api/sales/batch/", views.sale_batch_api, name="sale_batch_api"),
 ]
 
 
@@ -1,37 +1,45 @@
 from decimal import Decimal
 import json
+import uuid
 from io import BytesIO
 import base64
 import qrcode
 from datetime import datetime, timedelta
 from django.core.paginator import Paginator
+from urllib.parse import urlencode
 from django.db.models import Q
 from django.utils import timezone
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 from django.forms import formset_factory
 from django.db import transaction
 from django.db.models import Sum, F, ExpressionWrapper, DecimalField
 
 # from sales.utils import visible_queryset_for_user
-from users.utils import has_any_group
+from users.utils import has_any_group, user_in_groups
 from .models import Sale, SaleItem, CreditPayment
 from .forms import SaleForm, SaleItemForm, CreditPaymentForm
 from inventory.models import Product, ProductWeightPrice
+from inventory.services import catalogue_version, get_catalogue
 
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.http import http_date, parse_etags
 from reportlab.lib.pagesizes import A5, landscape
 from reportlab.pdfgen import canvas
 
-from inventory.services import consume_weight
+from .services import receipt_pdf, receipt_qr_png, receipt_items, invalidate_receipt_cache
+from .services import filter_sales, keyset_page, capped_count, SALE_LIST_PAGE_SIZES
+from .services import open_credit_sales, credit_summary, customer_autocomplete
 
 # from .services import deduct_weight_from_product
-VAT_RATE = Decimal("0.04")  # 4.5%
+from .services import VAT_RATE, SALE_BATCH_LIMIT, BasketError, submit_json_sale, submit_sale
 
 def user_sale_type(user):
-    if user.groups.filter(name="Wholesale").exists():
+    if user_in_groups(user, "Wholesale"):
         return "wholesale"
-    if user.groups.filter(name="Retail").exists():
+    if user_in_groups(user, "Retail"):
         return "retail"
     return "retail"
 
@@ -96,27 +104,18 @@ def create_sale(request):
     # stype = None  # will come from the form so it could change from reatil to wholesale and vice versa
 
 
-    # used by your JS to populate weight dropdown & prices
-    weights_json = {}
-    for wp in ProductWeightPrice.objects.filter(is_active=True).select_related("product"):
-        weights_json.setdefault(str(wp.product_id), []).append({
-            "id": wp.id,
-            "label": f"{wp.weight_kg:g}kg",
-            "weight_kg": float(wp.weight_kg),
-            "retail_price": float(wp.retail_price),
-            "wholesale_price": float(wp.wholesale_price),
-        })
-    
-    products_json = {}
-    for p in Product.objects.all().only("id", "unit_price", "wholesale_price", "is_weighted"):
-        products_json[str(p.id)] = {
-            "is_weighted": bool(p.is_weighted),
-            "retail_price": float(p.unit_price or 0),
-            "wholesale_price": float(p.wholesale_price or 0),
-        }
+    # products / weight sizes / prices come from catalogue_json (fetched once per catalogue version)
 # addedd on 26th January 2026
     
+    # ✅ one key per rendered form; a resubmitted POST (timeout, double click) carries the same key
+    idempotency_key = (request.POST.get("idempotency_key") or "").strip()[:64] or uuid.uuid4().hex
+
     if request.method == "POST":
+        # already saved by an earlier attempt -> show that receipt, don't validate stock again
+        done = Sale.objects.filter(idempotency_key=idempotency_key).only("id").first()
+        if done:
+            return redirect("sale_receipt", sale_id=done.id)
+
         sale_form = SaleForm(request.POST)
         formset = ItemFormset(request.POST)
 
@@ -135,86 +134,17 @@ def create_sale(request):
                 sale.sale_type = stype
                 sale.sale_type = sale_form.cleaned_data.get("sale_type") or "retail"
                 # stype = sale.sale_type  # so the rest of your code uses it.Now pricing logic will automatically follow stype.
-
-                sale.is_credit = (sale.payment_method == "credit")
-                sale.save()
-
-                subtotal = Decimal("0.00")
-
-                # lock products for safe stock update
-                # (we will fetch per item using select_for_update)
-                for f in formset:
-                    if not f.cleaned_data or not f.cleaned_data.get("product"):
-                        continue
-
-                    product = Product.objects.select_for_update().get(id=f.cleaned_data["product"].id)
-                    qty = int(f.cleaned_data.get("quantity") or 0)
-                    weight_price = f.cleaned_data.get("weight_price")  # may be None
-
-                    item = SaleItem(sale=sale, product=product, quantity=qty)
-
-                    # ✅ CASE 1: Weight sale (fish)
-                    if weight_price:
-                        # re-fetch weight_price safely
-                        wp = ProductWeightPrice.objects.select_related("product").get(id=weight_price.id)
-
-                        # force correct pricing server-side
-                        item.weight_price = wp
-                        item.unit_price = wp.wholesale_price if stype == "wholesale" else wp.retail_price
-
-                        sold_kg = Decimal(qty) * Decimal(wp.weight_kg)
-                        consume_weight(product=product, kg_to_sell=sold_kg)
-
-                        # consume_weight_from_product(product, sold_kg)
-
-                    # ✅ CASE 2: Normal unit sale (sausage)
-                    else:
-                        item.unit_price = product.wholesale_price if stype == "wholesale" else product.unit_price
-
-                        if product.is_weighted:
-                            # If weighted product but user didn’t choose weight size, block it
-                            raise ValueError(f"{product.name} is weighted. Please select a weight size.")
-                        if qty > product.quantity:
-                            raise ValueError(f"Not enough stock for {product.name}. Available: {product.quantity}")
-
-                        product.quantity = max(0, product.quantity - qty)
-                        product.save(update_fields=["quantity"])
-
-                    item.save()
-                    subtotal += item.line_total()
-
-                # totals
-                discount = Decimal(sale.discount or Decimal("0.00"))
-                after_discount = max(Decimal("0.00"), subtotal - discount)
-
-                apply_vat = bool(sale.apply_vat)
-                vat = (after_discount * VAT_RATE).quantize(Decimal("0.01")) if apply_vat else Decimal("0.00")
-                grand = (after_discount + vat).quantize(Decimal("0.01"))
-
-                sale.subtotal_amount = after_discount
-                sale.vat_amount = vat
-                sale.total_amount = grand
-                sale.save(update_fields=["subtotal_amount", "vat_amount", "total_amount"])
-
-                # credit
-                if sale.is_credit:
-                    amount_paid = Decimal(sale_form.cleaned_data.get("amount_paid") or Decimal("0.00"))
-                    amount_paid = max(Decimal("0.00"), min(amount_paid, grand))
-
-                    if amount_paid > 0:
-                        CreditPayment.objects.create(
-                            sale=sale,
-                            amount=amount_paid,
-                            payment_method="cash",
-                            reference="",
-                            received_by=request.user,
-                        )
-
-                    sale.recalc_credit(save=True)
-                else:
-                    # fully paid
-                    sale.amount_paid = sale.total_amount
-                    sale.save(update_fields=["amount_paid"])
+                sale.idempotency_key = idempotency_key
+
+                # a failed reservation must not leave an empty Sale row behind (submit_sale is atomic);
+                # one ordered lock for every product on the ticket, bulk item insert + bulk stock update
+                sale, _ = submit_sale(
+                    sale=sale,
+                    lines=[f.cleaned_data for f in formset],
+                    sale_type=stype,
+                    amount_paid=sale_form.cleaned_data.get("amount_paid") or Decimal("0.00"),
+                    user=request.user,
+                )
 
                 print(f"Redirecting to receipt for sale {sale.id}")
                 return redirect("sale_receipt", sale_id=sale.id)
@@ -228,8 +158,8 @@ def create_sale(request):
         "sale_form": sale_form,
         "formset": formset,
         "sale_type": stype,
-        "weights_json": json.dumps(weights_json),
-        "products_json": json.dumps(products_json),  # ✅ ADD THIS
+        "catalogue_version": catalogue_version(),
+        "idempotency_key": idempotency_key,
     })
     
     
@@ -238,20 +168,60 @@ def create_sale(request):
 @login_required
 @has_any_group("Admin", "Staff", "Accountant", "Retail", "Wholesale")
 def sale_list(request):
-    qs = Sale.objects.all().order_by("-timestamp")
+    qs = Sale.objects.all()
 
     # ✅ Retail/Wholesale users only see their type
-    if request.user.groups.filter(name="Wholesale").exists():
+    if user_in_groups(request.user, "Wholesale"):
         qs = qs.filter(sale_type="wholesale")
-    elif request.user.groups.filter(name="Retail").exists():
+    elif user_in_groups(request.user, "Retail"):
         qs = qs.filter(sale_type="retail")
 
     # ✅ Admin/Accountant can filter with ?type=retail or ?type=wholesale
     t = request.GET.get("type")
-    if request.user.groups.filter(name__in=["Admin", "Accountant"]).exists() and t in ["retail", "wholesale"]:
+    if user_in_groups(request.user, "Admin", "Accountant") and t in ["retail", "wholesale"]:
         qs = qs.filter(sale_type=t)
 
-    return render(request, "sales/sale_list.html", {"sales": qs})
+    return _render_sale_list(request, qs)
+
+
+def _render_sale_list(request, qs, forced_type=None):
+    """Filters (q / preset / start / end) + keyset pagination (?after= / ?before= cursors)."""
+    q = (request.GET.get("q") or "").strip()
+    start = (request.GET.get("start") or "").strip()    # YYYY-MM-DD
+    end = (request.GET.get("end") or "").strip()        # YYYY-MM-DD
+    preset = (request.GET.get("preset") or "").strip()  # today | week | month | all
+
+    try:
+        per_page = int(request.GET.get("per_page") or 10)
+    except ValueError:
+        per_page = 10
+    if per_page not in SALE_LIST_PAGE_SIZES:
+        per_page = 10
+
+    qs = filter_sales(qs, q=q, preset=preset, start=start, end=end)
+    page_obj = keyset_page(
+        qs.select_related("created_by"),
+        per_page=per_page,
+        after=request.GET.get("after", ""),
+        before=request.GET.get("before", ""),
+    )
+
+    return render(request, "sales/sale_list.html", {
+        "sales": page_obj.object_list,
+        "page_obj": page_obj,
+        "q": q,
+        "start": start,
+        "end": end,
+        "preset": preset,
+        "per_page": per_page,
+        "type": request.GET.get("type", ""),
+        "filter_query": urlencode({
+            k: v for k, v in {"q": q, "preset": preset, "start": start, "end": end,
+                              "per_page": per_page, "type": request.GET.get("type", "")}.items() if v
+        }),
+        "total_count": capped_count(qs),
+        "forced_type": forced_type,
+    })
 
 
 # @login_required
@@ -339,38 +309,36 @@ def sale_list(request):
 @login_required
 @has_any_group("Admin", "Accountant", "Retail")
 def retail_sales_list(request):
-    qs = Sale.objects.filter(sale_type="retail").order_by("-timestamp")
-    return render(request, "sales/sale_list.html", {"sales": qs, "forced_type": "retail"})
+    return _render_sale_list(request, Sale.objects.filter(sale_type="retail"), forced_type="retail")
 
 
 @login_required
 @has_any_group("Admin", "Accountant", "Wholesale")
 def wholesale_sales_list(request):
-    qs = Sale.objects.filter(sale_type="wholesale").order_by("-timestamp")
-    return render(request, "sales/sale_list.html", {"sales": qs, "forced_type": "wholesale"})
+    return _render_sale_list(request, Sale.objects.filter(sale_type="wholesale"), forced_type="wholesale")
 
 
 @login_required
 @has_any_group("Admin", "Staff", "Accountant", "Retail", "Wholesale")
 def credit_sales_list(request):
-    # compute balance at DB level
-    balance_expr = ExpressionWrapper(
-        F("total_amount") - F("amount_paid"),
-        output_field=DecimalField(max_digits=12, decimal_places=2)
-    )
+    # stored balance (kept current by CreditPayment), served by sale_open_credit_idx
+    qs = open_credit_sales().order_by("-timestamp")
 
-    qs = Sale.objects.filter(is_credit=True).annotate(balance_due_db=balance_expr).filter(balance_due_db__gt=0).order_by("-timestamp")
-
-    if request.user.groups.filter(name="Wholesale").exists():
-        qs = qs.filter(sale_type="wholesale")
-    elif request.user.groups.filter(name="Retail").exists():
-        qs = qs.filter(sale_type="retail")
+    scope = "all"
+    if user_in_groups(request.user, "Wholesale"):
+        scope = "wholesale"
+    elif user_in_groups(request.user, "Retail"):
+        scope = "retail"
+    if scope != "all":
+        qs = qs.filter(sale_type=scope)
 
-    total_outstanding = qs.aggregate(s=Sum("balance_due_db"))["s"] or Decimal("0.00")
+    # ✅ totals + aging come from the cached summary, not a second aggregate per page view
+    credit = credit_summary()[scope]
 
     return render(request, "sales/credit_sales_list.html", {
         "sales": qs,
-        "total_outstanding": total_outstanding,
+        "total_outstanding": credit["outstanding"],
+        "credit": credit,
     })
 
 
@@ -380,9 +348,9 @@ def credit_sales_list(request):
 def credit_payment_add(request, sale_id):
     sale = get_object_or_404(Sale, id=sale_id, is_credit=True)
 
-    if request.user.groups.filter(name="Wholesale").exists() and sale.sale_type != "wholesale":
+    if user_in_groups(request.user, "Wholesale") and sale.sale_type != "wholesale":
         return redirect("credit_sales_list")
-    if request.user.groups.filter(name="Retail").exists() and sale.sale_type != "retail":
+    if user_in_groups(request.user, "Retail") and sale.sale_type != "retail":
         return redirect("credit_sales_list")
 
     if request.method == "POST":
@@ -397,7 +365,8 @@ def credit_payment_add(request, sale_id):
 
             pay.sale = sale
             pay.received_by = request.user
-            pay.save()  # triggers sale.recalc_credit(save=True)
+            invalidate_receipt_cache(sale)  # printed balance is about to change
+            pay.save()  # updates sale.amount_paid / balance_due / is_credit
 
             return redirect("credit_sales_list")
     else:
@@ -406,123 +375,126 @@ def credit_payment_add(request, sale_id):
     return render(request, "sales/credit_payment_add.html", {"sale": sale, "form": form})
 
 def receipt_view(request, sale_id):
-    sale = get_object_or_404(Sale, id=sale_id)
-    items = sale.items.all()
-
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=landscape(A5))
-    width, height = landscape(A5)
-
-    p.setFont("Helvetica-Bold", 14)
-    p.drawCentredString(width/2, height - 20, "❄️ FRESH CHILL COLD STORE ❄️")
-    p.setFont("Helvetica", 9)
-    p.drawCentredString(width/2, height - 34, "Accra - Ghana | Tel: +233 20 854 3630")
+    sale = get_object_or_404(Sale.objects.select_related("created_by"), id=sale_id)
+    response = HttpResponse(receipt_pdf(sale), content_type="application/pdf")
+    response["Content-Disposition"] = f'inline; filename="receipt_{sale.id}.pdf"'
+    return response
 
-    y = height - 56
-    p.setFont("Helvetica", 8)
-    p.drawString(20, y, f"Date: {sale.timestamp.strftime('%Y-%m-%d %H:%M')}")
-    p.drawRightString(width - 20, y, f"Receipt: CS-{sale.id:04d}")
-    y -= 14
 
-    cashier = sale.created_by.get_full_name() if sale.created_by and sale.created_by.get_full_name() else (sale.created_by.username if sale.created_by else "—")
-    p.drawString(20, y, f"Cashier: {cashier}")
-    y -= 12
-    p.drawString(20, y, f"Customer: {sale.customer_name or 'Walk-in Customer'}")
-    y -= 12
-    p.drawString(20, y, f"Payment: {sale.get_payment_method_display()}")
+def sale_receipt(request, sale_id):
+    sale = get_object_or_404(Sale.objects.select_related("created_by"), id=sale_id)
+    qr_png = receipt_qr_png(sale)
 
-    y -= 18
-    p.setFont("Helvetica-Bold", 9)
-    p.drawString(20, y, "Item")
-    p.drawRightString(220, y, "Qty")
-    p.drawRightString(290, y, "Price (₵)")
-    p.drawRightString(370, y, "Total (₵)")
-    p.line(15, y-2, width-15, y-2)
-    y -= 12
-    p.setFont("Helvetica", 9)
+    return render(request, "sales/receipt.html", {
+        "sale": sale,
+        "items": receipt_items(sale),
+        "subtotal": sale.subtotal_amount,
+        "discount": sale.discount,
+        "subtotal_after_discount": sale.subtotal_amount,
+        "vat": sale.vat_amount,
+        "grand_total": sale.total_amount,
+        "qr_base64": base64.b64encode(qr_png).decode("ascii") if qr_png else "",
+    })
 
-    for it in items:
-        name = it.product.name if it.product else "Deleted Product"
-        if it.weight_price:
-            name = f"{name} ({it.weight_price.size_kg}kg)"
-
-        p.drawString(20, y, name[:32])
-        p.drawRightString(220, y, str(it.quantity))
-        p.drawRightString(290, y, f"{float(it.unit_price):.2f}")
-        p.drawRightString(370, y, f"{float(it.line_total()):.2f}")
-        y -= 12
-        if y < 70:
-            p.showPage()
-            y = height - 40
-            p.setFont("Helvetica", 9)
 
-    y -= 6
-    p.line(15, y, width-15, y)
-    y -= 14
+@login_required
+@has_any_group("Admin", "Staff", "Accountant", "Retail", "Wholesale")
+def customer_lookup(request):
+    # ?q=024... or ?q=kofi -> [{id, name, phone, balance_due}]
+    return JsonResponse({"results": customer_autocomplete(request.GET.get("q", ""))})
 
-    p.drawRightString(320, y, "Subtotal:")
-    p.drawRightString(370, y, f"₵{float(sale.subtotal_amount):.2f}")
-    y -= 12
 
-    if sale.apply_vat:
-        p.drawRightString(320, y, "VAT (4%):")
-        p.drawRightString(370, y, f"₵{float(sale.vat_amount):.2f}")
-        y -= 12
+@login_required
+@has_any_group("Admin", "Staff", "Accountant", "Retail", "Wholesale")
+def catalogue_json(request):
+    """
+    POS catalogue: {"products": [{id, name, is_weighted, retail_price, wholesale_price, sizes: [...]}]}.
+    Built once per catalogue version per process; clients revalidate with If-None-Match / If-Modified-Since.
+    """
+    cat = get_catalogue()
+    etag, last_modified = cat["etag"], http_date(cat["last_modified"])
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    if etag in if_none_match or "*" in if_none_match or (
+        "If-None-Match" not in request.headers and request.headers.get("If-Modified-Since") == last_modified
+    ):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(cat["body"], content_type="application/json")
+    response["ETag"] = etag
+    response["Last-Modified"] = last_modified
+    # the page requests ?v=<version>, so a new version is a new URL
+    response["Cache-Control"] = "private, max-age=3600" if request.GET.get("v") else "private, no-cache"
+    return response
 
-    p.setFont("Helvetica-Bold", 10)
-    p.drawRightString(320, y, "Total:")
-    p.drawRightString(370, y, f"₵{float(sale.total_amount):.2f}")
 
-    # QR
+@login_required
+@has_any_group("Admin", "Staff", "Retail", "Wholesale")
+@require_POST
+def sale_batch_api(request):
+    """
+    Offline POS queue: {"sales": [<sale>, ...]} (see services.sale_from_payload).
+    Every sale commits in its own transaction and needs an idempotency_key, so replaying
+    a queue after a dropped connection returns the saved sales instead of selling twice.
+    """
     try:
-        qr_text = f"Receipt:CS-{sale.id:04d}|Amount:₵{float(sale.total_amount):.2f}|Date:{sale.timestamp.strftime('%Y-%m-%d %H:%M')}"
-        qr = qrcode.make(qr_text)
-        buf = BytesIO()
-        qr.save(buf, format="PNG")
-        buf.seek(0)
-        p.drawInlineImage(buf, width - 120, 20, width=80, height=80)
-    except Exception:
-        pass
+        queue = json.loads(request.body or b"{}").get("sales")
+    except (ValueError, AttributeError):
+        return JsonResponse({"error": "Body must be JSON: {\"sales\": [...]}."}, status=400)
+    if not isinstance(queue, list) or not queue:
+        return JsonResponse({"error": "sales must be a non-empty list."}, status=400)
+    if len(queue) > SALE_BATCH_LIMIT:
+        return JsonResponse({"error": f"At most {SALE_BATCH_LIMIT} sales per batch."}, status=400)
 
-    p.setFont("Helvetica-Oblique", 8)
-    p.drawCentredString(width/2, 18, "Thank you for your purchase! — Fresh Chill Cold Store")
-
-    p.showPage()
-    p.save()
-
-    pdf = buffer.getvalue()
-    buffer.close()
-    response = HttpResponse(pdf, content_type="application/pdf")
-    response["Content-Disposition"] = f'inline; filename="receipt_{sale.id}.pdf"'
-    return response
+    stype = user_sale_type(request.user)
+    results = []
+    for entry in queue:
+        key = entry.get("idempotency_key") if isinstance(entry, dict) else None
+        try:
+            if not key:
+                raise ValueError("idempotency_key is required for queued sales.")
+            sale, created = submit_json_sale(entry, user=request.user, sale_type=stype)
+        except ValueError as e:
+            results.append({"idempotency_key": key, "status": "error", "error": str(e)})
+            continue
+        results.append({"idempotency_key": key, "status": "created" if created else "duplicate", **_sale_payload(sale)})
+    return JsonResponse({"results": results})
+
+
+def _sale_payload(sale):
+    return {
+        "sale_id": sale.id,
+        "receipt_no": f"CS-{sale.id:04d}",
+        "total_amount": str(sale.total_amount),
+        "amount_paid": str(sale.amount_paid),
+        "balance_due": str(sale.balance_due),
+        "receipt_url": reverse("sale_receipt", args=[sale.id]),
+    }
 
 
-def sale_receipt(request, sale_id):
-    sale = get_object_or_404(Sale, id=sale_id)
-    items = sale.items.all()
+@login_required
+@has_any_group("Admin", "Staff", "Retail", "Wholesale")
+@require_POST
+def sale_create_api(request):
+    """
+    JSON sale creation for the POS front-end / integrations, no formsets:
+    body = one sale (see services.sale_from_payload). The basket is checked with one product
+    and one weight-size lookup, then goes through the same pricing + stock reservation as create_sale.
+    201 -> created, 200 -> idempotency_key replay, 400 -> {"errors": [...]}.
+    """
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"errors": ["Body must be a JSON object."]}, status=400)
 
-    qr_base64 = ""
     try:
-        qr_text = f"Receipt:CS-{sale.id:04d}|Amount:₵{float(sale.total_amount):.2f}|Date:{sale.timestamp.strftime('%Y-%m-%d %H:%M')}"
-        qr_img = qrcode.make(qr_text)
-        buf = BytesIO()
-        qr_img.save(buf, format="PNG")
-        buf.seek(0)
-        qr_base64 = base64.b64encode(buf.read()).decode("ascii")
-        buf.close()
-    except Exception:
-        qr_base64 = ""
+        sale, created = submit_json_sale(data, user=request.user, sale_type=user_sale_type(request.user))
+    except BasketError as e:
+        return JsonResponse({"errors": e.errors}, status=400)
+    except ValueError as e:
+        return JsonResponse({"errors": [str(e)]}, status=400)
+    return JsonResponse({"created": created, **_sale_payload(sale)}, status=201 if created else 200)
+
 
-    return render(request, "sales/receipt.html", {
-        "sale": sale,
-        "items": items,
-        "subtotal": sale.subtotal_amount,
-        "discount": sale.discount,
-        "subtotal_after_discount": sale.subtotal_amount,
-        "vat": sale.vat_amount,
-        "grand_total": sale.total_amount,
-        "qr_base64": qr_base64,
-    })
 
 
 """# sales/views.py
@@ -1,9 +1,11 @@
 from django import template
 
+from users.utils import user_in_groups
+
 register = template.Library()
 
 @register.filter
 def has_group(user, group_name):
     if user.is_anonymous:
         return False
-    return user.groups.filter(name=group_name).exists()
+    return user_in_groups(user, group_name)
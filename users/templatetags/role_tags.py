@@ -1,12 +1,13 @@
 
 from django import template
 
+from users.utils import user_in_groups
+
 register = template.Library()
 
 @register.simple_tag
 def is_super_admin(user):
-    return user.is_authenticated and (user.is_superuser or user.groups.filter
-    (name="SuperAdmin").exists())
+    return user.is_authenticated and (user.is_superuser or user_in_groups(user, "SuperAdmin"))
 
 # register = template.Library()
 
@@ -1,3 +1,74 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from sales.models import Sale
+from sales.views import user_sale_type
+
+from .utils import get_group_names, has_any_group, user_in_groups
+
+
+def group_queries(ctx):
+    return sum('"auth_user_groups"' in q["sql"] for q in ctx.captured_queries)
+
+
+class GroupNamesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("clerk", password="x")
+        self.wholesale = Group.objects.create(name="Wholesale")
+        self.user.groups.add(self.wholesale, Group.objects.create(name="Staff"))
+
+    def test_loaded_once_per_user_object(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_group_names(self.user), {"Wholesale", "Staff"})
+            self.assertTrue(user_in_groups(self.user, "Admin", "Staff"))
+            self.assertFalse(user_in_groups(self.user, "Admin", "Retail"))
+        self.assertEqual(get_group_names(AnonymousUser()), frozenset())
+
+    def test_scope_helpers(self):
+        self.assertEqual(user_sale_type(User.objects.get(pk=self.user.pk)), "wholesale")
+        self.user.groups.remove(self.wholesale)
+        self.assertEqual(user_sale_type(User.objects.get(pk=self.user.pk)), "retail")
+
+    def test_decorator(self):
+        view = has_any_group("Admin", "Staff")(lambda request: HttpResponse("ok"))
+        request = RequestFactory().get("/")
+
+        request.user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(view(request).status_code, 200)
+
+        request.user = User.objects.create_user("outsider")
+        self.assertEqual(view(request).status_code, 302)  # to the login page
+
+        request.user = User.objects.create_superuser("root", password="x")
+        self.assertEqual(view(request).status_code, 200)
+
+        request.user = AnonymousUser()
+        self.assertEqual(view(request).status_code, 302)
+
+    def test_one_group_query_per_request(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse("credit_sales_list")).status_code, 200)
+        self.assertEqual(group_queries(ctx), 1)
+
+    def test_revocation_is_seen_on_the_next_request(self):
+        Sale.objects.create(sale_type="retail", is_credit=True, total_amount=Decimal("10.00"))
+        Sale.objects.create(sale_type="wholesale", is_credit=True, total_amount=Decimal("20.00"))
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("credit_sales_list"))
+        self.assertEqual([s.sale_type for s in response.context["sales"]], ["wholesale"])
+
+        self.user.groups.remove(self.wholesale)  # Staff: no sale-type scope
+        response = self.client.get(reverse("credit_sales_list"))
+        self.assertEqual(sorted(s.sale_type for s in response.context["sales"]), ["retail", "wholesale"])
+
+        self.user.groups.clear()
+        response = self.client.get(reverse("credit_sales_list"))
+        self.assertEqual(response.status_code, 302)
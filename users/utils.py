@@ -1,13 +1,36 @@
 # users/utils.py
 from django.contrib.auth.decorators import user_passes_test
 from django.core.exceptions import PermissionDenied
- 
- 
+
+
+# ------------------------------------------------------------
+# ✅ Group names: loaded once per request
+# ------------------------------------------------------------
+def get_group_names(user) -> frozenset:
+    """
+    The user's group names, memoised on the user object. request.user is built
+    fresh for every request, so this is one query per request and a membership
+    change is seen by the very next request, whichever process serves it.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, "_group_names", None)
+    if names is None:
+        names = frozenset(user.groups.values_list("name", flat=True))
+        user._group_names = names
+    return names
+
+
+def user_in_groups(user, *names) -> bool:
+    """True when the user belongs to any of the given groups (no superuser bypass)."""
+    return not get_group_names(user).isdisjoint(names)
+
+
 def in_group(group_name):
     def predicate(user):
         if not user.is_authenticated:
             return False
-        return user.groups.filter(name=group_name).exists() or user.is_superuser
+        return group_name in get_group_names(user) or user.is_superuser
     return user_passes_test(predicate)
 
 def has_any_group(*group_names):
@@ -16,7 +39,7 @@ def has_any_group(*group_names):
             return False
         if user.is_superuser:
             return True
-        return user.groups.filter(name__in=group_names).exists()
+        return user_in_groups(user, *group_names)
     return user_passes_test(predicate)
 
 # class-based view mixin:
@@ -29,7 +52,7 @@ class GroupRequiredMixin:
             return redirect_to_login(request.get_full_path())
         if request.user.is_superuser:
             return super().dispatch(request, *args, **kwargs)
-        if not request.user.groups.filter(name__in=self.required_groups).exists():
+        if not user_in_groups(request.user, *self.required_groups):
             raise PermissionDenied("You do not have permission to access this resource.")
         return super().dispatch(request, *args, **kwargs)
 # usage example:
@@ -2,6 +2,7 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import Group
+from .utils import user_in_groups
 
 # @login_required
 def dashboard_view(request):
@@ -21,9 +22,9 @@ def redirect_by_role(user):
     """
     if user.is_superuser:
         return "reports_summary"
-    if user.groups.filter(name="Accountant").exists():
+    if user_in_groups(user, "Accountant"):
         return "reports_summary"
-    if user.groups.filter(name="Staff").exists():
+    if user_in_groups(user, "Staff"):
         return "inventory_dashboard"
     return "inventory_dashboard"
 